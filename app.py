@@ -1,12 +1,8 @@
 import streamlit as st
-import requests
 import json
 import re
 import random
 import uuid
-import math
-import base64
-from datetime import datetime
 from functools import lru_cache
 import io
 from PIL import Image
@@ -21,6 +17,25 @@ import traceback
 import concurrent.futures
 import time
 import threading
+import hashlib
+import sqlite3
+from mistral_client import get_client, MistralAPIError
+from flowchart_parser import IncrementalNodeParser, recover_flowchart_json
+from flowchart_layout import calculate_layout, update_layout
+from flowchart_renderer import (DESIGN_THEMES, EXPORT_FORMATS, RENDER_BACKENDS, RENDERER_VERSION, export_bytes,
+                                export_document, generate_export_html, generate_flowchart_html,
+                                missing_offline_assets)
+from flowchart_raster import PNG_FORMAT, render_png
+from flowchart_patch import apply_patch, check_patchable, parse_patch_operations, PatchError
+from flowchart_phases import merge_phase_flowcharts
+from response_cache import get_response_cache, make_cache_key
+from disk_cache import get_disk_cache
+from similarity_index import get_similarity_index
+from token_budget import analyze_prompt_complexity, estimate_token_budget, TOKENS_PER_NODE, BUDGET_OVERHEAD, SAFETY_MARGIN
+from singleflight import get_single_flight
+from rate_limiter import get_scheduler, estimate_request_tokens, SchedulerBusyError
+from hedging import MIN_SAMPLES, get_hedged_requester
+from circuit_breaker import CircuitOpenError, DegradedFlowchart, is_degraded, record_degraded, get_degraded_stats
 
 # Configure logging
 logging.basicConfig(
@@ -29,6 +44,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger("AskFlowChart")
 
+# Two-phase generation: nodes per description request
+DESCRIPTION_BATCH_SIZE = 6
+# Requests run at once by the shared generation pool (description batches, phase subgraphs)
+GENERATION_WORKERS = 4
+# Divide-and-conquer generation: used for processes with at least this many estimated nodes
+DIVIDE_MIN_NODES = 30
+MAX_PHASES = 8
+
 # Set page configuration once at startup
 st.set_page_config(page_title="Ask Flow Chart", layout="wide")
 
@@ -37,94 +60,43 @@ st.markdown("""
 <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/5.15.4/css/all.min.css">
 """, unsafe_allow_html=True)
 
-# Define design themes
-DESIGN_THEMES = {
-    "modern": {
-        "name": "Modern Minimal",
-        "node_styles": {
-            "start": {"bg": "#4361EE", "text": "#FFFFFF", "shadow": "0 4px 6px rgba(67, 97, 238, 0.3)", "shape": "rounded"},
-            "process": {"bg": "#F8F9FA", "text": "#212529", "shadow": "0 2px 5px rgba(0,0,0,0.08)", "shape": "rounded"},
-            "decision": {"bg": "#FFF8E1", "text": "#1C1C1C", "shadow": "0 2px 5px rgba(0,0,0,0.08)", "shape": "diamond"},
-            "end": {"bg": "#4CC9F0", "text": "#FFFFFF", "shadow": "0 4px 6px rgba(76, 201, 240, 0.3)", "shape": "rounded"},
-        },
-        "connector": {"color": "#CED4DA", "style": "curved", "thickness": "1.5px"},
-        "font": "'Roboto', sans-serif",
-        "icons": True
-    },
-    "corporate": {
-        "name": "Corporate Professional",
-        "node_styles": {
-            "start": {"bg": "#2C3E50", "text": "#FFFFFF", "shadow": "0 4px 6px rgba(44, 62, 80, 0.3)", "shape": "rounded"},
-            "process": {"bg": "#FFFFFF", "text": "#34495E", "shadow": "0 2px 4px rgba(0,0,0,0.1)", "shape": "rectangle"},
-            "decision": {"bg": "#ECF0F1", "text": "#2C3E50", "shadow": "0 2px 4px rgba(0,0,0,0.1)", "shape": "diamond"},
-            "end": {"bg": "#3498DB", "text": "#FFFFFF", "shadow": "0 4px 6px rgba(52, 152, 219, 0.3)", "shape": "rounded"},
-        },
-        "connector": {"color": "#95A5A6", "style": "straight", "thickness": "1.5px"},
-        "font": "'Open Sans', sans-serif",
-        "icons": True
-    },
-    "creative": {
-        "name": "Creative Colorful",
-        "node_styles": {
-            "start": {"bg": "#FF6B6B", "text": "#FFFFFF", "shadow": "0 5px 15px rgba(255, 107, 107, 0.4)", "shape": "capsule"},
-            "process": {"bg": "#FFFFFF", "text": "#2F2E41", "shadow": "0 5px 15px rgba(0,0,0,0.08)", "shape": "capsule"},
-            "decision": {"bg": "#FFEAA7", "text": "#2F2E41", "shadow": "0 5px 15px rgba(0,0,0,0.08)", "shape": "diamond"},
-            "end": {"bg": "#4ECDC4", "text": "#FFFFFF", "shadow": "0 5px 15px rgba(78, 205, 196, 0.4)", "shape": "capsule"},
-        },
-        "connector": {"color": "#A5A6F6", "style": "dashed", "thickness": "1.5px"},
-        "font": "'Comfortaa', cursive",
-        "icons": True
-    },
-    "tech": {
-        "name": "Tech Blueprint",
-        "node_styles": {
-            "start": {"bg": "#3A0CA3", "text": "#FFFFFF", "shadow": "0 4px 8px rgba(58, 12, 163, 0.3)", "shape": "pill"},
-            "process": {"bg": "#0F1724", "text": "#F8F9FA", "shadow": "0 3px 6px rgba(0,0,0,0.2)", "shape": "rectangle"},
-            "decision": {"bg": "#4895EF", "text": "#FFFFFF", "shadow": "0 3px 6px rgba(72, 149, 239, 0.3)", "shape": "diamond"},
-            "end": {"bg": "#4CC9F0", "text": "#FFFFFF", "shadow": "0 4px 8px rgba(76, 201, 240, 0.3)", "shape": "pill"},
-        },
-        "connector": {"color": "#4361EE", "style": "gradient", "thickness": "1.5px"},
-        "font": "'IBM Plex Sans', sans-serif",
-        "icons": True
-    },
-    "healthcare": {
-        "name": "Healthcare",
-        "node_styles": {
-            "start": {"bg": "#00B4D8", "text": "#FFFFFF", "shadow": "0 3px 6px rgba(0, 180, 216, 0.3)", "shape": "rounded"},
-            "process": {"bg": "#FFFFFF", "text": "#023E8A", "shadow": "0 2px 5px rgba(0,0,0,0.08)", "shape": "rounded"},
-            "decision": {"bg": "#CAF0F8", "text": "#023E8A", "shadow": "0 2px 5px rgba(0,0,0,0.08)", "shape": "diamond"},
-            "end": {"bg": "#0077B6", "text": "#FFFFFF", "shadow": "0 3px 6px rgba(0, 119, 182, 0.3)", "shape": "rounded"},
-        },
-        "connector": {"color": "#90E0EF", "style": "straight", "thickness": "1.5px"},
-        "font": "'Quicksand', sans-serif",
-        "icons": True
-    },
-    "finance": {
-        "name": "Finance & Banking",
-        "node_styles": {
-            "start": {"bg": "#1B4332", "text": "#FFFFFF", "shadow": "0 3px 6px rgba(27, 67, 50, 0.3)", "shape": "rectangle"},
-            "process": {"bg": "#FFFFFF", "text": "#081C15", "shadow": "0 2px 4px rgba(0,0,0,0.1)", "shape": "rectangle"},
-            "decision": {"bg": "#D8F3DC", "text": "#081C15", "shadow": "0 2px 4px rgba(0,0,0,0.1)", "shape": "diamond"},
-            "end": {"bg": "#2D6A4F", "text": "#FFFFFF", "shadow": "0 3px 6px rgba(45, 106, 79, 0.3)", "shape": "rectangle"},
-        },
-        "connector": {"color": "#95D5B2", "style": "straight", "thickness": "1.5px"},
-        "font": "'Montserrat', sans-serif",
-        "icons": True
-    },
-}
-
-# Function to generate flowchart description using Mistral
-def generate_flowchart_description(prompt, api_key, industry=None):
-    url = "https://api.mistral.ai/v1/chat/completions"
-    
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
-    
+# Function to build the chat-completions request for a flowchart
+def build_flowchart_request(prompt, industry=None, max_tokens=2000, temperature=0.7, skeleton=False):
     # Create a prompt that instructs the model to generate a flowchart description
     industry_context = f"The flowchart is for the {industry} industry." if industry else ""
     
+    if skeleton:
+        # Structure only: node descriptions are fetched separately (see fetch_node_descriptions)
+        system_message = f"""You are a flowchart designer specializing in creating detailed, professional flowcharts. {industry_context}
+    Generate the structure of a flowchart based on the user's prompt.
+    
+    For each node in the flowchart, specify:
+    1. Node ID (unique identifier)
+    2. Node text content (keep it concise but clear)
+    3. Node type (choose from: process, decision, start, end)
+    4. Connections to other nodes (with IDs)
+    5. An appropriate icon name that represents this step (use FontAwesome 5 icon names like fa-check, fa-user, fa-cog, etc.)
+    
+    Do not include descriptions. Format your response as JSON with this structure:
+    {{
+        "nodes": [
+            {{"id": "node1", "text": "Start Process", "type": "start", "connections": ["node2"], "icon": "fa-play-circle"}}
+        ]
+    }}
+    
+    IMPORTANT: Ensure the JSON is properly formatted with correct commas, quotes, and brackets. It must be valid JSON that can be parsed by Python's json.loads() function.
+    """
+        return {
+            "model": "mistral-small-latest",
+            "messages": [
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "response_format": {"type": "json_object"}
+        }
+    
     system_message = f"""You are a flowchart designer specializing in creating detailed, professional flowcharts. {industry_context}
     Generate a detailed description of a flowchart based on the user's prompt.
     
@@ -158,1621 +130,839 @@ def generate_flowchart_description(prompt, api_key, industry=None):
     IMPORTANT: Ensure the JSON is properly formatted with correct commas, quotes, and brackets. It must be valid JSON that can be parsed by Python's json.loads() function.
     """
     
-    data = {
+    return {
         "model": "mistral-small-latest",
         "messages": [
             {"role": "system", "content": system_message},
             {"role": "user", "content": prompt}
         ],
-        "temperature": 0.7,
-        "max_tokens": 2000,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
         "response_format": {"type": "json_object"}  # Request JSON format specifically
     }
+
+# Function to build the request for the descriptions of a batch of skeleton nodes
+def build_descriptions_request(prompt, nodes, batch, industry=None, temperature=0.7):
+    industry_context = f"The flowchart is for the {industry} industry." if industry else ""
+    # A compact outline of the whole chart gives each batch the context of its neighbours
+    outline = "\n".join(
+        f"{node['id']} ({node.get('type', 'process')}): {node.get('text', '')} -> {', '.join(node.get('connections', []))}"
+        for node in nodes
+    )
+    
+    system_message = f"""You are a flowchart designer documenting the steps of a flowchart. {industry_context}
+    The flowchart was created for this request: {prompt}
+    
+    Flowchart outline:
+    {outline}
     
+    For each node ID the user lists, write a detailed explanation including:
+       - Purpose: What this step does and why it's important
+       - Implementation: How this step is typically executed or implemented
+       - Technical details: For programming flowcharts, include relevant code concepts, functions or methods
+       - Best practices: Recommendations for this step
+       - Common issues: Potential problems or edge cases to be aware of
+    
+    Format your response as JSON mapping node IDs to descriptions:
+    {{"descriptions": {{"node1": "Purpose: ... Implementation: ... Technical details: ..."}}}}
+    """
+    
+    max_tokens = int((BUDGET_OVERHEAD + len(batch) * TOKENS_PER_NODE) * SAFETY_MARGIN)
+    return {
+        "model": "mistral-small-latest",
+        "messages": [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": "Describe these nodes: " + ", ".join(node["id"] for node in batch)}
+        ],
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "response_format": {"type": "json_object"}
+    }
+
+# Function to parse the model output into flowchart data, returning None if it can't be used
+def try_parse_flowchart_content(content):
+    # First attempt: Try to parse the content directly as JSON
     try:
-        response = requests.post(url, headers=headers, data=json.dumps(data))
-        response.raise_for_status()
+        flowchart_data = json.loads(content)
+        # Validate basic structure
+        if "nodes" not in flowchart_data:
+            st.warning("Response didn't contain 'nodes' field. Adding default structure.")
+            return None
+        return flowchart_data
         
-        # Extract the JSON content from the response
-        result = response.json()
-        content = result['choices'][0]['message']['content']
+    except json.JSONDecodeError as e:
+        st.error(f"JSON parsing error: {str(e)}")
         
-        # Remove debug expander
-        # First attempt: Try to parse the content directly as JSON
-        try:
-            flowchart_data = json.loads(content)
-            # Validate basic structure
-            if "nodes" not in flowchart_data:
-                st.warning("Response didn't contain 'nodes' field. Adding default structure.")
-                flowchart_data = {"nodes": [
-                    {"id": "node1", "text": "Start", "type": "start", "connections": ["node2"], "icon": "fa-play-circle", 
-                     "description": "Starting point of the process."},
-                    {"id": "node2", "text": "End", "type": "end", "connections": [], "icon": "fa-flag-checkered", 
-                     "description": "End of the process."}
-                ]}
+        # Second attempt: Single-pass recovery of every complete node, dropping only the broken tail
+        flowchart_data = recover_flowchart_json(content)
+        if flowchart_data is not None:
+            st.success(f"Recovered {len(flowchart_data['nodes'])} nodes from the malformed JSON.")
             return flowchart_data
-            
-        except json.JSONDecodeError as e:
-            st.error(f"JSON parsing error: {str(e)}")
-            
-            # Second attempt: Clean up the content to extract JSON
-            match = re.search(r'\{[\s\S]*"nodes"[\s\S]*\}', content)
-            if match:
-                try:
-                    json_str = match.group(0)
-                    # Fix common JSON errors
-                    json_str = re.sub(r',\s*}', '}', json_str)  # Remove trailing commas
-                    json_str = re.sub(r',\s*]', ']', json_str)  # Remove trailing commas in arrays
-                    flowchart_data = json.loads(json_str)
-                    st.success("Successfully parsed JSON after cleanup.")
-                    return flowchart_data
-                except json.JSONDecodeError as e2:
-                    st.error(f"Failed to parse JSON after cleanup: {str(e2)}")
-                    
-            # Last resort: Create a minimal default flowchart
-            st.warning("Creating a default flowchart structure")
-            return {
-                "nodes": [
-                    {"id": "node1", "text": "Start", "type": "start", "connections": ["node2"], "icon": "fa-play-circle", 
-                     "description": "Starting point of the process."},
-                    {"id": "node2", "text": "Process", "type": "process", "connections": ["node3"], "icon": "fa-cog", 
-                     "description": "Main processing step."},
-                    {"id": "node3", "text": "End", "type": "end", "connections": [], "icon": "fa-flag-checkered", 
-                     "description": "End of the process."}
-                ]
-            }
+        st.error("Failed to recover any nodes from the response.")
+        return None
+
+# Function to call the API and parse the completion, returning None if the content can't be used
+def request_flowchart_data(api_key, request_data, session_id=None, hedge_budget=None):
+    return try_parse_flowchart_content(request_completion_content(api_key, request_data, session_id, hedge_budget))
+
+# Function to make one scheduled chat-completions call and return the message content
+def request_completion_content(api_key, request_data, session_id=None, hedge_budget=None):
+    # Wait for this session's turn under the key's request/token budgets
+    scheduler = get_scheduler()
+    tokens = estimate_request_tokens(request_data)
+    ticket = scheduler.acquire(api_key, session_id, tokens)
+    hedger = get_hedged_requester()
+    
+    if hedge_budget:
+        # Duplicate the call if it runs past the usual p90; a hedge only goes out if a slot is free right now
+        hedge_tickets = []
+        
+        def attempt(cancel_event):
+            return get_client().collect_chat_completion(api_key, request_data, cancel_event)
+        
+        def can_hedge():
+            hedge_ticket = scheduler.try_acquire(api_key, session_id, tokens)
+            if hedge_ticket is None:
+                return False
+            hedge_tickets.append(hedge_ticket)
+            return True
+        
+        used_tokens = 0
+        try:
+            result = hedger.run(attempt, can_hedge, hedge_budget)
+            # Streamed completions carry no usage: prompt estimate plus ~4 characters per generated token
+            used_tokens = tokens - request_data["max_tokens"] + len(result["choices"][0]["message"]["content"]) // 4
+        finally:
+            # Both tickets reserved the same tokens, so charge the winner's usage to one and refund the
+            # cancelled copy in full; if every copy failed, nothing was generated and both are refunded
+            scheduler.settle(ticket, used_tokens)
+            for hedge_ticket in hedge_tickets:
+                scheduler.settle(hedge_ticket, 0)
+    else:
+        # Shared pooled client: keep-alive connections, timeouts and retry/backoff
+        used_tokens = 0
+        try:
+            start_time = time.monotonic()
+            result = get_client().chat_completion(api_key, request_data)
+            hedger.histogram.record(time.monotonic() - start_time)
+            used_tokens = result.get("usage", {}).get("total_tokens")
+        finally:
+            # A failed call (rate limited, timed out, circuit open) generated nothing: refund its reservation
+            scheduler.settle(ticket, used_tokens)
+    
+    # Extract the JSON content from the response
+    return result['choices'][0]['message']['content']
+
+# Function to generate flowchart description using Mistral
+def generate_flowchart_description(prompt, api_key, industry=None, use_cache=True, similarity_threshold=None,
+                                   max_tokens=2000, temperature=0.7, session_id=None, skeleton=False,
+                                   hedge_budget=None, fallback=True, base_max_tokens=None):
+    data = build_flowchart_request(prompt, industry, max_tokens, temperature, skeleton)
+    kind = "skeleton" if skeleton else "flowchart"
+    # Keyed on the optimization level's budget rather than the one estimated from the prompt, which
+    # punctuation alone changes, so rewordings of a prompt still find each other in the cache
+    key_data = dict(data, max_tokens=base_max_tokens or max_tokens)
+    
+    if use_cache:
+        cached = lookup_flowchart_response(prompt, industry, key_data, similarity_threshold, kind)
+        if cached is not None:
+            return cached
+    
+    try:
+        # Identical requests already in flight wait for that call instead of starting their own
+        flight_key = get_request_cache_key(prompt, industry, key_data, kind)
+        flowchart_data = get_single_flight().do(flight_key, request_flowchart_data, api_key, data, session_id,
+                                                 hedge_budget)
+        if flowchart_data is None:
+            if not fallback:
+                return None
+            return create_default_flowchart("The model's response could not be used", "invalid_response")
+        
+        # Only real generations are cached, never the fallback charts
+        if use_cache:
+            store_flowchart_response(prompt, industry, key_data, flowchart_data, kind)
+        return flowchart_data
         
+    except SchedulerBusyError as e:
+        # Backpressure: tell the user to retry rather than showing a placeholder chart
+        st.warning(f"The service is busy: {str(e)}")
+        return None
     except Exception as e:
-        st.error(f"Error calling Mistral API: {str(e)}")
-        st.info("Creating a default flowchart as fallback.")
-        return {
-            "nodes": [
-                {"id": "node1", "text": "Start", "type": "start", "connections": ["node2"], "icon": "fa-play-circle", 
-                 "description": "Starting point of the process."},
-                {"id": "node2", "text": "Process", "type": "process", "connections": ["node3"], "icon": "fa-cog", 
-                 "description": "Main processing step."},
-                {"id": "node3", "text": "End", "type": "end", "connections": [], "icon": "fa-flag-checkered", 
-                 "description": "End of the process."}
-            ]
-        }
+        if not isinstance(e, CircuitOpenError):
+            st.error(f"Error calling Mistral API: {str(e)}")
+        if not fallback:
+            return None
+        return fallback_for_error(e)
 
-# Helper function to create a default flowchart
-def create_default_flowchart():
-    logger.info("Creating default flowchart")
+# Function to stream a flowchart description from Mistral node by node
+def stream_flowchart_description(prompt, api_key, industry=None, use_cache=True, similarity_threshold=None,
+                                 max_tokens=2000, temperature=0.7, session_id=None, base_max_tokens=None):
+    """Yield ("queued", position) while waiting for a slot, ("tokens", count) per delta,
+    ("node", node) as each node closes, then ("done", flowchart_data)"""
+    data = build_flowchart_request(prompt, industry, max_tokens, temperature)
+    key_data = dict(data, max_tokens=base_max_tokens or max_tokens)
+    
+    if use_cache:
+        cached = lookup_flowchart_response(prompt, industry, key_data, similarity_threshold)
+        if cached is not None:
+            for node in cached["nodes"]:
+                yield "node", node
+            yield "done", cached
+            return
+    
+    single_flight = get_single_flight()
+    flight_key = get_request_cache_key(prompt, industry, key_data)
+    future, is_leader = single_flight.begin(flight_key)
+    
+    if not is_leader:
+        # An identical request is already streaming: share its result
+        try:
+            flowchart_data = future.result()
+        except Exception as e:
+            if not isinstance(e, CircuitOpenError):
+                st.error(f"Error calling Mistral API: {str(e)}")
+            yield "done", fallback_for_error(e)
+            return
+        if flowchart_data is None:
+            yield "done", create_default_flowchart("The model's response could not be used", "invalid_response")
+            return
+        for node in flowchart_data["nodes"]:
+            yield "node", node
+        yield "done", flowchart_data
+        return
+    
+    parser = IncrementalNodeParser()
+    chunks = []
+    finished = False
+    scheduler = get_scheduler()
+    ticket = None
+    
+    try:
+        ticket = scheduler.submit(api_key, session_id, estimate_request_tokens(data))
+        while not scheduler.wait(ticket, timeout=0.25):
+            yield "queued", scheduler.position(ticket)
+        
+        for delta in get_client().stream_chat_completion(api_key, data):
+            chunks.append(delta)
+            yield "tokens", len(chunks)
+            for node in parser.feed(delta):
+                yield "node", node
+        
+        flowchart_data = try_parse_flowchart_content("".join(chunks))
+        single_flight.finish(flight_key, future, flowchart_data)
+        finished = True
+        if flowchart_data is None:
+            yield "done", create_default_flowchart("The model's response could not be used", "invalid_response")
+            return
+        if use_cache:
+            store_flowchart_response(prompt, industry, key_data, flowchart_data)
+        yield "done", flowchart_data
+        
+    except SchedulerBusyError as e:
+        single_flight.finish(flight_key, future, exception=e)
+        finished = True
+        st.warning(f"The service is busy: {str(e)}")
+        yield "done", None
+    except Exception as e:
+        if not finished:
+            single_flight.finish(flight_key, future, exception=e)
+            finished = True
+        if not isinstance(e, CircuitOpenError):
+            st.error(f"Error streaming from Mistral API: {str(e)}")
+        parser.close()
+        if parser.nodes:
+            # Keep the nodes that arrived before the stream broke
+            st.warning(f"Using the {len(parser.nodes)} nodes received before the error.")
+            yield "done", {"nodes": list(parser.nodes)}
+        else:
+            yield "done", fallback_for_error(e)
+    finally:
+        if ticket is not None:
+            scheduler.cancel(ticket)
+            # Charge what was streamed, even if the stream broke; a call that generated nothing is refunded
+            scheduler.settle(ticket, estimate_request_tokens(data) - max_tokens + len(chunks) if chunks else 0)
+        if not finished:
+            # The consumer stopped reading mid-stream; don't leave followers waiting
+            single_flight.finish(flight_key, future, exception=MistralAPIError("Streaming request was abandoned"))
+
+# Function to fetch the descriptions of skeleton nodes in parallel batches
+def fetch_node_descriptions(prompt, api_key, nodes, industry=None, use_cache=True, temperature=0.7,
+                            session_id=None, batch_size=DESCRIPTION_BATCH_SIZE):
+    """Yield ({node_id: description}, error) as each batch of descriptions arrives.
+    
+    Runs on the calling thread apart from the HTTP calls, so callers can
+    update Streamlit elements between batches.
+    """
+    pending = [node for node in nodes if not node.get("description")]
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    if not batches:
+        return
+    
+    def fetch(batch):
+        data = build_descriptions_request(prompt, nodes, batch, industry, temperature)
+        cache_key = get_request_cache_key(prompt, industry, data, "descriptions", [node["id"] for node in batch])
+        if use_cache:
+            cached = check_cached_response(cache_key)
+            if cached is not None:
+                return cached
+        content = get_single_flight().do(cache_key, request_completion_content, api_key, data, session_id)
+        parsed = json.loads(content)
+        descriptions = parsed.get("descriptions", parsed) if isinstance(parsed, dict) else {}
+        # Keep only string descriptions for nodes that were asked for
+        wanted = {node["id"] for node in batch}
+        descriptions = {node_id: text for node_id, text in descriptions.items()
+                        if node_id in wanted and isinstance(text, str)}
+        if use_cache and descriptions:
+            cache_response(cache_key, descriptions)
+        return descriptions
+    
+    executor = _generation_executor()
+    futures = [executor.submit(fetch, batch) for batch in batches]
+    try:
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                yield future.result(), None
+            except Exception as e:
+                logger.warning(f"Could not fetch node descriptions: {str(e)}")
+                yield {}, e
+    finally:
+        for future in futures:
+            future.cancel()
+
+def merge_node_descriptions(flowchart_data, descriptions):
+    """Return a copy of the flowchart with the given descriptions filled in"""
     return {
+        **flowchart_data,
         "nodes": [
-            {"id": "node1", "text": "Start", "type": "start", "connections": ["node2"], "icon": "fa-play-circle", 
-             "description": "Starting point of the process."},
-            {"id": "node2", "text": "Process", "type": "process", "connections": ["node3"], "icon": "fa-cog", 
-             "description": "Main processing step."},
-            {"id": "node3", "text": "End", "type": "end", "connections": [], "icon": "fa-flag-checkered", 
-             "description": "End of the process."}
+            dict(node, description=descriptions[node["id"]])
+            if node.get("id") in descriptions and not node.get("description") else node
+            for node in flowchart_data["nodes"]
         ]
     }
 
-# Function to calculate layout for nodes
-def calculate_layout(nodes, orientation="landscape"):
-    # Basic layout algorithm - arrange nodes in a tree-like structure
-    node_map = {node["id"]: node for node in nodes}
-    layout = []
-    
-    # Find start node (typically has no incoming connections)
-    incoming_connections = set()
-    for node in nodes:
-        for conn in node.get("connections", []):
-            incoming_connections.add(conn)
-    
-    start_nodes = [node for node in nodes if node["id"] not in incoming_connections]
-    
-    if not start_nodes:
-        # If no clear start node, use the first node
-        start_nodes = [nodes[0]]
-    
-    # Calculate positions using a simple hierarchical layout
-    level_width = 300  # Increased from 200
-    level_height = 200  # Increased from 150
-    current_level = 0
-    levels = {current_level: start_nodes}
-    processed = set()
-    
-    # Track decision nodes for special handling
-    decision_nodes = []
-    
-    while levels.get(current_level, []):
-        level_nodes = levels[current_level]
-        levels[current_level + 1] = []
-        
-        # Sort level nodes by their connections to minimize crossings
-        if current_level > 0:
-            level_nodes.sort(key=lambda n: sorted(n.get("connections", [])))
-        
-        for i, node in enumerate(level_nodes):
-            # Skip if already processed
-            if node["id"] in processed:
-                continue
-                
-            processed.add(node["id"])
-            
-            # Calculate position based on orientation
-            x = 0
-            y = 0
-            if orientation == "landscape":
-                x = 50 + (1000 / (len(level_nodes) + 1)) * (i + 1) - 60
-                y = 50 + current_level * level_height
-            else:  # portrait
-                x = 50 + current_level * level_width
-                y = 50 + (800 / (len(level_nodes) + 1)) * (i + 1) - 60
-            
-            layout.append({
-                "node": node,
-                "x": x,
-                "y": y,
-                "width": 120,  # Standard node width
-                "height": 80   # Standard node height
-            })
-            
-            # Track decision nodes
-            if node["type"] == "decision":
-                decision_nodes.append(node["id"])
-            
-            # Add connected nodes to the next level
-            for conn_id in node.get("connections", []):
-                if conn_id not in processed and conn_id in node_map:
-                    levels[current_level + 1].append(node_map[conn_id])
-        
-        current_level += 1
-    
-    return layout
-
-# Function to calculate connector points at node borders
-def calculate_connector_points(source_node, target_node):
-    # Get node positions and dimensions
-    source_x = source_node["x"]
-    source_y = source_node["y"]
-    target_x = target_node["x"]
-    target_y = target_node["y"]
-    
-    # Node dimensions
-    source_width = source_node["width"]
-    source_height = source_node["height"]
-    target_width = target_node["width"]
-    target_height = target_node["height"]
-    
-    # Calculate center points
-    source_center_x = source_x + source_width / 2
-    source_center_y = source_y + source_height / 2
-    target_center_x = target_x + target_width / 2
-    target_center_y = target_y + target_height / 2
-    
-    # Calculate angle between centers
-    angle = math.atan2(target_center_y - source_center_y, target_center_x - source_center_x)
-    
-    # Calculate intersection points with node borders
-    # For source node
-    if abs(math.cos(angle)) > abs(math.sin(angle)):
-        # Horizontal intersection
-        if target_center_x > source_center_x:
-            source_point_x = source_x + source_width
-        else:
-            source_point_x = source_x
-        source_point_y = source_center_y
-    else:
-        # Vertical intersection
-        if target_center_y > source_center_y:
-            source_point_y = source_y + source_height
-        else:
-            source_point_y = source_y
-        source_point_x = source_center_x
-    
-    # For target node
-    if abs(math.cos(angle)) > abs(math.sin(angle)):
-        # Horizontal intersection
-        if target_center_x > source_center_x:
-            target_point_x = target_x
-        else:
-            target_point_x = target_x + target_width
-        target_point_y = target_center_y
-    else:
-        # Vertical intersection
-        if target_center_y > source_center_y:
-            target_point_y = target_y
-        else:
-            target_point_y = target_y + target_height
-        target_point_x = target_center_x
-    
-    # Adjust for decision nodes
-    if source_node["node"]["type"] == "decision":
-        # Adjust the source point for diamond shape
-        # Calculate based on angle to determine which point of the diamond to use
-        diagonal_angle = math.atan2(target_center_y - source_center_y, target_center_x - source_center_x)
-        diagonal_deg = math.degrees(diagonal_angle) % 360
-        
-        if diagonal_deg >= 315 or diagonal_deg < 45:  # Right point
-            source_point_x = source_center_x + source_width / 2
-            source_point_y = source_center_y
-        elif diagonal_deg >= 45 and diagonal_deg < 135:  # Bottom point
-            source_point_x = source_center_x
-            source_point_y = source_center_y + source_height / 2
-        elif diagonal_deg >= 135 and diagonal_deg < 225:  # Left point
-            source_point_x = source_center_x - source_width / 2
-            source_point_y = source_center_y
-        else:  # Top point (225-315)
-            source_point_x = source_center_x
-            source_point_y = source_center_y - source_height / 2
-    
-    if target_node["node"]["type"] == "decision":
-        # Adjust the target point for diamond shape
-        # Calculate based on angle to determine which point of the diamond to use
-        diagonal_angle = math.atan2(target_center_y - source_center_y, target_center_x - source_center_x)
-        diagonal_deg = math.degrees(diagonal_angle) % 360
-        
-        if diagonal_deg >= 315 or diagonal_deg < 45:  # Right point (coming from left)
-            target_point_x = target_center_x - target_width / 2
-            target_point_y = target_center_y
-        elif diagonal_deg >= 45 and diagonal_deg < 135:  # Bottom point (coming from top)
-            target_point_x = target_center_x
-            target_point_y = target_center_y - target_height / 2
-        elif diagonal_deg >= 135 and diagonal_deg < 225:  # Left point (coming from right)
-            target_point_x = target_center_x + target_width / 2
-            target_point_y = target_center_y
-        else:  # Top point (coming from bottom) (225-315)
-            target_point_x = target_center_x
-            target_point_y = target_center_y + target_height / 2
-    
-    return source_point_x, source_point_y, target_point_x, target_point_y
-
-# Helper function to generate CSS for connectors based on theme and style
-def generate_connector_css(theme, source_x, source_y, target_x, target_y, angle, length):
-    style = theme["connector"]["style"]
-    color = theme["connector"]["color"]
-    thickness = theme["connector"]["thickness"]
-    
-    css = f"left: {source_x}px; top: {source_y}px; width: {length}px; transform: rotate({angle}deg); transform-origin: 0 0;"
-    
-    if style == "straight":
-        return f"background-color: {color}; height: {thickness}; {css}"
-    elif style == "dashed":
-        return f"background-color: {color}; height: {thickness}; border-top-style: dashed; {css}"
-    elif style == "curved":
-        # For curved, we'll still use straight but add a different class
-        return f"background-color: {color}; height: {thickness}; {css}"
-    elif style == "gradient":
-        return f"background: linear-gradient(90deg, {color}, {color}FF); height: {thickness}; {css}"
-    else:
-        return f"background-color: {color}; height: {thickness}; {css}"
-
-# Helper function to get shape CSS based on node type and theme
-def get_node_shape_css(node_type, theme):
-    shape = theme["node_styles"][node_type]["shape"]
-    
-    if shape == "rounded":
-        return "border-radius: 8px;"
-    elif shape == "rectangle":
-        return "border-radius: 2px;"
-    elif shape == "diamond":
-        return "transform: rotate(45deg); width: 120px; height: 120px;"
-    elif shape == "pill" or shape == "capsule":
-        return "border-radius: 50px;"
-    else:
-        return "border-radius: 8px;"  # Default
-
-# Function to get Font Awesome icon for node type
-def get_icon_for_node(node):
-    # Check if node has a custom icon
-    if "icon" in node and node["icon"]:
-        # Make sure it has the fa- prefix
-        if not node["icon"].startswith("fa-"):
-            return f"fa-{node['icon']}"
-        return node["icon"]
-    
-    # Default icons based on node type
-    default_icons = {
-        "start": "fa-play-circle",
-        "process": "fa-cog",
-        "decision": "fa-question-circle",
-        "end": "fa-flag-checkered"
-    }
-    
-    return default_icons.get(node["type"], "fa-circle")
+# Shared pool for parallel generation calls, so concurrent sessions can't spawn unbounded threads
+_generation_pool = None
+_generation_pool_lock = threading.Lock()
 
-# Function to generate HTML/CSS for the flowchart
-def generate_flowchart_html(flowchart_data, theme_key, orientation="landscape", zoom_level=1.0):
-    # Generate unique IDs for this flowchart
-    chart_id = f"flowchart-{uuid.uuid4().hex[:8]}"
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    
-    # Get the selected theme
-    theme = DESIGN_THEMES[theme_key]
+def _generation_executor():
+    global _generation_pool
+    with _generation_pool_lock:
+        if _generation_pool is None:
+            _generation_pool = concurrent.futures.ThreadPoolExecutor(max_workers=GENERATION_WORKERS,
+                                                                     thread_name_prefix="generation")
+        return _generation_pool
+
+# Function to fill in the descriptions of a skeleton flowchart
+def complete_node_descriptions(skeleton, prompt, api_key, industry=None, use_cache=True, temperature=0.7,
+                               session_id=None, on_descriptions=None):
+    """Fetch descriptions for a skeleton's nodes in parallel batches and merge them in.
     
-    # CSS for the flowchart
-    css = f"""
-    <style>
-        @import url('https://fonts.googleapis.com/css2?family=Roboto:wght@400;500&family=Open+Sans:wght@400;600&family=Comfortaa:wght@400;700&family=IBM+Plex+Sans:wght@400;500&family=Quicksand:wght@500;600&family=Montserrat:wght@400;500&display=swap');
-        @import url('https://cdnjs.cloudflare.com/ajax/libs/font-awesome/5.15.4/css/all.min.css');
-        
-        #{chart_id} {{
-            font-family: {theme["font"]};
-            display: flex;
-            flex-direction: column;
-            align-items: center;
-            padding: 20px;
-            overflow: hidden;
-            background-color: white;
-            border-radius: 12px;
-            min-height: 700px;
-            position: relative;
-            transition: background-color 0.3s ease;
-        }}
-        
-        #{chart_id}.dark-mode {{
-            background-color: #1a1a1a;
-        }}
-        
-        #{chart_id} .flowchart-container {{
-            position: relative;
-            background-color: transparent;
-            border-radius: 12px;
-            padding: 20px;
-            transform-origin: center center;
-            transform: scale({zoom_level}) translate(0px, 0px);
-            transition: transform 0.3s ease;
-            margin: auto;
-        }}
-        
-        #{chart_id} .controls {{
-            position: fixed;
-            bottom: 15px;
-            right: 15px;
-            z-index: 1000;
-            background: white;
-            padding: 3px;
-            border-radius: 6px;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.08);
-            display: flex;
-            gap: 3px;
-            align-items: center;
-            transition: background-color 0.3s ease;
-        }}
-        
-        #{chart_id}.dark-mode .controls {{
-            background: #2d2d2d;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.3);
-        }}
-        
-        #{chart_id} .navigation-controls {{
-            position: fixed;
-            left: 15px;
-            bottom: 15px;
-            z-index: 1000;
-            background: white;
-            padding: 3px;
-            border-radius: 6px;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.08);
-            display: grid;
-            grid-template-columns: repeat(3, 1fr);
-            gap: 1px;
-            transition: background-color 0.3s ease;
-        }}
-        
-        #{chart_id}.dark-mode .navigation-controls {{
-            background: #2d2d2d;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.3);
-        }}
-        
-        #{chart_id} .controls button,
-        #{chart_id} .navigation-controls button {{
-            background: {theme["node_styles"]["process"]["bg"]};
-            color: {theme["node_styles"]["process"]["text"]};
-            border: none;
-            padding: 3px 6px;
-            border-radius: 4px;
-            cursor: pointer;
-            font-size: 11px;
-            transition: all 0.2s ease;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            min-width: 24px;
-            min-height: 24px;
-            box-shadow: 0 1px 3px rgba(0,0,0,0.1);
-        }}
-        
-        #{chart_id}.dark-mode .controls button,
-        #{chart_id}.dark-mode .navigation-controls button {{
-            background: #3d3d3d;
-            color: #ffffff;
-            box-shadow: 0 2px 5px rgba(0,0,0,0.3);
-        }}
-        
-        #{chart_id} .controls button:hover,
-        #{chart_id} .navigation-controls button:hover {{
-            transform: translateY(-2px);
-            box-shadow: 0 4px 8px rgba(0,0,0,0.15);
-        }}
-        
-        #{chart_id}.dark-mode .controls button:hover,
-        #{chart_id}.dark-mode .navigation-controls button:hover {{
-            box-shadow: 0 4px 8px rgba(0,0,0,0.4);
-        }}
-        
-        #{chart_id} .controls .reset-btn:hover,
-        #{chart_id} .navigation-controls .reset-btn:hover {{
-            background: {theme["node_styles"]["start"]["bg"]}DD;
-        }}
-        
-        #{chart_id}.dark-mode .controls .reset-btn:hover,
-        #{chart_id}.dark-mode .navigation-controls .reset-btn:hover {{
-            background: #4a4a4a;
-            color: #ffffff;
-        }}
-        
-        #{chart_id} .navigation-controls .up-btn {{
-            grid-column: 2;
-        }}
-        
-        #{chart_id} .navigation-controls .left-btn {{
-            grid-column: 1;
-            grid-row: 2;
-        }}
-        
-        #{chart_id} .navigation-controls .center-btn {{
-            grid-column: 2;
-            grid-row: 2;
-        }}
-        
-        #{chart_id} .navigation-controls .right-btn {{
-            grid-column: 3;
-            grid-row: 2;
-        }}
-        
-        #{chart_id} .navigation-controls .down-btn {{
-            grid-column: 2;
-            grid-row: 3;
-        }}
-        
-        #{chart_id} .controls .zoom-level {{
-            background: {theme["node_styles"]["process"]["bg"]};
-            color: {theme["node_styles"]["process"]["text"]};
-            padding: 4px 8px;
-            border-radius: 4px;
-            font-size: 12px;
-            min-width: 50px;
-            text-align: center;
-            box-shadow: 0 2px 5px rgba(0,0,0,0.1);
-        }}
-        
-        #{chart_id}.dark-mode .controls .zoom-level {{
-            background: #3d3d3d;
-            color: #ffffff;
-            box-shadow: 0 2px 5px rgba(0,0,0,0.3);
-        }}
-        
-        #{chart_id} .controls .theme-toggle {{
-            background: #f0f0f0;
-            color: #333;
-        }}
-        
-        #{chart_id}.dark-mode .controls .theme-toggle {{
-            background: #4a4a4a;
-            color: #fff;
-        }}
-        
-        #{chart_id} .node {{
-            position: absolute;
-            padding: 15px;
-            min-width: 120px;
-            text-align: center;
-            font-weight: 500;
-            font-size: 14px;
-            z-index: 3;
-            transition: transform 0.1s, box-shadow 0.1s;
-            border: 2px solid rgba(0, 0, 0, 0.1);
-            box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-            cursor: move;
-            user-select: none;
-            touch-action: none;
-        }}
-        
-        #{chart_id} .node.dragging {{
-            opacity: 0.8;
-            z-index: 1000;
-            box-shadow: 0 8px 15px rgba(0,0,0,0.2);
-        }}
-        
-        #{chart_id}.dark-mode .node {{
-            box-shadow: 0 4px 6px rgba(0,0,0,0.3);
-        }}
-        
-        #{chart_id} .node:hover {{
-            transform: translateY(-3px);
-            box-shadow: 0 8px 15px rgba(0,0,0,0.1) !important;
-            border-color: rgba(0, 0, 0, 0.2);
-        }}
-        
-        #{chart_id}.dark-mode .node:hover {{
-            box-shadow: 0 8px 15px rgba(0,0,0,0.3) !important;
-        }}
-        
-        #{chart_id} .node-start {{
-            background-color: {theme["node_styles"]["start"]["bg"]};
-            color: {theme["node_styles"]["start"]["text"]};
-            box-shadow: {theme["node_styles"]["start"]["shadow"]};
-            {get_node_shape_css("start", theme)}
-            border-color: {theme["node_styles"]["start"]["bg"]}CC;
-        }}
-        
-        #{chart_id} .node-end {{
-            background-color: {theme["node_styles"]["end"]["bg"]};
-            color: {theme["node_styles"]["end"]["text"]};
-            box-shadow: {theme["node_styles"]["end"]["shadow"]};
-            {get_node_shape_css("end", theme)}
-            border-color: {theme["node_styles"]["end"]["bg"]}CC;
-        }}
-        
-        #{chart_id} .node-process {{
-            background-color: {theme["node_styles"]["process"]["bg"]};
-            color: {theme["node_styles"]["process"]["text"]};
-            box-shadow: {theme["node_styles"]["process"]["shadow"]};
-            {get_node_shape_css("process", theme)}
-            border-color: {theme["node_styles"]["process"]["bg"]}CC;
-        }}
-        
-        #{chart_id} .node-decision {{
-            background-color: {theme["node_styles"]["decision"]["bg"]};
-            color: {theme["node_styles"]["decision"]["text"]};
-            box-shadow: {theme["node_styles"]["decision"]["shadow"]};
-            {get_node_shape_css("decision", theme)}
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            transform: rotate(45deg);
-            border-color: {theme["node_styles"]["decision"]["bg"]}CC;
-            min-width: 120px;
-            min-height: 120px;
-            max-width: 120px;
-            max-height: 120px;
-        }}
-        
-        #{chart_id} .node-decision:hover {{
-            transform: rotate(45deg) translateY(-3px);
-            box-shadow: 0 8px 15px rgba(0,0,0,0.15) !important;
-            border-color: {theme["node_styles"]["decision"]["bg"]}EE;
-        }}
-        
-        #{chart_id}.dark-mode .node-decision:hover {{
-            box-shadow: 0 8px 15px rgba(0,0,0,0.4) !important;
-        }}
-        
-        #{chart_id} .node-decision .content {{
-            transform: rotate(-45deg);
-            width: 130px;
-            height: 130px;
-            display: flex;
-            flex-direction: column;
-            align-items: center;
-            justify-content: center;
-            text-align: center;
-            padding: 5px;
-            font-size: 0.95em;
-        }}
-        
-        #{chart_id} .node-decision .icon {{
-            margin-bottom: 5px;
-            font-size: 22px;
-        }}
-        
-        #{chart_id} .connector {{
-            position: absolute;
-            height: {theme["connector"]["thickness"]};
-            z-index: 2;
-            pointer-events: none;
-        }}
-        
-        #{chart_id} .connector-line {{
-            position: absolute;
-            height: {theme["connector"]["thickness"]};
-            z-index: 2;
-            pointer-events: all;
-            cursor: pointer;
-            background-color: transparent;
-        }}
-        
-       
-        
-        #{chart_id} .connector.curved:after {{
-            right: 50%;
-            top: -5px;
-            border-width: 6px 0 6px 10px;
-            border-color: transparent transparent transparent green;
-            z-index: 5;
-        }}
-        
-        #{chart_id} .connector.dashed:after {{
-            border-style: dashed;
-            border-width: 5px 0 5px 8px;
-            right: 50%;
-            border-color: transparent transparent transparent green;
-            z-index: 5;
-        }}
-         #{chart_id} .connector:after {{
-            content: '';
-            position: absolute;
-            right: 5%;
-            top: -4px;
-            width: 0;
-            height: 0;
-            border-style: solid;
-            border-width: 5px 0 5px 8px;
-            border-color: transparent transparent transparent green;
-            z-index: 5;
-        }}
-        #{chart_id} .connector.gradient:after {{
-            border-color: transparent transparent transparent green;
-            right: 50%;
-            z-index: 5;
-        }}
-        
-        #{chart_id} .label {{
-            position: absolute;
-            background-color: white;
-            padding: 3px 8px;
-            border-radius: 4px;
-            font-size: 12px;
-            box-shadow: 0 1px 3px rgba(0,0,0,0.1);
-            z-index: 4;
-            border: 1px solid rgba(0,0,0,0.1);
-            transform: translate(-50%, -50%);
-            white-space: nowrap;
-            cursor: move;
-            user-select: none;
-            touch-action: none;
-        }}
-        
-        #{chart_id}.dark-mode .label {{
-            background-color: #2d2d2d;
-            color: white;
-            border-color: rgba(255,255,255,0.1);
-        }}
-        
-        #{chart_id} .label.dragging {{
-            opacity: 0.8;
-            z-index: 1000;
-        }}
-        
-        #{chart_id} .label.yes {{
-            background-color: #4CAF50;
-            color: white;
-            border: none;
-        }}
-        
-        #{chart_id} .label.no {{
-            background-color: #f44336;
-            color: white;
-            border: none;
-        }}
-        
-        #{chart_id}.dark-mode .label.yes {{
-            background-color: #2E7D32;
-        }}
-        
-        #{chart_id}.dark-mode .label.no {{
-            background-color: #C62828;
-        }}
-        
-        #{chart_id} .icon {{
-            display: block;
-            margin-bottom: 8px;
-            font-size: 24px;
-        }}
-        
-        /* Tooltip styles */
-        #{chart_id} .tooltip {{
-            position: absolute;
-            background-color: rgba(0, 0, 0, 0.85);
-            color: white;
-            padding: 12px 15px;
-            border-radius: 6px;
-            font-size: 12px;
-            z-index: 1000;
-            max-width: 320px;
-            min-width: 180px;
-            box-shadow: 0 4px 10px rgba(0, 0, 0, 0.3);
-            pointer-events: none;
-            opacity: 0;
-            transition: opacity 0.3s;
-            visibility: hidden;
-            word-wrap: break-word;
-            line-height: 1.4;
-        }}
-        
-        #{chart_id} .tooltip.visible {{
-            opacity: 1;
-            visibility: visible;
-        }}
-        
-        #{chart_id}.dark-mode .tooltip {{
-            background-color: rgba(40, 40, 40, 0.95);
-            color: #f0f0f0;
-            box-shadow: 0 4px 15px rgba(0, 0, 0, 0.5);
-        }}
-    </style>
+    `on_descriptions(done, total)` is called as batches complete.
     """
+    total = len([node for node in skeleton["nodes"] if not node.get("description")])
+    descriptions = {}
+    failed = 0
+    for batch, error in fetch_node_descriptions(prompt, api_key, skeleton["nodes"], industry, use_cache,
+                                                temperature, session_id):
+        descriptions.update(batch)
+        failed += error is not None
+        if on_descriptions:
+            on_descriptions(len(descriptions), total)
+    if failed:
+        st.warning(f"Details for {total - len(descriptions)} nodes could not be loaded.")
+    return merge_node_descriptions(skeleton, descriptions)
+
+# Function to generate a flowchart in two phases: structure first, then node descriptions
+def generate_flowchart_two_phase(prompt, api_key, industry=None, use_cache=True, similarity_threshold=None,
+                                 max_tokens=2000, temperature=0.7, session_id=None, hedge_budget=None,
+                                 base_max_tokens=None):
+    skeleton = generate_flowchart_description(prompt, api_key, industry, use_cache, similarity_threshold,
+                                              max_tokens, temperature, session_id, skeleton=True,
+                                              hedge_budget=hedge_budget, base_max_tokens=base_max_tokens)
+    if not skeleton or is_degraded(skeleton):
+        return skeleton
+    return complete_node_descriptions(skeleton, prompt, api_key, industry, use_cache, temperature, session_id)
+
+# Function to build the request for a high-level outline of a large process
+def build_outline_request(prompt, industry=None, temperature=0.7):
+    industry_context = f"The process is in the {industry} industry." if industry else ""
     
-    # Calculate layout based on orientation
-    layout = calculate_layout(flowchart_data["nodes"], orientation)
-    
-    # Set container dimensions based on orientation
-    container_width = 900 if orientation == "landscape" else 650
-    container_height = 650 if orientation == "landscape" else 900
-    
-    # Generate HTML for nodes and connections
-    nodes_html = ""
-    connections_html = ""
+    system_message = f"""You are a process analyst. {industry_context}
+    Split the process the user describes into 2 to {MAX_PHASES} consecutive high-level phases.
+    Every step of the process must belong to exactly one phase, in order.
     
-    # First generate all nodes
-    for node_info in layout:
-        node = node_info["node"]
-        x = node_info["x"]
-        y = node_info["y"]
-        
-        # Get icon for this node
-        icon = get_icon_for_node(node)
-        icon_html = f'<i class="icon fas {icon}"></i>' if theme["icons"] else ''
-        
-        # Get description for tooltip if available
-        description = node.get("description", "")
-        description_attr = f'data-description="{description}"' if description else ''
-        
-        # Different styling based on node type
-        if node["type"] == "decision":
-            nodes_html += f"""
-            <div id="{node['id']}" class="node node-{node['type']}" style="left: {x}px; top: {y}px;" {description_attr}>
-                <div class="content">
-                    {icon_html}
-                    {node['text']}
-                </div>
-            </div>
-            """
-        else:
-            nodes_html += f"""
-            <div id="{node['id']}" class="node node-{node['type']}" style="left: {x}px; top: {y}px;" {description_attr}>
-                {icon_html}
-                {node['text']}
-            </div>
-            """
-    
-    # Then generate all connections
-    for source_info in layout:
-        source_node = source_info["node"]
-        
-        for target_id in source_node.get("connections", []):
-            # Find target node info
-            target_info = next((n for n in layout if n["node"]["id"] == target_id), None)
-            if target_info:
-                # Calculate connector points at node borders
-                source_x, source_y, target_x, target_y = calculate_connector_points(source_info, target_info)
-                
-                # Calculate distance and angle for the connector
-                dx = target_x - source_x
-                dy = target_y - source_y
-                length = (dx**2 + dy**2)**0.5
-                angle = math.atan2(dy, dx) * (180 / math.pi)
-                
-                # Generate connection HTML with arrow
-                conn_id = f"conn-{source_node['id']}-{target_id}"
-                connector_style = generate_connector_css(theme, source_x, source_y, target_x, target_y, angle, length)
-                connector_class = f"connector {theme['connector']['style']}"
-                
-                connections_html += f"""
-                <div id="{conn_id}" class="{connector_class}" style="{connector_style}"></div>
-                <div id="line-{conn_id}" class="connector-line" style="{connector_style}"></div>
-                """
-                
-                # Add labels for decision paths if node is a decision
-                if source_node["type"] == "decision":
-                    # Calculate label position
-                    midx = source_x + (dx / 2)
-                    midy = source_y + (dy / 2)
-                    
-                    # Determine label text based on connection order
-                    label_text = "Yes" if source_node["connections"].index(target_id) == 0 else "No"
-                    label_class = "yes" if label_text == "Yes" else "no"
-                    
-                    connections_html += f"""
-                    <div class="label {label_class}" id="label-{source_node['id']}-{target_id}" 
-                         data-connector-id="{conn_id}" 
-                         data-source-id="{source_node['id']}" 
-                         data-target-id="{target_id}"
-                         style="left: {midx}px; top: {midy}px;">{label_text}</div>
-                    """
-    
-    # Add zoom controls with improved styling
-    controls_html = f"""
-    <div class="controls">
-        <button class="theme-toggle" onclick="toggleTheme()">
-            <i class="fas fa-moon"></i>
-        </button>
-        <button class="reset-btn" onclick="resetZoom()">
-            <i class="fas fa-sync-alt"></i>
-        </button>
-        <button onclick="zoomOut()">
-            <i class="fas fa-search-minus"></i>
-        </button>
-        <div class="zoom-level">{int(zoom_level * 100)}%</div>
-        <button onclick="zoomIn()">
-            <i class="fas fa-search-plus"></i>
-        </button>
-        <button class="reset-layout-btn" onclick="resetLayout()">
-            <i class="fas fa-undo"></i>
-        </button>
-    </div>
-    
-    <div class="navigation-controls">
-        <button class="up-btn" onclick="moveUp()">
-            <i class="fas fa-arrow-up"></i>
-        </button>
-        <button class="left-btn" onclick="moveLeft()">
-            <i class="fas fa-arrow-left"></i>
-        </button>
-        <button class="center-btn reset-btn" onclick="resetPosition()">
-            <i class="fas fa-crosshairs"></i>
-        </button>
-        <button class="right-btn" onclick="moveRight()">
-            <i class="fas fa-arrow-right"></i>
-        </button>
-        <button class="down-btn" onclick="moveDown()">
-            <i class="fas fa-arrow-down"></i>
-        </button>
-    </div>
-    
-    <div id="{chart_id}-tooltip" class="tooltip"></div>
-    
-    <script>
-        let currentX = 0;
-        let currentY = 0;
-        const moveStep = 50;
-        let currentScale = {zoom_level};
-        let isDarkMode = false;
-        
-        function toggleTheme() {{
-            const container = document.getElementById('{chart_id}');
-            const themeToggle = container.querySelector('.theme-toggle i');
-            
-            isDarkMode = !isDarkMode;
-            container.classList.toggle('dark-mode');
-            
-            if (isDarkMode) {{
-                themeToggle.classList.remove('fa-moon');
-                themeToggle.classList.add('fa-sun');
-            }} else {{
-                themeToggle.classList.remove('fa-sun');
-                themeToggle.classList.add('fa-moon');
-            }}
-        }}
-        
-        function getCurrentTransform() {{
-            const container = document.getElementById('{chart_id}').querySelector('.flowchart-container');
-            const transform = container.style.transform;
-            const scaleMatch = transform.match(/scale\(([^)]+)\)/);
-            const translateMatch = transform.match(/translate\(([^)]+)\)/);
-            
-            return {{
-                scale: scaleMatch ? parseFloat(scaleMatch[1]) : currentScale,
-                translate: translateMatch ? translateMatch[1].split(',').map(Number) : [currentX, currentY]
-            }};
-        }}
-        
-        function updateTransform() {{
-            const container = document.getElementById('{chart_id}').querySelector('.flowchart-container');
-            container.style.transform = `scale(${{currentScale}}) translate(${{currentX}}px, ${{currentY}}px)`;
-        }}
-        
-        function moveUp() {{
-            currentY += moveStep;
-            updateTransform();
-        }}
-        
-        function moveDown() {{
-            currentY -= moveStep;
-            updateTransform();
-        }}
-        
-        function moveLeft() {{
-            currentX += moveStep;
-            updateTransform();
-        }}
-        
-        function moveRight() {{
-            currentX -= moveStep;
-            updateTransform();
-        }}
-        
-        function resetPosition() {{
-            currentX = 0;
-            currentY = 0;
-            updateTransform();
-        }}
-        
-        function zoomIn() {{
-            if (currentScale < 2.0) {{
-                currentScale += 0.1;
-                updateTransform();
-                updateZoomLevel();
-            }}
-        }}
-        
-        function zoomOut() {{
-            if (currentScale > 0.5) {{
-                currentScale -= 0.1;
-                updateTransform();
-                updateZoomLevel();
-            }}
-        }}
-        
-        function resetZoom() {{
-            currentScale = 1.0;
-            updateTransform();
-            updateZoomLevel();
-        }}
-        
-        function updateZoomLevel() {{
-            const zoomLevel = document.getElementById('{chart_id}').querySelector('.zoom-level');
-            zoomLevel.textContent = Math.round(currentScale * 100) + '%';
-        }}
-        
-        // Dragging functionality
-        let isDragging = false;
-        let currentNode = null;
-        let offsetX = 0;
-        let offsetY = 0;
-        let nodePositions = new Map();
-        
-        // Store initial positions
-        function initializeNodePositions() {{
-            const nodes = document.querySelectorAll('#{chart_id} .node');
-            nodes.forEach(node => {{
-                nodePositions.set(node.id, {{
-                    x: parseInt(node.style.left),
-                    y: parseInt(node.style.top),
-                    width: node.offsetWidth,
-                    height: node.offsetHeight
-                }});
-            }});
-        }}
-        
-        // Store initial positions for reset functionality
-        let initialNodePositions = new Map();
-        
-        // Initialize after DOM loads
-        document.addEventListener('DOMContentLoaded', () => {{
-            initializeNodePositions();
-            // Store initial positions for reset
-            const nodes = document.querySelectorAll('#{chart_id} .node');
-            nodes.forEach(node => {{
-                initialNodePositions.set(node.id, {{
-                    x: parseInt(node.style.left),
-                    y: parseInt(node.style.top),
-                    width: node.offsetWidth,
-                    height: node.offsetHeight
-                }});
-            }});
-        }});
-        
-        // Reset layout to original positions
-        function resetLayout() {{
-            const nodes = document.querySelectorAll('#{chart_id} .node');
-            nodes.forEach(node => {{
-                const initialPos = initialNodePositions.get(node.id);
-                if (initialPos) {{
-                    node.style.left = `${{initialPos.x}}px`;
-                    node.style.top = `${{initialPos.y}}px`;
-                    nodePositions.set(node.id, initialPos);
-                }}
-            }});
-            
-            // Reset zoom and position
-            currentScale = 1.0;
-            currentX = 0;
-            currentY = 0;
-            updateTransform();
-            updateZoomLevel();
-            
-            // Update connectors
-            updateConnectors();
-        }}
-        
-        // Calculate connector points
-        function calculateConnectorPoints(source, target, isSourceDecision, isTargetDecision) {{
-            const sourceCenter = {{
-                x: source.x + source.width / 2,
-                y: source.y + source.height / 2
-            }};
-            const targetCenter = {{
-                x: target.x + target.width / 2,
-                y: target.y + target.height / 2
-            }};
-            
-            let sourcePoint, targetPoint;
-            
-            if (isSourceDecision) {{
-                // Calculate angle to determine which point of the diamond to use
-                const angle = Math.atan2(targetCenter.y - sourceCenter.y, targetCenter.x - sourceCenter.x);
-                const degrees = angle * (180 / Math.PI);
-                const normalizedDegrees = ((degrees % 360) + 360) % 360;
-                
-                if (normalizedDegrees >= 315 || normalizedDegrees < 45) {{  // Right point
-                    sourcePoint = {{
-                        x: sourceCenter.x + source.width / 2,
-                        y: sourceCenter.y
-                    }};
-                }} else if (normalizedDegrees >= 45 && normalizedDegrees < 135) {{  // Bottom point
-                sourcePoint = {{
-                    x: sourceCenter.x,
-                    y: sourceCenter.y + source.height / 2
-                }};
-                }} else if (normalizedDegrees >= 135 && normalizedDegrees < 225) {{  // Left point
-                    sourcePoint = {{
-                        x: sourceCenter.x - source.width / 2,
-                        y: sourceCenter.y
-                    }};
-                }} else {{  // Top point (225-315)
-                    sourcePoint = {{
-                        x: sourceCenter.x,
-                        y: sourceCenter.y - source.height / 2
-                    }};
-                }}
-            }} else {{
-                // Calculate border intersection for regular nodes
-                sourcePoint = calculateBorderIntersection(sourceCenter, targetCenter, source);
-            }}
-            
-            if (isTargetDecision) {{
-                // Calculate angle to determine which point of the diamond to use
-                const angle = Math.atan2(targetCenter.y - sourceCenter.y, targetCenter.x - sourceCenter.x);
-                const degrees = angle * (180 / Math.PI);
-                const normalizedDegrees = ((degrees % 360) + 360) % 360;
-                
-                if (normalizedDegrees >= 315 || normalizedDegrees < 45) {{  // Right point (coming from left)
-                    targetPoint = {{
-                        x: targetCenter.x - target.width / 2,
-                        y: targetCenter.y
-                    }};
-                }} else if (normalizedDegrees >= 45 && normalizedDegrees < 135) {{  // Bottom point (coming from top)
-                targetPoint = {{
-                    x: targetCenter.x,
-                    y: targetCenter.y - target.height / 2
-                }};
-                }} else if (normalizedDegrees >= 135 && normalizedDegrees < 225) {{  // Left point (coming from right)
-                    targetPoint = {{
-                        x: targetCenter.x + target.width / 2,
-                        y: targetCenter.y
-                    }};
-                }} else {{  // Top point (coming from bottom) (225-315)
-                    targetPoint = {{
-                        x: targetCenter.x,
-                        y: targetCenter.y + target.height / 2
-                    }};
-                }}
-            }} else {{
-                // Calculate border intersection for regular nodes
-                targetPoint = calculateBorderIntersection(targetCenter, sourceCenter, target);
-            }}
-            
-            return [sourcePoint.x, sourcePoint.y, targetPoint.x, targetPoint.y];
-        }}
-        
-        // Calculate intersection point with node border
-        function calculateBorderIntersection(from, to, node) {{
-            const angle = Math.atan2(to.y - from.y, to.x - from.x);
-            const cos = Math.cos(angle);
-            const sin = Math.sin(angle);
-            
-            // Determine intersection point
-            let x, y;
-            if (Math.abs(cos) > Math.abs(sin)) {{
-                // Intersect with left or right border
-                x = cos > 0 ? node.x + node.width : node.x;
-                y = from.y + (x - from.x) * sin / cos;
-            }} else {{
-                // Intersect with top or bottom border
-                y = sin > 0 ? node.y + node.height : node.y;
-                x = from.x + (y - from.y) * cos / sin;
-            }}
-            
-            return {{ x, y }};
-        }}
-        
-        // Update connector positions
-        function updateConnectors() {{
-            const container = document.getElementById('{chart_id}');
-            const connectors = container.querySelectorAll('.connector');
-            
-            connectors.forEach(connector => {{
-                const [_, sourceId, targetId] = connector.id.split('-');
-                const sourceNode = document.getElementById(sourceId);
-                const targetNode = document.getElementById(targetId);
-                
-                if (sourceNode && targetNode) {{
-                    const sourcePos = nodePositions.get(sourceId);
-                    const targetPos = nodePositions.get(targetId);
-                    
-                    if (sourcePos && targetPos) {{
-                        // Calculate new connector points
-                        const [sx, sy, tx, ty] = calculateConnectorPoints(
-                            sourcePos,
-                            targetPos,
-                            sourceNode.classList.contains('node-decision'),
-                            targetNode.classList.contains('node-decision')
-                        );
-                        
-                        // Calculate new angle and length
-                        const dx = tx - sx;
-                        const dy = ty - sy;
-                        const length = Math.sqrt(dx * dx + dy * dy);
-                        const angle = Math.atan2(dy, dx) * (180 / Math.PI);
-                        
-                        // Update connector position and rotation
-                        connector.style.left = `${{sx}}px`;
-                        connector.style.top = `${{sy}}px`;
-                        connector.style.width = `${{length}}px`;
-                        connector.style.transform = `rotate(${{angle}}deg)`;
-                        
-                        // Update the invisible line for label dragging
-                        const lineId = `line-${{connector.id}}`;
-                        const line = document.getElementById(lineId);
-                        if (line) {{
-                            line.style.left = `${{sx}}px`;
-                            line.style.top = `${{sy}}px`;
-                            line.style.width = `${{length}}px`;
-                            line.style.transform = `rotate(${{angle}}deg)`;
-                        }}
-                        
-                        // Update decision labels if needed
-                        if (sourceNode.classList.contains('node-decision')) {{
-                            const labelId = `label-${{sourceId}}-${{targetId}}`;
-                            const label = document.querySelector(`#${{labelId}}`);
-                            if (label && !label.classList.contains('dragging')) {{
-                                // Only update if not being dragged
-                                const position = parseFloat(label.dataset.position || '0.5');
-                                label.style.left = `${{sx + dx * position}}px`;
-                                label.style.top = `${{sy + dy * position}}px`;
-                            }}
-                        }}
-                    }}
-                }}
-            }});
-        }}
-        
-        // Add label dragging functionality
-        let isLabelDragging = false;
-        let currentLabel = null;
-        let currentLine = null;
-        
-        // Enhanced mouse event handlers
-        document.addEventListener('mousedown', e => {{
-            const label = e.target.closest('.label');
-            if (label) {{
-                isLabelDragging = true;
-                currentLabel = label;
-                currentLine = document.getElementById(`line-${{label.dataset.connectorId}}`);
-                label.classList.add('dragging');
-                e.preventDefault();
-            }} else {{
-                const node = e.target.closest('#{chart_id} .node');
-                if (node) {{
-                    isDragging = true;
-                    currentNode = node;
-                    const rect = node.getBoundingClientRect();
-                    offsetX = e.clientX - rect.left;
-                    offsetY = e.clientY - rect.top;
-                    node.classList.add('dragging');
-                    e.preventDefault();
-                }}
-            }}
-        }}, true);
-        
-        document.addEventListener('mousemove', e => {{
-            if (isLabelDragging && currentLabel && currentLine) {{
-                const lineRect = currentLine.getBoundingClientRect();
-                const containerRect = document.getElementById('{chart_id}').getBoundingClientRect();
-                
-                // Calculate position along the line
-                const lineLength = Math.sqrt(
-                    Math.pow(lineRect.width, 2) + Math.pow(lineRect.height, 2)
-                );
-                
-                // Get mouse position relative to the line
-                const mouseX = e.clientX - containerRect.left;
-                const mouseY = e.clientY - containerRect.top;
-                
-                // Project mouse position onto the line
-                const lineStartX = parseFloat(currentLine.style.left);
-                const lineStartY = parseFloat(currentLine.style.top);
-                const lineEndX = lineStartX + lineRect.width * Math.cos(parseFloat(currentLine.style.transform.match(/rotate\(([^)]+)\)/)[1]) * Math.PI / 180);
-                const lineEndY = lineStartY + lineRect.width * Math.sin(parseFloat(currentLine.style.transform.match(/rotate\(([^)]+)\)/)[1]) * Math.PI / 180);
-                
-                // Calculate position along the line (0 to 1)
-                const position = Math.max(0, Math.min(1, 
-                    ((mouseX - lineStartX) * (lineEndX - lineStartX) + 
-                     (mouseY - lineStartY) * (lineEndY - lineStartY)) / 
-                    (lineLength * lineLength)
-                ));
-                
-                // Update label position
-                currentLabel.style.left = `${{lineStartX + (lineEndX - lineStartX) * position}}px`;
-                currentLabel.style.top = `${{lineStartY + (lineEndY - lineStartY) * position}}px`;
-                
-                // Store position for later updates
-                currentLabel.dataset.position = position;
-            }} else if (isDragging && currentNode) {{
-                // Get mouse position relative to the container
-                const container = document.getElementById('{chart_id}');
-                const containerRect = container.getBoundingClientRect();
-                const mouseX = e.clientX - containerRect.left;
-                const mouseY = e.clientY - containerRect.top;
-                
-                // Update node position directly
-                currentNode.style.left = `${{mouseX - offsetX}}px`;
-                currentNode.style.top = `${{mouseY - offsetY}}px`;
-                
-                // Update stored position
-                nodePositions.set(currentNode.id, {{
-                    x: mouseX - offsetX,
-                    y: mouseY - offsetY,
-                    width: currentNode.offsetWidth,
-                    height: currentNode.offsetHeight
-                }});
-                
-                // Update connectors
-                updateConnectors();
-            }}
-        }}, true);
-        
-        document.addEventListener('mouseup', () => {{
-            if (currentLabel) {{
-                currentLabel.classList.remove('dragging');
-                currentLabel = null;
-                currentLine = null;
-            }}
-            if (currentNode) {{
-                currentNode.classList.remove('dragging');
-            }}
-            isLabelDragging = false;
-            isDragging = false;
-            currentNode = null;
-        }}, true);
-        
-        // Add touch event support
-        document.addEventListener('touchstart', e => {{
-            const touch = e.touches[0];
-            const mouseEvent = new MouseEvent('mousedown', {{
-                clientX: touch.clientX,
-                clientY: touch.clientY
-            }});
-            document.dispatchEvent(mouseEvent);
-        }});
-        
-        document.addEventListener('touchmove', e => {{
-            const touch = e.touches[0];
-            const mouseEvent = new MouseEvent('mousemove', {{
-                clientX: touch.clientX,
-                clientY: touch.clientY
-            }});
-            document.dispatchEvent(mouseEvent);
-        }});
-        
-        document.addEventListener('touchend', () => {{
-            const mouseEvent = new MouseEvent('mouseup');
-            document.dispatchEvent(mouseEvent);
-        }});
-
-        // Add tooltip functionality for nodes
-        const tooltip = document.getElementById('{chart_id}-tooltip');
-        
-        document.addEventListener('DOMContentLoaded', () => {{
-            const nodes = document.querySelectorAll('#{chart_id} .node');
-            
-            nodes.forEach(node => {{
-                const description = node.getAttribute('data-description');
-                if (description) {{
-                    node.addEventListener('mouseenter', (e) => {{
-                        // Format description with HTML for better readability
-                        let formattedDesc = description;
-                        
-                        // Look for key terms to format
-                        const keyTermsList = ["Purpose:", "Implementation:", "Technical details:", "Best practices:", "Common issues:"];
-                        
-                        // Create styled HTML
-                        let htmlContent = `<div class="tooltip-content">`;
-                        
-                        // Add node title
-                        htmlContent += `<div class="tooltip-title">${{node.textContent.trim()}}</div>`;
-                        
-                        // Split description into paragraphs for better readability
-                        const paragraphs = formattedDesc.split(/(?=Purpose:|Implementation:|Technical details:|Best practices:|Common issues:)/g);
-                        
-                        // Add formatted description with paragraphs
-                        htmlContent += `<div class="tooltip-description">`;
-                        paragraphs.forEach(para => {{
-                            if (para.trim()) {{
-                                let formattedPara = para;
-                                
-                                // Add styling to headings
-                                keyTermsList.forEach(term => {{
-                                    if (formattedPara.startsWith(term)) {{
-                                        formattedPara = formattedPara.replace(term, `<span class="tooltip-heading">${{term}}</span>`);
-                                    }}
-                                }});
-                                
-                                htmlContent += `<p class="tooltip-paragraph">${{formattedPara}}</p>`;
-                            }}
-                        }});
-                        htmlContent += `</div>`;
-                        
-                        
-                        htmlContent += `</div>`;
-                        
-                        // Set the HTML content
-                        tooltip.innerHTML = htmlContent;
-                        tooltip.classList.add('visible');
-                        
-                        // Position the tooltip near the node
-                        const rect = node.getBoundingClientRect();
-                        const chartRect = document.getElementById('{chart_id}').getBoundingClientRect();
-                        
-                        // Calculate position - above the node
-                        let top = rect.top - chartRect.top - tooltip.offsetHeight - 10;
-                        let left = rect.left - chartRect.left + (rect.width / 2) - (tooltip.offsetWidth / 2);
-                        
-                        // Adjust if tooltip would go off the chart
-                        if (top < 0) {{
-                            // Place below instead
-                            top = rect.bottom - chartRect.top + 10;
-                        }}
-                        
-                        if (left < 10) {{
-                            left = 10;
-                        }} else if (left + tooltip.offsetWidth > chartRect.width - 10) {{
-                            left = chartRect.width - tooltip.offsetWidth - 10;
-                        }}
-                        
-                        tooltip.style.top = `${{top}}px`;
-                        tooltip.style.left = `${{left}}px`;
-                    }});
-                    
-                    node.addEventListener('mouseleave', () => {{
-                        tooltip.classList.remove('visible');
-                    }});
-                }}
-            }});
-        }});
-
-        // Add additional tooltip styles
-        document.head.insertAdjacentHTML('beforeend', `
-            <style>
-                #{chart_id} .tooltip-content {{
-                    display: flex;
-                    flex-direction: column;
-                    gap: 8px;
-                }}
-                
-                #{chart_id} .tooltip-title {{
-                    font-weight: bold;
-                    font-size: 14px;
-                    border-bottom: 1px solid rgba(255, 255, 255, 0.3);
-                    padding-bottom: 4px;
-                    margin-bottom: 4px;
-                }}
-                
-                #{chart_id} .tooltip-description {{
-                    white-space: pre-line;
-                    max-height: 250px;
-                    overflow-y: auto;
-                    padding-right: 5px;
-                    font-size: 11px;
-                }}
-                
-                #{chart_id} .tooltip-description::-webkit-scrollbar {{
-                    width: 4px;
-                }}
-                
-                #{chart_id} .tooltip-description::-webkit-scrollbar-track {{
-                    background: rgba(255, 255, 255, 0.1);
-                    border-radius: 2px;
-                }}
-                
-                #{chart_id} .tooltip-description::-webkit-scrollbar-thumb {{
-                    background: rgba(255, 255, 255, 0.3);
-                    border-radius: 2px;
-                }}
-                
-                #{chart_id} .tooltip-paragraph {{
-                    margin: 0 0 6px 0;
-                    padding: 0;
-                    line-height: 1.3;
-                }}
-                
-                #{chart_id} .tooltip-paragraph:last-child {{
-                    margin-bottom: 0;
-                }}
-                
-                #{chart_id} .tooltip-heading {{
-                    font-weight: bold;
-                    font-size: 12px;
-                    color: #4361EE;
-                    display: block;
-                    margin-top: 6px;
-                }}
-                
-                #{chart_id}.dark-mode .tooltip-heading {{
-                    color: #4cc9f0;
-                }}
-                
-                #{chart_id} .tooltip {{
-                    max-width: 320px;
-                    max-height: 350px;
-                    overflow: hidden;
-                }}
-            </style>
-        `);
-
-        // Initialize other functions
-        initializeNodePositions();
-    </script>
-                    """
-    
-    # Complete HTML
-    html = f"""
-    {css}
-    <div id="{chart_id}">
-        <div class="flowchart-container" style="width: {container_width}px; height: {container_height}px;">
-            {nodes_html}
-            {connections_html}
-        </div>
-        {controls_html}
-    </div>
-    
-    <script>
-        // Wait for DOM to be fully loaded
-        document.addEventListener('DOMContentLoaded', function() {{
-            // Get the container elements
-            const chartContainer = document.getElementById('{chart_id}');
-            const flowchartContainer = chartContainer.querySelector('.flowchart-container');
-            
-            // Basic initialization functions only - export functionality removed
-            console.log("Flowchart initialized");
-        }});
-    </script>
+    Format your response as JSON with this structure:
+    {{"phases": [{{"name": "Intake", "summary": "Steps from receiving the request to validating it"}}]}}
     """
     
-    return html
+    return {
+        "model": "mistral-small-latest",
+        "messages": [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": temperature,
+        "max_tokens": 100 + 60 * MAX_PHASES,
+        "response_format": {"type": "json_object"}
+    }
 
-# Function to generate a download link for the HTML
-def get_download_link(html, filename="flowchart.html"):
+# Function to ask for the phases of a large process, returning None if none could be obtained
+def request_process_outline(prompt, api_key, industry=None, use_cache=True, temperature=0.7, session_id=None):
+    data = build_outline_request(prompt, industry, temperature)
+    cache_key = get_request_cache_key(prompt, industry, data, "outline")
+    if use_cache:
+        cached = check_cached_response(cache_key)
+        if cached is not None:
+            return cached
+    
     try:
-        logger.info(f"Generating download link for {filename}")
-        
-        # Validate HTML
-        if not html or not isinstance(html, str):
-            logger.error("Invalid HTML content provided")
-            st.error("Error generating download link: Invalid HTML content")
-            return ""
-            
-        # Encode HTML to base64
+        content = get_single_flight().do(cache_key, request_completion_content, api_key, data, session_id)
+        outline = json.loads(content)
+        phases = [phase for phase in outline.get("phases", [])
+                  if isinstance(phase, dict) and phase.get("name")][:MAX_PHASES]
+    except Exception as e:
+        logger.warning(f"Could not get a process outline: {str(e)}")
+        return None
+    if len(phases) < 2:
+        return None
+    if use_cache:
+        cache_response(cache_key, phases)
+    return phases
+
+# Function to build the prompt for one phase of a divided process
+def build_phase_prompt(prompt, phases, index):
+    phase = phases[index]
+    lines = [
+        prompt,
+        "",
+        f"Chart ONLY phase {index + 1} of {len(phases)}: {phase['name']} - {phase.get('summary', '')}",
+    ]
+    if index > 0:
+        lines.append(f"It follows the phase \"{phases[index - 1]['name']}\"; do not add a start node.")
+    if index < len(phases) - 1:
+        lines.append(f"It is followed by the phase \"{phases[index + 1]['name']}\"; do not add an end node.")
+    return "\n".join(lines)
+
+# Function to decide whether a process is large enough to generate phase by phase
+def should_divide_process(prompt):
+    return analyze_prompt_complexity(prompt)["estimated_nodes"] >= DIVIDE_MIN_NODES
+
+# Function to generate a large flowchart phase by phase
+def generate_flowchart_divided(prompt, api_key, industry=None, use_cache=True, similarity_threshold=None,
+                               max_tokens=2000, temperature=0.7, session_id=None, hedge_budget=None,
+                               on_phase=None, base_max_tokens=None):
+    """Outline the process into phases, generate every phase's subgraph in
+    parallel on the shared pool and merge them.
+    
+    `on_phase(flowchart, done, total)` is called with the merge of the
+    phases received so far each time one arrives. Falls back to a single
+    generate_flowchart_description call when no usable outline comes back.
+    """
+    phases = request_process_outline(prompt, api_key, industry, use_cache, temperature, session_id)
+    if not phases:
+        return generate_flowchart_description(prompt, api_key, industry, use_cache, similarity_threshold,
+                                              max_tokens, temperature, session_id, hedge_budget=hedge_budget,
+                                              base_max_tokens=base_max_tokens)
+    
+    executor = _generation_executor()
+    futures = {
+        executor.submit(generate_flowchart_description, build_phase_prompt(prompt, phases, index), api_key,
+                        industry, use_cache, None, max_tokens, temperature, session_id,
+                        hedge_budget=hedge_budget, fallback=False, base_max_tokens=base_max_tokens): index
+        for index in range(len(phases))
+    }
+    results = [None] * len(phases)
+    for done, future in enumerate(concurrent.futures.as_completed(futures), start=1):
         try:
-            b64 = base64.b64encode(html.encode()).decode()
+            results[futures[future]] = future.result()
         except Exception as e:
-            logger.error(f"Error encoding HTML content: {str(e)}")
-            st.error("Error creating download link: Unable to encode HTML content")
-            return ""
-    
-        # Add additional HTML header with complete doctype and styling
-        full_html = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Flowchart</title>
-    <link href="https://fonts.googleapis.com/css2?family=Roboto:wght@400;500&family=Open+Sans:wght@400;600&family=Comfortaa:wght@400;700&family=IBM+Plex+Sans:wght@400;500&family=Quicksand:wght@500;600&family=Montserrat:wght@400;500&display=swap" rel="stylesheet">
-    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/5.15.4/css/all.min.css">
-</head>
-<body style="margin: 0; padding: 20px; background-color: #f5f5f5;">
-{html}
-</body>
-</html>"""
+            logger.warning(f"Phase {futures[future] + 1} failed: {str(e)}")
+        if on_phase:
+            on_phase(merge_phase_flowcharts(results), done, len(phases))
+    
+    missing = [phases[index]["name"] for index, result in enumerate(results) if not result]
+    if len(missing) == len(phases):
+        st.error("Could not generate any phase of the process.")
+        return create_default_flowchart("No phase of the process could be generated", "api_error")
+    if missing:
+        st.warning(f"Some phases could not be generated: {', '.join(missing)}")
+    return merge_phase_flowcharts(results)
+
+# Function to build the request for a small edit to an existing flowchart
+def build_edit_request(flowchart_data, instruction, industry=None, temperature=0.3):
+    industry_context = f"The flowchart is for the {industry} industry." if industry else ""
+    # Descriptions are left out: they are long and the model doesn't need them to place an edit
+    outline = [{key: node.get(key) for key in ("id", "text", "type", "connections")}
+               for node in flowchart_data["nodes"]]
+    
+    system_message = f"""You are a flowchart designer editing an existing flowchart. {industry_context}
+    Translate the user's change request into the smallest list of patch operations.
+    
+    Available operations:
+    - {{"op": "add_node", "after": "<id>", "node": {{"text": "...", "type": "process", "icon": "fa-...", "description": "Purpose: ... Implementation: ..."}}}}
+      ("after" splices the node into that node's outgoing flow; give "connections" instead to link it explicitly)
+    - {{"op": "remove_node", "id": "<id>"}}
+    - {{"op": "update_node", "id": "<id>", "fields": {{"text": "...", "type": "...", "icon": "...", "description": "..."}}}}
+    - {{"op": "relink", "source": "<id>", "from": "<old target id>", "to": "<new target id>"}}
+      (omit "from" to add an edge, omit "to" to remove one)
+    
+    Node types are start, process, decision and end. Use the existing node ids.
+    Format your response as JSON: {{"operations": [...]}}
+    """
     
-        try:
-            full_b64 = base64.b64encode(full_html.encode()).decode()
-            
-            # Check if the base64 string is too large (which could cause browser issues)
-            if len(full_b64) > 5000000:  # ~5MB limit
-                logger.warning(f"Generated base64 string is very large: {len(full_b64)} bytes")
-                st.warning("The generated flowchart is quite large, which might affect download performance")
-                
-            button_html = f'''
-                <a href="data:text/html;base64,{full_b64}" download="{filename}" style="text-decoration: none;">
-                    <button style="padding: 8px 16px; background-color: #4361EE; color: white; border: none; border-radius: 4px; cursor: pointer; display: inline-flex; align-items: center; gap: 5px; font-family: sans-serif;">
-                        <svg xmlns="http://www.w3.org/2000/svg" x="0px" y="0px" width="30" height="30" viewBox="0 0 30 30">
-                            <path d="M25.428,3.333C25.238,3.121,24.967,3,24.683,3H5.317C5.033,3,4.762,3.121,4.572,3.333c-0.19,0.212-0.28,0.495-0.249,0.777l2.202,19.823c0.044,0.403,0.329,0.74,0.719,0.851l7.48,2.137c0.09,0.026,0.183,0.039,0.275,0.039s0.185-0.013,0.275-0.039l7.48-2.137c0.39-0.111,0.674-0.448,0.719-0.851L25.676,4.11C25.708,3.828,25.618,3.545,25.428,3.333z M20.629,10.43h-8.93l0.212,2.542h8.503l-0.638,7.51L15.003,22l-0.047-0.015l-4.72-1.505L9.978,17.42h2.312l0.101,1.189l2.637,0.581l2.591-0.582l0.275-3.213h-8.09L9.178,8h11.659L20.629,10.43z"></path>
-                        </svg>
-                         Download HTML
-                    </button>
-                </a>
-            '''
-            logger.info("Download link generated successfully")
-            return button_html
-            
-        except Exception as e:
-            logger.error(f"Error generating download button: {str(e)}")
-            st.error("Error creating download button. Please try again.")
-            return ""
-            
-    except Exception as e:
-        logger.error(f"Unexpected error in get_download_link: {str(e)}")
-        logger.error(traceback.format_exc())
-        st.error("An unexpected error occurred while creating the download link")
-        return ""
+    return {
+        "model": "mistral-small-latest",
+        "messages": [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": f"Flowchart: {json.dumps(outline)}\n\nChange: {instruction}"}
+        ],
+        "temperature": temperature,
+        "max_tokens": 800,
+        "response_format": {"type": "json_object"}
+    }
+
+# Function to apply a natural-language edit to a flowchart without regenerating it
+def edit_flowchart(flowchart_data, instruction, api_key, industry=None, temperature=0.3, session_id=None):
+    """Ask the model for patch operations and apply them locally.
+    
+    Returns (flowchart_data, changed_ids, operations); raises PatchError if
+    the response can't be applied.
+    """
+    # Refused before spending a request on it
+    check_patchable(flowchart_data)
+    data = build_edit_request(flowchart_data, instruction, industry, temperature)
+    content = request_completion_content(api_key, data, session_id)
+    operations = parse_patch_operations(content)
+    patched, changed_ids = apply_patch(flowchart_data, operations)
+    logger.info(f"Applied {len(operations)} patch operations, {len(changed_ids)} nodes changed")
+    return patched, changed_ids, operations
+
+# Helper function to create a default flowchart
+def create_default_flowchart(reason="The flowchart could not be generated", kind="api_error"):
+    """Placeholder chart, marked as degraded so it is never mistaken for a real result"""
+    logger.info(f"Creating default flowchart ({kind}): {reason}")
+    record_degraded(kind)
+    return DegradedFlowchart({
+        "nodes": [
+            {"id": "node1", "text": "Start", "type": "start", "connections": ["node2"], "icon": "fa-play-circle", 
+             "description": "Starting point of the process."},
+            {"id": "node2", "text": "Process", "type": "process", "connections": ["node3"], "icon": "fa-cog", 
+             "description": "Main processing step."},
+            {"id": "node3", "text": "End", "type": "end", "connections": [], "icon": "fa-flag-checkered", 
+             "description": "End of the process."}
+        ]
+    }, reason, kind)
+
+# Helper function to turn a failed API call into a placeholder chart
+def fallback_for_error(error):
+    if isinstance(error, CircuitOpenError):
+        return create_default_flowchart(str(error), "circuit_open")
+    return create_default_flowchart(f"Mistral API error: {str(error)}", "api_error")
+
+# Helper function to tell the user plainly that they are looking at a placeholder
+def show_degraded_notice(flowchart_data):
+    if is_degraded(flowchart_data):
+        st.warning(f"⚠️ This is a placeholder chart, not a generated one. {flowchart_data.reason}")
+
+# Function to build the page a download contains
+def get_export_document(flowchart_html, flowchart_data, theme_key, orientation, backend="html", layout=None,
+                        offline=False):
+    """The displayed chart as a complete page, or re-rendered self-contained (no network requests) when `offline`"""
+    if offline:
+        return generate_export_html(flowchart_data, theme_key, orientation, backend, layout, offline=True)
+    return export_document(flowchart_html)
+
+# Function to build a download of the current chart, only once the user asks for it
+def prepare_download(current, export_format="html", offline=False):
+    """(bytes to download, size of the uncompressed document) for a chart kept in session state;
+    PNG images are drawn server-side and have no document (size None)"""
+    start_time = time.time()
+    if export_format == "png":
+        data = render_png(current["data"], current["theme_key"], current["orientation"], layout=current["layout"])
+        logger.info(f"Rendered {PNG_FORMAT[1]}: {len(data)} bytes in {time.time() - start_time:.3f}s")
+        return data, None
+    document = get_export_document(current["html"], current["data"], current["theme_key"], current["orientation"],
+                                   current["backend"], current["layout"], offline)
+    data = export_bytes(document, export_format)
+    document_size = len(document.encode())
+    logger.info(f"Prepared {EXPORT_FORMATS[export_format][1]}: {len(data)} bytes from a {document_size} byte "
+                f"document in {time.time() - start_time:.3f}s")
+    return data, document_size
 
 # Response caching functions
-_response_cache = {}
+# Shared across Streamlit sessions and reruns: LRU eviction bounded by encoded size, with a TTL
+_response_cache = get_response_cache()
+
+def get_request_cache_key(prompt, industry, request_data, kind="flowchart", node_ids=None, include_prompt=True):
+    """Cache (and single-flight) key for a request: normalized prompt, request kind, the messages sent and the
+    generation settings. Without the prompt it is the namespace near-duplicate prompts are looked up in."""
+    return make_cache_key(prompt, industry, request_data["model"], request_data["temperature"],
+                          request_data["max_tokens"], kind, request_data["messages"], node_ids, include_prompt)
 
 def check_cached_response(key):
     """Check if we have a cached response for this key"""
-    if key in _response_cache:
-        return _response_cache[key]
-    return None
+    cached = _response_cache.get(key)
+    if cached is None:
+        # Fall back to the persistent tier and promote hits into memory
+        try:
+            cached = get_disk_cache().get_json("flowchart", key)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read flowchart from disk cache: {str(e)}")
+            cached = None
+        if cached is not None:
+            _response_cache.put(key, cached)
+    return cached
 
 def cache_response(key, data):
     """Cache a response for future use"""
-    _response_cache[key] = data
-    # Keep cache size manageable
-    if len(_response_cache) > 50:
-        # Remove oldest items
-        oldest_keys = list(_response_cache.keys())[:10]
-        for old_key in oldest_keys:
-            del _response_cache[old_key]
+    _response_cache.put(key, data)
+    try:
+        get_disk_cache().put_json("flowchart", key, data)
+    except sqlite3.Error as e:
+        logger.warning(f"Could not write flowchart to disk cache: {str(e)}")
 
-# Implement parallel processing for faster flowchart generation
-def generate_flowchart_with_progress(description, api_key, industry, theme_key, orientation):
-    """Generate flowchart with progress indicator and parallelization"""
-    progress_bar = st.progress(0)
-    status_text = st.empty()
+def lookup_flowchart_response(prompt, industry, request_data, similarity_threshold=None, kind="flowchart"):
+    """Find a cached flowchart for this request, optionally via a near-duplicate prompt"""
+    cached = check_cached_response(get_request_cache_key(prompt, industry, request_data, kind))
+    if cached is not None:
+        logger.info("Serving flowchart from response cache")
+        return cached
+    
+    if similarity_threshold is None:
+        return None
+    similarity_index = get_similarity_index()
+    namespace = get_request_cache_key(prompt, industry, request_data, kind, include_prompt=False)
+    match = similarity_index.query(prompt, namespace, similarity_threshold)
+    if match is None:
+        return None
     
-    # Step 1: Start API call in background
-    status_text.text("Step 1/3: Generating flowchart structure...")
+    similar_key, similarity = match
+    cached = check_cached_response(similar_key)
+    if cached is None:
+        # The response behind this prompt has been evicted from every tier
+        similarity_index.remove(similar_key)
+        return None
+    logger.info(f"Serving flowchart cached for a similar prompt (similarity {similarity:.2f})")
+    return cached
+
+def store_flowchart_response(prompt, industry, request_data, flowchart_data, kind="flowchart"):
+    """Cache a generated flowchart and index its prompt for near-duplicate lookup"""
+    cache_key = get_request_cache_key(prompt, industry, request_data, kind)
+    cache_response(cache_key, flowchart_data)
+    get_similarity_index().add(prompt, cache_key,
+                               get_request_cache_key(prompt, industry, request_data, kind, include_prompt=False))
+
+def generate_flowchart_html_cached(flowchart_data, theme_key, orientation="landscape", use_cache=True, backend="html",
+                                   layout=None):
+    """Render the flowchart HTML, reusing a persisted render of identical input.
+    
+    `layout` is the chart's Layout when the caller keeps it for later edits;
+    a fresh render memoises its fragments on it.
+    """
+    if not use_cache:
+        return generate_flowchart_html(flowchart_data, theme_key, orientation, layout=layout, backend=backend)
     
+    render_key = hashlib.sha256(
+        json.dumps([RENDERER_VERSION, flowchart_data, theme_key, orientation, backend], sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    try:
+        cached_html = get_disk_cache().get("html", render_key)
+    except sqlite3.Error as e:
+        logger.warning(f"Could not read HTML from disk cache: {str(e)}")
+        cached_html = None
+    if cached_html is not None:
+        return cached_html
+    
+    flowchart_html = generate_flowchart_html(flowchart_data, theme_key, orientation, layout=layout, backend=backend)
+    try:
+        get_disk_cache().put("html", render_key, flowchart_html)
+    except sqlite3.Error as e:
+        logger.warning(f"Could not write HTML to disk cache: {str(e)}")
+    return flowchart_html
+
+# Run the blocking API call in a worker thread while the progress bar ticks
+def run_flowchart_in_background(description, api_key, industry, progress_bar, status_text, use_cache=True,
+                                similarity_threshold=None, max_tokens=2000, temperature=0.7, session_id=None,
+                                skeleton=False, hedge_budget=None, base_max_tokens=None):
+    scheduler = get_scheduler()
+    latencies = get_hedged_requester().histogram
     # Use ThreadPoolExecutor for concurrent processing
     with concurrent.futures.ThreadPoolExecutor() as executor:
         # Start the API call in the background
-        future = executor.submit(generate_flowchart_description, description, api_key, industry)
+        future = executor.submit(generate_flowchart_description, description, api_key, industry, use_cache,
+                                 similarity_threshold, max_tokens, temperature, session_id, skeleton,
+                                 hedge_budget, base_max_tokens=base_max_tokens)
         
         # Monitor progress while API call is running
         start_time = time.time()
+        shown = None
         while not future.done():
-            # Update progress based on elapsed time (estimate 10 seconds total)
-            elapsed = time.time() - start_time
-            if elapsed < 10:
-                progress = min(0.33, elapsed / 10 * 0.33)  # 33% for step 1
-                progress_bar.progress(progress)
+            # While waiting for a slot, show the real queue position instead of a guess
+            position = scheduler.session_position(session_id) if session_id else None
+            if position:
+                status = f"Step 1/3: Waiting in queue (position {position})..."
+                start_time = time.time()
+            else:
+                # Once sent, the call is expected to take as long as recent ones did (their p90); without
+                # enough history there is no estimate, so the bar holds still and the elapsed time counts up
+                elapsed = time.time() - start_time
+                expected = latencies.percentile(90) if latencies.sample_count() >= MIN_SAMPLES else None
+                if expected and elapsed < expected:
+                    progress_bar.progress(min(0.33, elapsed / expected * 0.33))  # 33% for step 1
+                    status = f"Step 1/3: Generating flowchart structure (usually about {expected:.1f}s)..."
+                elif expected:
+                    status = f"Step 1/3: Generating flowchart structure, taking longer than usual ({elapsed:.0f}s)..."
+                else:
+                    status = f"Step 1/3: Generating flowchart structure ({elapsed:.0f}s)..."
+            if status != shown:
+                status_text.text(status)
+                shown = status
             time.sleep(0.1)  # Short sleep to avoid CPU spinning
         
         # Get the flowchart data from the completed future
         try:
-            flowchart_data = future.result()
-            if not flowchart_data:
-                return None
+            return future.result()
         except Exception as e:
             logger.error(f"Error in background API call: {str(e)}")
             st.error(f"Error generating flowchart structure: {str(e)}")
             return None
+
+# Stream the API call, drawing the partial chart as each node arrives
+def stream_flowchart_with_preview(description, api_key, industry, theme_key, orientation, progress_bar, status_text,
+                                  use_cache=True, similarity_threshold=None, max_tokens=2000, temperature=0.7,
+                                  session_id=None, backend="html", base_max_tokens=None):
+    preview = st.empty()
+    nodes = []
+    flowchart_data = None
+    last_render = 0.0
+    
+    try:
+        for event, payload in stream_flowchart_description(description, api_key, industry, use_cache,
+                                                           similarity_threshold, max_tokens, temperature,
+                                                           session_id, base_max_tokens):
+            if event == "done":
+                flowchart_data = payload
+                break
+            
+            if event == "queued":
+                status_text.text(f"Step 1/3: Waiting in queue (position {payload})...")
+                continue
+            
+            if event == "tokens":
+                # Real progress: share of the token budget streamed so far (one delta ~ one token)
+                if payload == 1:
+                    status_text.text("Step 1/3: Generating flowchart structure...")
+                if payload % 20 == 0:
+                    progress_bar.progress(min(0.35, payload / max_tokens * 0.35))
+                continue
+            
+            nodes.append(payload)
+            status_text.text(f"Step 1/3: Received {len(nodes)} nodes...")
+            
+            # Throttle preview redraws so the iframe isn't rebuilt for every token burst
+            if time.time() - last_render >= 0.3:
+                preview_html = generate_flowchart_html({"nodes": list(nodes)}, theme_key, orientation, backend=backend)
+                with preview.container():
+                    st.components.v1.html(preview_html, height=700)
+                last_render = time.time()
+    finally:
+        preview.empty()
+    
+    return flowchart_data
+
+# Show the skeleton as soon as it arrives, then fill in node details from parallel calls
+def two_phase_flowchart_with_preview(description, api_key, industry, theme_key, orientation, progress_bar,
+                                     status_text, use_cache=True, similarity_threshold=None, max_tokens=2000,
+                                     temperature=0.7, session_id=None, hedge_budget=None, backend="html",
+                                     base_max_tokens=None):
+    skeleton = run_flowchart_in_background(description, api_key, industry, progress_bar, status_text, use_cache,
+                                           similarity_threshold, max_tokens, temperature, session_id, skeleton=True,
+                                           hedge_budget=hedge_budget, base_max_tokens=base_max_tokens)
+    if not skeleton:
+        return skeleton
+    
+    # The layout depends only on the structure, so the final chart lands exactly where the preview was
+    preview = st.empty()
+    with preview.container():
+        st.components.v1.html(generate_flowchart_html(skeleton, theme_key, orientation, backend=backend), height=700)
+    
+    def on_descriptions(done, total):
+        status_text.text(f"Step 1/3: Loaded details for {done}/{total} nodes...")
+        progress_bar.progress(0.33 + 0.07 * done / max(total, 1))
+    
+    status_text.text("Step 1/3: Loading node details...")
+    try:
+        return complete_node_descriptions(skeleton, description, api_key, industry, use_cache, temperature,
+                                          session_id, on_descriptions)
+    finally:
+        preview.empty()
+
+# Generate a large process phase by phase, drawing the merged chart as each phase arrives
+def divided_flowchart_with_preview(description, api_key, industry, theme_key, orientation, progress_bar,
+                                   status_text, use_cache=True, similarity_threshold=None, max_tokens=2000,
+                                   temperature=0.7, session_id=None, hedge_budget=None, backend="html",
+                                   base_max_tokens=None):
+    preview = st.empty()
+    
+    def on_phase(flowchart_data, done, total):
+        status_text.text(f"Step 1/3: Generated {done}/{total} phases...")
+        progress_bar.progress(0.4 * done / total)
+        if flowchart_data["nodes"]:
+            with preview.container():
+                st.components.v1.html(generate_flowchart_html(flowchart_data, theme_key, orientation, backend=backend),
+                                      height=700)
+    
+    status_text.text("Step 1/3: Outlining the process phases...")
+    try:
+        return generate_flowchart_divided(description, api_key, industry, use_cache, similarity_threshold,
+                                          max_tokens, temperature, session_id, hedge_budget, on_phase,
+                                          base_max_tokens)
+    finally:
+        preview.empty()
+
+# Implement parallel processing for faster flowchart generation
+def generate_flowchart_with_progress(description, api_key, industry, theme_key, orientation, stream=False,
+                                     use_cache=True, similarity_threshold=None, max_tokens=2000, temperature=0.7,
+                                     session_id=None, two_phase=False, hedge_budget=None, divide=False,
+                                     backend="html", base_max_tokens=None):
+    """Generate flowchart with progress indicator and parallelization"""
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+    
+    # Step 1: Start API call in background
+    status_text.text("Step 1/3: Generating flowchart structure...")
+    
+    if divide and should_divide_process(description):
+        flowchart_data = divided_flowchart_with_preview(description, api_key, industry, theme_key, orientation,
+                                                        progress_bar, status_text, use_cache, similarity_threshold,
+                                                        max_tokens, temperature, session_id, hedge_budget, backend,
+                                                        base_max_tokens)
+    elif two_phase:
+        flowchart_data = two_phase_flowchart_with_preview(description, api_key, industry, theme_key, orientation,
+                                                          progress_bar, status_text, use_cache, similarity_threshold,
+                                                          max_tokens, temperature, session_id, hedge_budget, backend,
+                                                          base_max_tokens)
+    elif stream:
+        flowchart_data = stream_flowchart_with_preview(description, api_key, industry, theme_key, orientation,
+                                                       progress_bar, status_text, use_cache, similarity_threshold,
+                                                       max_tokens, temperature, session_id, backend, base_max_tokens)
+    else:
+        flowchart_data = run_flowchart_in_background(description, api_key, industry, progress_bar, status_text,
+                                                     use_cache, similarity_threshold, max_tokens, temperature,
+                                                     session_id, hedge_budget=hedge_budget,
+                                                     base_max_tokens=base_max_tokens)
+    if not flowchart_data:
+        return None
     
     # Step 2: Generate HTML (this is typically fast)
     status_text.text("Step 2/3: Creating visualization...")
     progress_bar.progress(0.4)  # 40% after API call
     
     try:
-        # Generate the HTML for the flowchart
-        flowchart_html = generate_flowchart_html(flowchart_data, theme_key, orientation)
+        # Generate the HTML for the flowchart, keeping its layout so the first edit only re-renders what changed
+        layout = calculate_layout(flowchart_data["nodes"], orientation)
+        flowchart_html = generate_flowchart_html_cached(flowchart_data, theme_key, orientation, use_cache, backend,
+                                                        layout)
         progress_bar.progress(0.7)  # 70% after HTML generation
     except Exception as e:
         logger.error(f"Error generating HTML: {str(e)}")
@@ -1792,13 +982,6 @@ def generate_flowchart_with_progress(description, api_key, industry, theme_key,
     except Exception as e:
         logger.error(f"Error extracting chart ID: {str(e)}")
     
-    # Create download link
-    try:
-        html_button = get_download_link(flowchart_html, "flowchart.html")
-    except Exception as e:
-        logger.error(f"Error creating download link: {str(e)}")
-        html_button = None
-    
     # Complete
     progress_bar.progress(1.0)
     status_text.text("Flowchart generated successfully!")
@@ -1809,8 +992,8 @@ def generate_flowchart_with_progress(description, api_key, industry, theme_key,
     return {
         "flowchart_data": flowchart_data,
         "flowchart_html": flowchart_html,
-        "chart_id": chart_id,
-        "html_button": html_button
+        "layout": layout,
+        "chart_id": chart_id
     }
 
 
@@ -1819,7 +1002,6 @@ def generate_export_options(chart_id):
     # Empty function that returns nothing - all export functionality removed
     return ""
 
-# All conversion functions (convert_to_png, convert_to_pdf, etc.) have been removed
 
 # Streamlit UI
 # Replace the plain header with a styled banner
@@ -1837,6 +1019,10 @@ def generate_export_options(chart_id):
 
 st.title("Ask Flow Chart")
 
+# Stable per-browser-session id, used to queue requests fairly across sessions
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
 # Tabs for different sections
 tab1, tab2 = st.tabs(["Create Flowchart", "About"])
 
@@ -1877,6 +1063,15 @@ with tab1:
                 "View Orientation",
                 ["landscape", "portrait"]
             )
+            
+        # Rendering backend selection
+        render_backend = st.selectbox(
+                "Rendering",
+                list(RENDER_BACKENDS.keys()),
+                format_func=lambda x: RENDER_BACKENDS[x],
+                help="SVG draws edges as paths and decisions as real diamonds, and stays smooth while dragging. "
+                     "Virtualized SVG only puts the part of the chart in view on the page, for charts with hundreds of nodes"
+            )
 
     # Description input in main area
     description = st.text_area(
@@ -1892,15 +1087,48 @@ with st.sidebar:
         use_caching = st.checkbox("Enable Result Caching", value=True, 
                                 help="Cache results to improve performance for repeated queries")
         
+        reuse_similar = st.checkbox("Reuse Results for Similar Prompts", value=True,
+                                    help="Serve a cached flowchart when a previous prompt differs only in wording "
+                                         "order, case or punctuation")
+        similarity_threshold = st.slider("Similarity Threshold", min_value=0.5, max_value=1.0, value=0.85, step=0.05,
+                                         disabled=not (use_caching and reuse_similar),
+                                         help="Minimum estimated word overlap for reusing a cached result")
+        if not (use_caching and reuse_similar):
+            similarity_threshold = None
+        
         use_parallel = st.checkbox("Use Parallel Processing", value=True,
                                  help="Process requests in parallel for faster generation")
         
+        use_streaming = st.checkbox("Stream Results", value=True,
+                                  help="Draw the flowchart node by node while it is being generated")
+        
+        use_two_phase = st.checkbox("Two-Phase Generation", value=False,
+                                    help="Generate the chart structure first and show it right away, then load "
+                                         "node details with parallel requests (takes precedence over streaming)")
+        
+        use_divide = st.checkbox("Split Large Processes into Phases", value=True,
+                                 help=f"For processes of about {DIVIDE_MIN_NODES}+ steps, outline the phases first "
+                                      "and generate them in parallel (takes precedence over the options above)")
+        
+        use_hedging = st.checkbox("Hedge Slow Requests", value=False,
+                                  help="If a request runs longer than 90% of recent ones, send a duplicate and "
+                                       "use whichever finishes first (not used while streaming)")
+        hedge_budget = st.slider("Hedge Budget (% extra calls)", min_value=1, max_value=50, value=10,
+                                 disabled=not use_hedging,
+                                 help="Upper bound on duplicate requests as a share of all requests")
+        if not use_hedging:
+            hedge_budget = None
+        
         optimization_level = st.select_slider(
             "Performance Optimization Level",
             options=["Balanced", "Faster Response", "Better Quality"],
             value="Faster Response",
             help="Adjust the balance between speed and quality"
         )
+        
+        adaptive_tokens = st.checkbox("Adaptive Token Budget", value=True,
+                                    help="Size max_tokens from the number of steps, branches and conditions "
+                                         "in the description so long processes aren't truncated")
 
         # Performance metrics
         st.markdown("### Performance Metrics")
@@ -1966,12 +1194,77 @@ with st.sidebar:
             #     logger.error("This is an error message")
             #     st.success("Log test complete. Check your console or logs.")
                 
+            # API client retry counters
+            st.write("### API Client")
+            client_stats = get_client().get_stats()
+            st.text(f"Endpoint: {get_client().api_url}")
+            breaker_stats = get_client().breaker.get_stats()
+            st.text(f"Circuit: {breaker_stats['state']} ({breaker_stats['consecutive_failures']} failures in a row, "
+                    f"opened {breaker_stats['times_opened']}x, {breaker_stats['fast_failures']} fast-failed)")
+            if breaker_stats["state"] == "open":
+                st.text(f"Probing again in {breaker_stats['retry_in']:.0f}s")
+            degraded_stats = get_degraded_stats()
+            if degraded_stats:
+                st.text("Placeholder charts: " + ", ".join(f"{kind} {count}" for kind, count in degraded_stats.items()))
+            st.text(f"Requests: {client_stats['requests']} (attempts: {client_stats['attempts']})")
+            st.text(f"Retries: {client_stats['retries']} (429: {client_stats['retries_429']}, "
+                    f"5xx: {client_stats['retries_5xx']}, connection: {client_stats['retries_connection']})")
+            st.text(f"Failures: {client_stats['failures']}")
+            flight_stats = get_single_flight().get_stats()
+            st.text(f"Coalesced: {flight_stats['coalesced']} of {flight_stats['calls']} calls saved "
+                    f"({flight_stats['in_flight']} in flight)")
+            queue_stats = get_scheduler().get_stats()
+            st.text(f"Queue: {queue_stats['queued']} waiting, {queue_stats['granted']} sent "
+                    f"(avg wait {queue_stats['avg_wait']:.2f}s)")
+            st.text(f"Refused: {queue_stats['rejected']}  Timed out: {queue_stats['timeouts']}")
+            
+            # Observed completion latencies, which drive the hedging delay
+            st.write("### Latency")
+            hedge_stats = get_hedged_requester().get_stats()
+            if hedge_stats["samples"]:
+                st.text(f"p50: {hedge_stats['p50']:.2f}s  p90: {hedge_stats['p90']:.2f}s  "
+                        f"p99: {hedge_stats['p99']:.2f}s ({hedge_stats['samples']} calls)")
+                histogram = {f"≤{bound:g}s": count
+                             for bound, count in get_hedged_requester().histogram.buckets() if count}
+                st.bar_chart(histogram)
+            st.text(f"Hedges: {hedge_stats['hedges']} sent, {hedge_stats['hedge_wins']} won, "
+                    f"{hedge_stats['budget_denied']} over budget")
+                
             # Cache information
             st.write("### Cache Status")
-            st.text(f"Cache Size: {len(_response_cache)} items")
+            cache_stats = _response_cache.get_stats()
+            st.text(f"Cache Size: {cache_stats['items']} items "
+                    f"({cache_stats['size_bytes'] / 1024:.1f} / {cache_stats['max_bytes'] / 1024:.0f} KB)")
+            st.text(f"Hits: {cache_stats['hits']}  Misses: {cache_stats['misses']}")
+            st.text(f"Evictions: {cache_stats['evictions']}  Expired: {cache_stats['expirations']}")
+            st.text(f"Similar-Prompt Index: {len(get_similarity_index())} prompts")
             if st.button("Clear Cache"):
                 _response_cache.clear()
-                st.success("Cache cleared successfully")
+                get_similarity_index().clear()
+                try:
+                    get_disk_cache().clear()
+                    st.success("Cache cleared successfully")
+                except sqlite3.Error as e:
+                    st.warning(f"Memory cache cleared; the disk cache could not be: {str(e)}")
+            
+            try:
+                disk_stats = get_disk_cache().get_stats()
+            except sqlite3.Error as e:
+                st.text(f"Disk Cache: unavailable ({str(e)})")
+                disk_stats = None
+            if disk_stats is not None:
+                st.text(f"Disk Cache: {disk_stats['items'].get('flowchart', 0)} flowcharts, "
+                        f"{disk_stats['items'].get('html', 0)} renders")
+                st.text(f"Disk Size: {disk_stats['size_bytes'] / 1024:.1f} KB "
+                        f"(file {disk_stats['file_bytes'] / 1024:.1f} KB)")
+                st.text(f"Disk Hits: {disk_stats['hits']}  Misses: {disk_stats['misses']}  "
+                        f"Evictions: {disk_stats['evictions']}")
+                if st.button("Compact Disk Cache"):
+                    try:
+                        get_disk_cache().compact()
+                        st.success("Disk cache compacted")
+                    except sqlite3.Error as e:
+                        st.warning(f"Could not compact the disk cache: {str(e)}")
 
 # Apply performance settings based on optimization level
 if optimization_level == "Faster Response":
@@ -1984,6 +1277,14 @@ else:  # Balanced
     max_tokens = 1000
     temperature = 0.5
 
+# Give complex descriptions enough room for complete JSON; caching keys on the level's own budget
+base_max_tokens = max_tokens
+if adaptive_tokens and description:
+    max_tokens = estimate_token_budget(description, max_tokens)
+
+# Set when this run draws a chart; on other reruns (any widget, downloads included) the last chart is redrawn below
+chart_displayed = False
+
     # Generate button
 if st.button("Generate Flow Chart"):
     # First, validate inputs
@@ -2000,7 +1301,14 @@ if st.button("Generate Flow Chart"):
             
             # If using parallel processing, use the progress function
             if use_parallel:
-                result = generate_flowchart_with_progress(description, api_key, industry, theme_key, orientation)
+                result = generate_flowchart_with_progress(description, api_key, industry, theme_key, orientation,
+                                                          stream=use_streaming, use_cache=use_caching,
+                                                          similarity_threshold=similarity_threshold,
+                                                          max_tokens=max_tokens, temperature=temperature,
+                                                          session_id=st.session_state.session_id,
+                                                          two_phase=use_two_phase, hedge_budget=hedge_budget,
+                                                          divide=use_divide, backend=render_backend,
+                                                          base_max_tokens=base_max_tokens)
                 
                 if result:
                     # Record total execution time
@@ -2017,11 +1325,18 @@ if st.button("Generate Flow Chart"):
                     # Display performance settings in the side menu
                     max_tokens_placeholder.text(f"Max Tokens: {max_tokens}")
                     temperature_placeholder.text(f"Temperature: {temperature}")
+                    # Keep the chart so it can be edited on later reruns
+                    st.session_state.current_flowchart = {"data": result["flowchart_data"], "layout": result["layout"],
+                                                          "html": result["flowchart_html"], "theme_key": theme_key,
+                                                          "orientation": orientation, "backend": render_backend}
+                    
                     # Display the flowchart
                     st.markdown("<h3>Generated Flow Chart</h3>", unsafe_allow_html=True)
+                    show_degraded_notice(result["flowchart_data"])
                     
                     # Display the flowchart
                     st.components.v1.html(result['flowchart_html'], height=700)
+                    chart_displayed = True
                     
                     # Add Export Options if available
                     if result['chart_id']:
@@ -2029,10 +1344,6 @@ if st.button("Generate Flow Chart"):
                         if export_options:
                             st.components.v1.html(export_options, height=0, scrolling=False)
                     
-                    # Display download button
-                    if result['html_button']:
-                        st.markdown(result['html_button'], unsafe_allow_html=True)
-                    
             else:
                 # Original sequential approach with spinner
                 with st.spinner("Generating flow chart..."):
@@ -2040,7 +1351,15 @@ if st.button("Generate Flow Chart"):
                     
                     # Call Mistral API to get the flowchart structure
                     api_start_time = time.time()
-                    flowchart_data = generate_flowchart_description(description, api_key, industry)
+                    if use_divide and should_divide_process(description):
+                        generate = generate_flowchart_divided
+                    elif use_two_phase:
+                        generate = generate_flowchart_two_phase
+                    else:
+                        generate = generate_flowchart_description
+                    flowchart_data = generate(description, api_key, industry, use_caching, similarity_threshold,
+                                              max_tokens, temperature, st.session_state.session_id,
+                                              hedge_budget=hedge_budget, base_max_tokens=base_max_tokens)
                     api_time = time.time() - api_start_time
                     st.session_state.last_api_time = api_time
                     logger.info(f"API processing completed in {api_time:.2f} seconds")
@@ -2049,7 +1368,9 @@ if st.button("Generate Flow Chart"):
                         try:
                             # Generate and display HTML/CSS flowchart
                             render_start_time = time.time()
-                            flowchart_html = generate_flowchart_html(flowchart_data, theme_key, orientation)
+                            layout = calculate_layout(flowchart_data["nodes"], orientation)
+                            flowchart_html = generate_flowchart_html_cached(flowchart_data, theme_key, orientation,
+                                                                            use_caching, render_backend, layout)
                             render_time = time.time() - render_start_time
                             st.session_state.last_render_time = render_time
                             logger.info(f"HTML generation completed in {render_time:.2f} seconds")
@@ -2062,12 +1383,22 @@ if st.button("Generate Flow Chart"):
                             execution_time_placeholder.info(f"⏱️ Total: {total_execution_time:.2f}s")
                             api_time_placeholder.text(f"🔄 API: {api_time:.2f}s")
                             render_time_placeholder.text(f"🖥️ Render: {render_time:.2f}s")
+                            max_tokens_placeholder.text(f"Max Tokens: {max_tokens}")
+                            temperature_placeholder.text(f"Temperature: {temperature}")
                 
+                            # Keep the chart so it can be edited on later reruns
+                            st.session_state.current_flowchart = {"data": flowchart_data, "layout": layout,
+                                                                  "html": flowchart_html, "theme_key": theme_key,
+                                                                  "orientation": orientation,
+                                                                  "backend": render_backend}
+                            
                             st.markdown("<h3>Generated Flow Chart</h3>", unsafe_allow_html=True)
+                            show_degraded_notice(flowchart_data)
                             
                             # Display the flowchart
                             try:
                                 st.components.v1.html(flowchart_html, height=700)
+                                chart_displayed = True
                                 logger.info("Flowchart displayed successfully")
                             except Exception as e:
                                 logger.error(f"Error displaying flowchart: {str(e)}")
@@ -2087,20 +1418,6 @@ if st.button("Generate Flow Chart"):
                                 logger.error(f"Error adding export options: {str(e)}")
                                 # Non-critical error, don't show to user
                             
-                            # HTML Download - basic functionality
-                            try:
-                                html_button = get_download_link(flowchart_html, "flowchart.html")
-                                if html_button:
-                                    st.markdown(html_button, unsafe_allow_html=True)
-                                    logger.info("Download button added successfully")
-                                else:
-                                    raise Exception("Failed to generate download button")
-                            except Exception as e:
-                                logger.error(f"Error creating download button: {str(e)}")
-                                st.error("Could not create download button. Please try again or contact support.")
-                                if debug_mode:
-                                    st.error(traceback.format_exc())
-                            
                         except Exception as e:
                             logger.error(f"Error generating flowchart HTML: {str(e)}")
                             logger.error(traceback.format_exc())
@@ -2118,6 +1435,101 @@ if st.button("Generate Flow Chart"):
             if debug_mode:
                 st.error(traceback.format_exc())
 
+# Edit the last chart with a small patch instead of regenerating it
+if "current_flowchart" in st.session_state:
+    with st.expander("Edit Flow Chart"):
+        edit_instruction = st.text_input("Describe a change",
+                                         placeholder="For example: add an approval step after review")
+        if st.button("Apply Edit"):
+            if not api_key:
+                st.error("Please enter your Mistral API key in the sidebar")
+            elif not edit_instruction:
+                st.error("Please describe the change you want")
+            else:
+                try:
+                    current = st.session_state.current_flowchart
+                    with st.spinner("Applying edit..."):
+                        edit_start_time = time.time()
+                        flowchart_data, changed_ids, operations = edit_flowchart(
+                            current["data"], edit_instruction, api_key, industry, session_id=st.session_state.session_id
+                        )
+                        
+                        # Only moved or changed nodes get new layout entries; the rest keep their rendered HTML
+                        previous_layout = current["layout"]
+                        if previous_layout is None or current.get("orientation") != orientation:
+                            previous_layout = calculate_layout(current["data"]["nodes"], orientation)
+                        layout, updated_ids = update_layout(previous_layout, flowchart_data["nodes"], changed_ids,
+                                                            orientation)
+                        flowchart_html = generate_flowchart_html(flowchart_data, theme_key, orientation, layout=layout,
+                                                                 backend=render_backend)
+                        st.session_state.current_flowchart = {"data": flowchart_data, "layout": layout,
+                                                              "html": flowchart_html, "theme_key": theme_key,
+                                                              "orientation": orientation, "backend": render_backend}
+                    
+                    st.success(f"Applied {len(operations)} changes in {time.time() - edit_start_time:.2f}s "
+                               f"({len(updated_ids)} of {len(layout)} nodes re-laid out)")
+                    st.components.v1.html(flowchart_html, height=700)
+                    chart_displayed = True
+                except PatchError as e:
+                    st.error(f"Could not apply the edit: {str(e)}")
+                except SchedulerBusyError as e:
+                    st.warning(f"The service is busy: {str(e)}")
+                except Exception as e:
+                    logger.error(f"Error editing flowchart: {str(e)}")
+                    st.error(f"Error calling Mistral API: {str(e)}")
+                    if debug_mode:
+                        st.error(traceback.format_exc())
+
+# Download the current chart as raw bytes served by Streamlit, built only when asked for
+if "html" in st.session_state.get("current_flowchart", {}):
+    current = st.session_state.current_flowchart
+    if not chart_displayed:
+        st.markdown("<h3>Generated Flow Chart</h3>", unsafe_allow_html=True)
+        st.components.v1.html(current["html"], height=700)
+    
+    with st.expander("Download", expanded=True):
+        download_formats = {**EXPORT_FORMATS, "png": PNG_FORMAT}
+        export_format = st.radio("Format", list(download_formats.keys()),
+                                 format_func=lambda x: download_formats[x][0], horizontal=True)
+        offline_export = st.checkbox("Offline Export", value=False, disabled=export_format == "png",
+                                     help="Embed only the theme's font and the icons the chart uses, so the page "
+                                          "makes no network requests when opened")
+        missing_assets = []
+        if offline_export and export_format != "png":
+            missing_assets = missing_offline_assets(current["theme_key"])
+        if missing_assets:
+            st.warning(f"Local fonts or icons are missing, so the offline export will fall back to system fonts "
+                       f"or leave icons out: {', '.join(missing_assets)}. "
+                       f"Run `python offline_assets.py` to download them.")
+        
+        # Prepared files are kept with the chart, so a new chart or edit drops them
+        downloads = current.setdefault("downloads", {})
+        download_key = (export_format, offline_export and export_format != "png")
+        prepare_slot = st.empty()
+        if download_key not in downloads and prepare_slot.button("Prepare Download"):
+            prepare_slot.empty()
+            try:
+                downloads[download_key] = prepare_download(current, export_format, offline_export)
+            except Exception as e:
+                logger.error(f"Error preparing download: {str(e)}")
+                st.error(f"Could not prepare the download: {str(e)}")
+                if debug_mode:
+                    st.error(traceback.format_exc())
+        
+        if download_key in downloads:
+            data, document_size = downloads[download_key]
+            label, file_name, mime = download_formats[export_format]
+            st.download_button(f"Download {label}", data, file_name=file_name, mime=mime)
+            
+            # Payload sizes: the file against the plain document
+            size_col, download_col = st.columns(2)
+            if document_size is None:
+                download_col.metric("Download", f"{len(data) / 1024:.1f} KB")
+            else:
+                size_col.metric("Document", f"{document_size / 1024:.1f} KB")
+                download_col.metric("Download", f"{len(data) / 1024:.1f} KB",
+                                    delta=f"{100 * (len(data) / document_size - 1):.0f}%", delta_color="inverse")
+
 
 with tab2:
     st.markdown("""
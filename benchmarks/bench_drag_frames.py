@@ -0,0 +1,115 @@
+"""Headless drag timing: script work per frame while a node is dragged, by graph size.
+
+Loads each chart in a headless Playwright browser (`playwright install
+chromium`) and drags its best-connected node with real mouse input. Every
+requestAnimationFrame callback is wrapped to time the callback plus the
+style/layout it leaves behind, and the input handlers are timed the same
+way, so the numbers are the main-thread cost of one drag frame. With
+connectors updated through the node->edges index this stays flat as the
+graph grows; the "edges" column is the dragged node's degree for reference.
+
+Usage: python benchmarks/bench_drag_frames.py [--sizes 100,400,1600,6400] [--backends html,svg] [--moves 60]
+"""
+import argparse
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Sibling benchmarks are imported for their chart generators, however this script is started
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_layout_index import random_dag  # noqa: E402
+from bench_svg_backend import WAIT_FOR_FRAME, open_browser  # noqa: E402
+from flowchart_renderer import RENDER_BACKENDS, generate_flowchart_html  # noqa: E402
+
+# Installed before the chart's script runs: times rAF callbacks and drag input handlers
+FRAME_TIMER = """
+window.__frameWork = 0;
+const timed = (callback, self, args) => {
+    const start = performance.now();
+    const result = callback.apply(self, args);
+    document.body.getBoundingClientRect();
+    window.__frameWork += performance.now() - start;
+    return result;
+};
+const requestFrame = window.requestAnimationFrame.bind(window);
+window.requestAnimationFrame = callback => requestFrame(time => timed(callback, window, [time]));
+const addListener = EventTarget.prototype.addEventListener;
+EventTarget.prototype.addEventListener = function(type, listener, options) {
+    if (['mousemove', 'pointermove'].includes(type) && typeof listener === 'function') {
+        const inner = listener;
+        listener = function(...args) { return timed(inner, this, args); };
+    }
+    return addListener.call(this, type, listener, options);
+};
+"""
+
+# Centre of the node with the most connectors, scrolled into view
+PICK_NODE = """() => {
+    const degree = new Map();
+    document.querySelectorAll('[data-source]').forEach(edge => {
+        [edge.dataset.source, edge.dataset.target].forEach(id => degree.set(id, (degree.get(id) || 0) + 1));
+    });
+    let best = null;
+    document.querySelectorAll('.node, .svg-node').forEach(node => {
+        if (!best || (degree.get(node.id) || 0) > (degree.get(best.id) || 0)) best = node;
+    });
+    best.scrollIntoView({block: 'center', inline: 'center'});
+    const rect = best.getBoundingClientRect();
+    return {x: rect.left + rect.width / 2, y: rect.top + rect.height / 2, edges: degree.get(best.id) || 0};
+}"""
+
+
+def drag_frame_work(page, html, moves):
+    """(milliseconds of main-thread work per drag frame, dragged node's degree)"""
+    page.set_content(f"<!DOCTYPE html><html><body>{html}</body></html>")
+    page.wait_for_timeout(200)
+    node = page.evaluate(PICK_NODE)
+    page.mouse.move(node["x"], node["y"])
+    page.mouse.down()
+    work = []
+    for step in range(moves):
+        page.evaluate("() => { window.__frameWork = 0; }")
+        page.mouse.move(node["x"] + step * 2, node["y"] + step)
+        page.evaluate(WAIT_FOR_FRAME)
+        work.append(page.evaluate("() => window.__frameWork"))
+    page.mouse.up()
+    return work, node["edges"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,400,1600,6400")
+    parser.add_argument("--backends", default="html,svg")
+    parser.add_argument("--theme", default="modern")
+    parser.add_argument("--moves", type=int, default=60)
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+    backends = [b for b in args.backends.split(",") if b in RENDER_BACKENDS]
+
+    browser = open_browser()
+    if browser is None:
+        print("Playwright browser not available (run `playwright install chromium`)")
+        return
+    page = browser[1].new_page(viewport={"width": 1280, "height": 900})
+    page.add_init_script(FRAME_TIMER)
+
+    print(f"{'backend':>8} {'nodes':>6} {'edges':>6} {'frame median':>13} {'frame p95':>10} {'vs smallest':>12}")
+    for backend in backends:
+        baseline = None
+        for size in sizes:
+            html = generate_flowchart_html(random_dag(size), args.theme, backend=backend)
+            work, edges = drag_frame_work(page, html, args.moves)
+            work.sort()
+            median = statistics.median(work)
+            baseline = baseline or median
+            print(f"{backend:>8} {size:>6} {edges:>6} {median:>11.3f}ms {work[int(len(work) * 0.95) - 1]:>8.3f}ms "
+                  f"{median / baseline:>11.2f}x")
+
+    browser[1].close()
+    browser[0].stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Download payload per export format, against the old base64 data-URI link.
+
+The data-URI link put the whole document, base64-encoded, into the page on
+every rerun (and encoded it twice to get there). Downloads are now served as
+bytes and only built on request; this prints what each format weighs and
+costs to build.
+
+Usage: python benchmarks/bench_export_payload.py [--sizes 20,200,2000] [--backend html] [--repeat 5]
+"""
+import argparse
+import base64
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Sibling benchmarks are imported for their chart generators, however this script is started
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_layout_index import random_dag  # noqa: E402
+from flowchart_renderer import (EXPORT_FORMATS, RENDER_BACKENDS, export_bytes, export_document,  # noqa: E402
+                                generate_flowchart_html)
+
+
+def best_time(function, repeat):
+    """Fastest of `repeat` calls, in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="20,200,2000")
+    parser.add_argument("--backend", default="html", choices=sorted(RENDER_BACKENDS))
+    parser.add_argument("--theme", default="modern")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'nodes':>6} {'format':>9} {'bytes':>10} {'vs data URI':>12} {'build':>9}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        document = export_document(generate_flowchart_html(random_dag(size), args.theme, backend=args.backend))
+        data_uri = len(base64.b64encode(document.encode()))
+        print(f"{size:>6} {'data URI':>9} {data_uri:>10} {'':>12} "
+              f"{best_time(lambda: base64.b64encode(document.encode()), args.repeat):>7.2f}ms")
+        for export_format in EXPORT_FORMATS:
+            data = export_bytes(document, export_format)
+            build_ms = best_time(lambda: export_bytes(document, export_format), args.repeat)
+            print(f"{size:>6} {export_format:>9} {len(data):>10} {100 * (len(data) / data_uri - 1):>11.0f}% "
+                  f"{build_ms:>7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
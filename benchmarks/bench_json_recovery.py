@@ -0,0 +1,153 @@
+"""Fuzz and benchmark recover_flowchart_json against malformed LLM output.
+
+Usage: python benchmarks/bench_json_recovery.py [--cases 2000] [--seed 7]
+
+The fuzz pass mutates valid flowchart JSON the way model output tends to
+break (truncation, trailing or doubled commas, markdown fences, chatty
+prefixes, some with brackets of their own, unclosed brackets) and checks
+that every node fully present before the damage is recovered unchanged.
+The benchmark pass times recovery on growing inputs next to the old
+regex-based cleanup.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flowchart_parser import recover_flowchart_json  # noqa: E402
+
+
+def make_flowchart(rng, node_count):
+    nodes = []
+    for i in range(node_count):
+        nodes.append({
+            "id": f"node{i + 1}",
+            "text": rng.choice(["Start", "Review {request}", "Approve?", "Notify \"user\"", "End [done]"]),
+            "type": rng.choice(["start", "process", "decision", "end"]),
+            "connections": [f"node{i + 2}"] if i + 1 < node_count else [],
+            "icon": rng.choice(["fa-play-circle", "fa-cog", "fa-question-circle", "fa-flag-checkered"]),
+            "description": "Purpose: " + " ".join(rng.choice(["step", "{", "}", "[", "]", ",", "\\n", "data"])
+                                                  for _ in range(rng.randint(5, 60))),
+        })
+    return {"nodes": nodes}
+
+
+def node_spans(text):
+    """(end offset, node) for each node in valid JSON text produced by json.dumps"""
+    spans = []
+    decoder = json.JSONDecoder()
+    pos = text.index("[") + 1
+    while True:
+        while text[pos] in " ,":
+            pos += 1
+        if text[pos] == "]":
+            return spans
+        node, end = decoder.raw_decode(text, pos)
+        spans.append((end, node))
+        pos = end
+
+
+def mutate(rng, flowchart, text):
+    """Damage valid JSON text; returns (damaged text, offset of the first damage)"""
+    kind = rng.choice(["truncate", "trailing_comma", "double_comma", "fence", "prefix", "unclosed"])
+    if kind == "truncate":
+        cut = rng.randint(1, len(text) - 1)
+        return text[:cut], cut
+    if kind == "trailing_comma":
+        # Rebuilt structurally so brackets inside strings are left alone
+        nodes = [json.dumps(node)[:-1] + ", }" for node in flowchart["nodes"]]
+        return '{"nodes": [' + ", ".join(nodes) + ", ]}", len(text)
+    if kind == "double_comma":
+        return '{"nodes": [' + ",, ".join(json.dumps(node) for node in flowchart["nodes"]) + "]}", len(text)
+    if kind == "fence":
+        return "```json\n" + text + "\n```", len(text)
+    if kind == "prefix":
+        # Chatty prefixes, including ones with brackets of their own before the JSON
+        prefix = rng.choice(["Here is your flowchart:\n", "Sure [see below]: ", "Sure {as requested}: ",
+                             "Steps [1-3] and {notes} follow:\n"])
+        return prefix + text, len(text)
+    return text[:-2], len(text) - 2
+
+
+def fuzz(cases, seed):
+    rng = random.Random(seed)
+    failures = 0
+    for case in range(cases):
+        flowchart = make_flowchart(rng, rng.randint(1, 25))
+        original = json.dumps(flowchart)
+        damaged, damage_at = mutate(rng, flowchart, original)
+        try:
+            recovered = recover_flowchart_json(damaged)
+        except Exception as e:  # the recovery path must never raise
+            print(f"case {case}: raised {e!r}")
+            failures += 1
+            continue
+        recovered_nodes = recovered["nodes"] if recovered else []
+        expected = [node for end, node in node_spans(original) if end <= damage_at]
+        if recovered_nodes[:len(expected)] != expected:
+            print(f"case {case}: expected {len(expected)} intact nodes, got {len(recovered_nodes)}")
+            failures += 1
+        for node in recovered_nodes[len(expected):]:
+            # Anything beyond the intact nodes must be a salvaged prefix of a real node
+            source = next((n for _, n in node_spans(original) if n["id"] == node["id"]), None)
+            if source is None or any(source.get(k) != v for k, v in node.items()):
+                print(f"case {case}: invented node {node!r}")
+                failures += 1
+    print(f"fuzz: {cases} cases, {failures} failures")
+    return failures
+
+
+def legacy_recover(content):
+    """The regex cleanup previously used in try_parse_flowchart_content"""
+    match = re.search(r'\{[\s\S]*"nodes"[\s\S]*\}', content)
+    if not match:
+        return None
+    json_str = re.sub(r',\s*}', '}', match.group(0))
+    json_str = re.sub(r',\s*]', ']', json_str)
+    try:
+        return json.loads(json_str)
+    except json.JSONDecodeError:
+        return None
+
+
+def benchmark(seed):
+    rng = random.Random(seed)
+    print(f"{'nodes':>7} {'bytes':>10} {'recover ms':>11} {'us/KB':>7} {'nodes kept':>11} {'legacy ms':>10} {'legacy kept':>12}")
+    for node_count in (10, 100, 1000, 5000):
+        text = json.dumps(make_flowchart(rng, node_count))
+        # Truncated mid-node with a trailing comma earlier on: typical broken output
+        damaged = text.replace('"], "icon"', '",], "icon"', 1)[:int(len(text) * 0.9)]
+
+        start = time.perf_counter()
+        recovered = recover_flowchart_json(damaged)
+        elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        legacy = legacy_recover(damaged)
+        legacy_elapsed = time.perf_counter() - start
+
+        kept = len(recovered["nodes"]) if recovered else 0
+        legacy_kept = len(legacy["nodes"]) if legacy else 0
+        print(f"{node_count:>7} {len(damaged):>10} {elapsed * 1000:>11.2f} "
+              f"{elapsed * 1e6 / (len(damaged) / 1024):>7.1f} {kept:>11} "
+              f"{legacy_elapsed * 1000:>10.2f} {legacy_kept:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    failures = fuzz(args.cases, args.seed)
+    benchmark(args.seed)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Benchmark connector resolution through the Layout id index on synthetic graphs.
+
+For chains, decision trees and random DAGs of growing size, times resolving
+every edge with a scan of the layout per edge (how the renderer used to find
+targets) against Layout.edges(), plus building the Layout and a full render.
+
+Usage: python benchmarks/bench_layout_index.py [--sizes 1250,2500,5000] [--no-scan]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Sibling benchmarks are imported for their chart generators, however this script is started
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_stylesheet import linear_flowchart  # noqa: E402
+from flowchart_layout import calculate_layout  # noqa: E402
+from flowchart_renderer import generate_flowchart_html  # noqa: E402
+
+
+def decision_tree(count):
+    """Binary tree of decisions; the last level is end nodes"""
+    nodes = []
+    for i in range(count):
+        children = [f"node{c + 1}" for c in (2 * i + 1, 2 * i + 2) if c < count]
+        node_type = "start" if i == 0 else ("decision" if children else "end")
+        nodes.append({"id": f"node{i + 1}", "text": f"Step {i + 1}", "type": node_type, "connections": children})
+    return {"nodes": nodes}
+
+
+def random_dag(count, seed=7):
+    """Chain with extra forward edges, about 1.5 edges per node"""
+    rng = random.Random(seed)
+    flowchart = linear_flowchart(count)
+    for i, node in enumerate(flowchart["nodes"][:-2]):
+        if rng.random() < 0.5:
+            node["connections"].append(f"node{rng.randint(i + 3, count)}")
+    return flowchart
+
+
+GRAPHS = {"chain": linear_flowchart, "tree": decision_tree, "dag": random_dag}
+
+
+def resolve_by_scan(layout):
+    edges = 0
+    for source_info in layout:
+        for target_id in source_info["node"].get("connections", []):
+            target_info = next((n for n in layout if n["node"]["id"] == target_id), None)
+            if target_info:
+                edges += 1
+    return edges
+
+
+def resolve_by_index(layout):
+    return sum(1 for _ in layout.edges())
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1250,2500,5000")
+    parser.add_argument("--no-scan", action="store_true", help="Skip the slow per-edge scan")
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    print(f"{'graph':>6} {'nodes':>6} {'edges':>6} {'scan':>10} {'index':>9} {'build':>9} {'render':>9} "
+          f"{'render/node':>12}")
+    for name, make in GRAPHS.items():
+        for size in sizes:
+            flowchart_data = make(size)
+            build_time, layout = timed(calculate_layout, flowchart_data["nodes"])
+            index_time, edges = timed(resolve_by_index, layout)
+            scan = "-"
+            if not args.no_scan:
+                scan_time, scanned = timed(resolve_by_scan, layout)
+                assert scanned == edges
+                scan = f"{scan_time * 1000:.1f}ms"
+            render_time, _ = timed(generate_flowchart_html, flowchart_data, "modern", "landscape", 1.0, layout)
+            print(f"{name:>6} {size:>6} {edges:>6} {scan:>10} {index_time * 1000:>7.2f}ms {build_time * 1000:>7.1f}ms "
+                  f"{render_time * 1000:>7.1f}ms {render_time / size * 1e6:>10.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""PNG rasterizer: peak memory of tiled against whole-image drawing, and process pool throughput.
+
+Each size is drawn in a fresh worker process, once in tiled bands and
+once as a single tile the size of the chart (what drawing the whole
+image at once costs), and the worker reports its peak RSS. Portrait
+charts grow wide with depth, so --orientation portrait checks that
+width is bounded too. Pillow's pixel
+buffers live outside the Python heap, so tracemalloc would not see them.
+The pool section renders the same batch of charts with one worker and
+with one per CPU.
+
+Usage: python benchmarks/bench_raster.py [--sizes 200,1000] [--scale 2] [--orientation landscape] [--charts 8]
+"""
+import argparse
+import concurrent.futures
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Sibling benchmarks are imported for their chart generators, however this script is started
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_layout_index import random_dag  # noqa: E402
+import flowchart_raster  # noqa: E402
+
+
+def render_in_worker(size, scale, theme_key, orientation, whole):
+    """(seconds, PNG bytes, peak RSS in MB, image size) for one chart, run in its own process"""
+    if whole:
+        flowchart_raster.TILE_SIZE = flowchart_raster.BAND_PIXELS = 1 << 62
+    flowchart_data = random_dag(size)
+    start = time.perf_counter()
+    png = flowchart_raster.render_png(flowchart_data, theme_key, orientation, scale=scale)
+    elapsed = time.perf_counter() - start
+    width, height = int.from_bytes(png[16:20], "big"), int.from_bytes(png[20:24], "big")
+    return elapsed, len(png), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, (width, height)
+
+
+def fresh_process(function, *args):
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(function, *args).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="200,1000")
+    parser.add_argument("--scale", type=float, default=2.0)
+    parser.add_argument("--theme", default="modern")
+    parser.add_argument("--orientation", default="landscape", choices=("landscape", "portrait"))
+    parser.add_argument("--charts", type=int, default=8)
+    parser.add_argument("--chart-size", type=int, default=300)
+    args = parser.parse_args()
+
+    print(f"{'nodes':>6} {'image':>12} {'mode':>7} {'time':>8} {'PNG':>9} {'peak RSS':>9}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        for mode in ("tiled", "whole"):
+            elapsed, png_bytes, peak, (width, height) = fresh_process(render_in_worker, size, args.scale, args.theme,
+                                                                      args.orientation, mode == "whole")
+            print(f"{size:>6} {f'{width}x{height}':>12} {mode:>7} {elapsed:>7.2f}s {png_bytes / 1024:>7.0f}KB "
+                  f"{peak:>7.0f}MB")
+
+    charts = [(random_dag(args.chart_size), args.theme)] * args.charts
+    print(f"\n{args.charts} charts of {args.chart_size} nodes:")
+    for workers in sorted({1, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        flowchart_raster.render_pngs(charts, scale=args.scale, max_workers=workers)
+        print(f"{workers:>3} worker(s): {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Benchmark how flowchart rendering scales with the number of nodes.
+
+Renders linear charts of increasing size and reports time per node, which
+should stay roughly flat; it grew with chart size while every edge scanned
+the whole layout and the markup was built with string +=.
+
+Usage: python benchmarks/bench_render_scaling.py [--sizes 1000,2000,5000,10000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Sibling benchmarks are imported for their chart generators, however this script is started
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_stylesheet import linear_flowchart  # noqa: E402
+from flowchart_renderer import generate_flowchart_html, iter_flowchart_html  # noqa: E402
+
+
+def best_of(repeat, render):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = render()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,2000,5000,10000")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--theme", default="modern")
+    args = parser.parse_args()
+
+    print(f"{'nodes':>8} {'render':>10} {'per node':>10} {'stream':>10} {'chunks':>8} {'HTML':>10}")
+    per_node = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        flowchart_data = linear_flowchart(size)
+        render_time, html = best_of(args.repeat, lambda: generate_flowchart_html(flowchart_data, args.theme))
+        stream_time, chunks = best_of(args.repeat, lambda: sum(1 for _ in iter_flowchart_html(flowchart_data,
+                                                                                             args.theme)))
+        per_node.append(render_time / size)
+        print(f"{size:>8} {render_time * 1000:>8.1f}ms {render_time / size * 1e6:>8.1f}us "
+              f"{stream_time * 1000:>8.1f}ms {chunks:>8} {len(html) / 1e6:>8.2f}MB")
+    print(f"\nTime per node, largest vs smallest chart: {per_node[-1] / per_node[0]:.2f}x (1.00x is linear)")
+
+
+if __name__ == "__main__":
+    main()
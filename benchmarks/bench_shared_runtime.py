@@ -0,0 +1,51 @@
+"""Page cost of many charts with the client runtime per chart against sent once.
+
+"Per chart" renders every chart standalone (stylesheet and runtime in each),
+which is what a page of concatenated generate_flowchart_html calls gets.
+"Shared" is generate_flowcharts_html: stylesheets and runtime once, then
+each chart's markup and its one-line registration.
+
+Usage: python benchmarks/bench_shared_runtime.py [--nodes 20] [--charts 1,6,24] [--backend html]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Sibling benchmarks are imported for their chart generators, however this script is started
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_stylesheet import linear_flowchart  # noqa: E402
+from flowchart_renderer import (RENDER_BACKENDS, RUNTIME_SCRIPT, generate_flowchart_html,  # noqa: E402
+                                generate_flowcharts_html)
+
+
+def script_bytes(html):
+    """Bytes inside executable <script> elements (the JSON graph of the virtual backend is data)"""
+    total = 0
+    for chunk in html.split("<script>")[1:]:
+        total += len(chunk.split("</script>", 1)[0])
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=20)
+    parser.add_argument("--charts", default="1,6,24")
+    parser.add_argument("--backend", default="html", choices=sorted(RENDER_BACKENDS))
+    args = parser.parse_args()
+
+    flowchart_data = linear_flowchart(args.nodes)
+    print(f"Runtime: {len(RUNTIME_SCRIPT) / 1024:.1f} KB, sent once per page\n")
+    print(f"{'charts':>6} {'per chart':>10} {'shared':>9} {'saved':>6} {'script per chart':>17} {'shared':>9}")
+    for count in [int(c) for c in args.charts.split(",")]:
+        charts = [(flowchart_data, "modern")] * count
+        standalone = "".join(generate_flowchart_html(data, theme_key, backend=args.backend) for data, theme_key in charts)
+        shared = generate_flowcharts_html(charts, backend=args.backend)
+        print(f"{count:>6} {len(standalone) / 1024:>8.1f}KB {len(shared) / 1024:>7.1f}KB "
+              f"{100 * (1 - len(shared) / len(standalone)):>5.0f}% "
+              f"{script_bytes(standalone) / count:>16.0f}B {script_bytes(shared) / count:>8.0f}B")
+
+
+if __name__ == "__main__":
+    main()
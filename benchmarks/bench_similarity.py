@@ -0,0 +1,92 @@
+"""Benchmark near-duplicate prompt lookup in SimilarityIndex.
+
+Usage: python benchmarks/bench_similarity.py [--items 100000] [--queries 2000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from similarity_index import SimilarityIndex  # noqa: E402
+
+VOCAB = (
+    "customer support ticket refund order payment invoice approval review manager employee "
+    "onboarding training account login password reset shipping delivery warehouse inventory "
+    "supplier purchase request budget audit compliance patient triage diagnosis treatment "
+    "discharge loan credit check underwriting claim incident escalation deployment build test "
+    "release rollback feedback survey lead marketing campaign contract signature renewal"
+).split()
+
+
+
+def build_vocabulary(rng, size=5000):
+    """Domain words plus pronounceable filler words, so prompts share vocabulary unevenly"""
+    syllables = ["ka", "lo", "mi", "ter", "van", "sor", "pel", "dri", "nu", "gos", "fi", "rat"]
+    words = list(VOCAB)
+    while len(words) < size:
+        words.append("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return words
+
+
+def random_prompt(rng, vocabulary):
+    # Zipf-like word choice: a few words are very common, most are rare
+    count = rng.randint(5, 14)
+    words = [vocabulary[min(len(vocabulary) - 1, int(rng.paretovariate(0.8)) - 1)] for _ in range(count // 2)]
+    words += [rng.choice(vocabulary) for _ in range(count - len(words))]
+    return " ".join(words) + " process"
+
+
+def perturb(prompt, rng):
+    """Reorder words and change case/punctuation, as users do when re-asking"""
+    words = prompt.split()
+    rng.shuffle(words)
+    return "  ".join(w.upper() if rng.random() < 0.3 else w for w in words) + "."
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    index = SimilarityIndex(max_items=args.items)
+    vocabulary = build_vocabulary(rng)
+    prompts = [random_prompt(rng, vocabulary) for _ in range(args.items)]
+
+    start = time.perf_counter()
+    for i, prompt in enumerate(prompts):
+        index.add(prompt, f"key-{i}")
+    build_seconds = time.perf_counter() - start
+
+    def timed(queries):
+        latencies, found = [], 0
+        for query in queries:
+            t0 = time.perf_counter()
+            match = index.query(query)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            found += match is not None
+        latencies.sort()
+        return {
+            "p50_ms": statistics.median(latencies),
+            "p99_ms": latencies[int(len(latencies) * 0.99) - 1],
+            "mean_ms": statistics.fmean(latencies),
+            "matched": found / len(latencies),
+        }
+
+    near_duplicates = [perturb(rng.choice(prompts), rng) for _ in range(args.queries)]
+    unseen = [random_prompt(rng, vocabulary) for _ in range(args.queries)]
+
+    print(f"Indexed {len(index)} prompts in {build_seconds:.1f}s")
+    for name, queries in (("near-duplicate", near_duplicates), ("unseen", unseen)):
+        result = timed(queries)
+        print(f"{name:>15}: p50 {result['p50_ms']:.3f} ms  p99 {result['p99_ms']:.3f} ms  "
+              f"mean {result['mean_ms']:.3f} ms  matched {result['matched']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Benchmark the shared per-theme stylesheet against compiling it on every render.
+
+"Per render" clears the stylesheet cache before each call and embeds the
+stylesheet in every chart, which is what generate_flowchart_html did before
+stylesheets were shared. "Shared" uses the cached stylesheet and, for a
+multi-chart page, sends it once via generate_flowcharts_html.
+
+Usage: python benchmarks/bench_stylesheet.py [--nodes 20] [--charts 6] [--renders 500]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flowchart_renderer import (DESIGN_THEMES, generate_flowchart_html, generate_flowcharts_html,  # noqa: E402
+                                get_theme_stylesheet)
+
+
+def linear_flowchart(count):
+    """start -> process/decision steps -> end, one chain"""
+    nodes = []
+    for i in range(count):
+        if i == 0:
+            node_type = "start"
+        elif i == count - 1:
+            node_type = "end"
+        else:
+            node_type = "decision" if i % 5 == 3 else "process"
+        nodes.append({"id": f"node{i + 1}", "text": f"Step {i + 1}", "type": node_type,
+                      "connections": [f"node{i + 2}"] if i < count - 1 else []})
+    return {"nodes": nodes}
+
+
+def time_renders(flowchart_data, theme_keys, renders, shared):
+    start = time.perf_counter()
+    for i in range(renders):
+        if not shared:
+            get_theme_stylesheet.cache_clear()
+        generate_flowchart_html(flowchart_data, theme_keys[i % len(theme_keys)])
+    return (time.perf_counter() - start) / renders * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=20)
+    parser.add_argument("--charts", type=int, default=6)
+    parser.add_argument("--renders", type=int, default=500)
+    args = parser.parse_args()
+
+    flowchart_data = linear_flowchart(args.nodes)
+    theme_keys = list(DESIGN_THEMES)
+
+    per_render_ms = time_renders(flowchart_data, theme_keys, args.renders, shared=False)
+    shared_ms = time_renders(flowchart_data, theme_keys, args.renders, shared=True)
+    print(f"Render time, {args.nodes}-node chart ({args.renders} renders across {len(theme_keys)} themes)")
+    print(f"  stylesheet compiled per render: {per_render_ms:8.3f} ms")
+    print(f"  shared stylesheet:              {shared_ms:8.3f} ms  ({per_render_ms / shared_ms:.1f}x)")
+
+    charts = [(flowchart_data, theme_keys[0])] * args.charts
+    embedded = sum(len(generate_flowchart_html(data, theme_key)) for data, theme_key in charts)
+    page = len(generate_flowcharts_html(charts))
+    stylesheet = len(get_theme_stylesheet(theme_keys[0]))
+    print(f"\nPage with {args.charts} charts of one theme (stylesheet is {stylesheet / 1024:.1f} KB)")
+    print(f"  stylesheet in every chart: {embedded / 1024:8.1f} KB")
+    print(f"  stylesheet sent once:      {page / 1024:8.1f} KB  ({100 * (1 - page / embedded):.0f}% smaller)")
+
+
+if __name__ == "__main__":
+    main()
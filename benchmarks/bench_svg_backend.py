@@ -0,0 +1,125 @@
+"""Compare the HTML and SVG render backends: DOM size and drag frame time.
+
+DOM element counts come from parsing the rendered markup and always run.
+Drag frame time needs a Playwright browser (`playwright install chromium`):
+it drags a node with real mouse input and times each move until the next
+frame has been painted. Without a browser that part is skipped.
+
+Usage: python benchmarks/bench_svg_backend.py [--sizes 50,200,800] [--theme modern] [--moves 60]
+"""
+import argparse
+import os
+import statistics
+import sys
+from html.parser import HTMLParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Sibling benchmarks are imported for their chart generators, however this script is started
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_layout_index import random_dag  # noqa: E402
+from flowchart_renderer import RENDER_BACKENDS, generate_flowchart_html  # noqa: E402
+
+# Resolves with performance.now() once the frame following a mouse move has been produced
+WAIT_FOR_FRAME = ("() => new Promise(resolve => "
+                  "requestAnimationFrame(() => setTimeout(() => resolve(performance.now()), 0)))")
+
+
+class ElementCounter(HTMLParser):
+    """Counts elements in the chart markup, leaving out <style> and <script>"""
+
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("style", "script"):
+            self._skip += 1
+        elif not self._skip:
+            self.count += 1
+
+    def handle_startendtag(self, tag, attrs):
+        if not self._skip:
+            self.count += 1
+
+    def handle_endtag(self, tag):
+        if tag in ("style", "script"):
+            self._skip -= 1
+
+
+def count_elements(html):
+    counter = ElementCounter()
+    counter.feed(html)
+    return counter.count
+
+
+def drag_frame_times(page, html, moves):
+    """Milliseconds per drag step for the node closest to the middle of the chart"""
+    page.set_content(f"<!DOCTYPE html><html><body>{html}</body></html>")
+    page.wait_for_timeout(200)
+    box = page.evaluate("""() => {
+        const nodes = [...document.querySelectorAll('.node, .svg-node')];
+        const node = nodes[Math.floor(nodes.length / 2)];
+        node.scrollIntoView({block: 'center', inline: 'center'});
+        const rect = node.getBoundingClientRect();
+        return {x: rect.left + rect.width / 2, y: rect.top + rect.height / 2};
+    }""")
+    page.mouse.move(box["x"], box["y"])
+    page.mouse.down()
+    times = []
+    for step in range(moves):
+        start = page.evaluate("() => performance.now()")
+        page.mouse.move(box["x"] + step * 2, box["y"] + step)
+        end = page.evaluate(WAIT_FOR_FRAME)
+        times.append(end - start)
+    page.mouse.up()
+    return times
+
+
+def open_browser():
+    """(playwright, browser), or None when Playwright or its browser isn't installed"""
+    try:
+        from playwright.sync_api import sync_playwright
+        playwright = sync_playwright().start()
+    except Exception:
+        return None
+    try:
+        return playwright, playwright.chromium.launch()
+    except Exception:
+        playwright.stop()
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="50,200,800")
+    parser.add_argument("--theme", default="modern")
+    parser.add_argument("--moves", type=int, default=60)
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    browser = open_browser()
+    page = browser[1].new_page(viewport={"width": 1280, "height": 900}) if browser else None
+    if page is None:
+        print("Playwright browser not available; drag frame times skipped\n")
+
+    print(f"{'nodes':>6} {'backend':>8} {'elements':>9} {'HTML':>9} {'drag median':>12} {'drag p95':>9}")
+    for size in sizes:
+        flowchart_data = random_dag(size)
+        for backend in RENDER_BACKENDS:
+            html = generate_flowchart_html(flowchart_data, args.theme, backend=backend)
+            median = p95 = "-"
+            if page is not None:
+                times = sorted(drag_frame_times(page, html, args.moves))
+                median = f"{statistics.median(times):.1f}ms"
+                p95 = f"{times[int(len(times) * 0.95) - 1]:.1f}ms"
+            print(f"{size:>6} {backend:>8} {count_elements(html):>9} {len(html) / 1024:>7.0f}KB {median:>12} {p95:>9}")
+
+    if browser:
+        browser[1].close()
+        browser[0].stop()
+
+
+if __name__ == "__main__":
+    main()
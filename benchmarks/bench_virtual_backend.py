@@ -0,0 +1,80 @@
+"""Compare the virtualized backend with the HTML and SVG ones on large charts.
+
+Page size and render time always run. With a Playwright browser
+(`playwright install chromium`) it also loads each chart, counts the
+elements actually in the DOM and times pan frames: each step scrolls the
+view with the mouse wheel and waits for the next painted frame. Without a
+browser, element counts come from the markup, which for the virtualized
+backend is only the empty shell.
+
+Usage: python benchmarks/bench_virtual_backend.py [--sizes 200,1000,5000] [--theme modern] [--steps 40]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Sibling benchmarks are imported for their chart generators, however this script is started
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_layout_index import random_dag  # noqa: E402
+from bench_svg_backend import WAIT_FOR_FRAME, count_elements, open_browser  # noqa: E402
+from flowchart_renderer import RENDER_BACKENDS, generate_flowchart_html  # noqa: E402
+
+COUNT_DOM = "() => document.querySelectorAll('.flowchart-container *').length"
+
+
+def pan_frame_times(page, html, steps):
+    """Milliseconds per wheel step, and the DOM element count before panning"""
+    page.set_content(f"<!DOCTYPE html><html><body>{html}</body></html>")
+    page.wait_for_timeout(200)
+    elements = page.evaluate(COUNT_DOM)
+    page.mouse.move(640, 450)
+    times = []
+    for _ in range(steps):
+        start = page.evaluate("() => performance.now()")
+        page.mouse.wheel(0, 150)
+        end = page.evaluate(WAIT_FOR_FRAME)
+        times.append(end - start)
+    return elements, times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="200,1000,5000")
+    parser.add_argument("--theme", default="modern")
+    parser.add_argument("--steps", type=int, default=40)
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    browser = open_browser()
+    page = browser[1].new_page(viewport={"width": 1280, "height": 900}) if browser else None
+    if page is None:
+        print("Playwright browser not available; DOM counts are from the markup and pan times are skipped\n")
+
+    print(f"{'nodes':>6} {'backend':>8} {'render':>9} {'HTML':>9} {'elements':>9} {'pan median':>11} {'pan p95':>9}")
+    for size in sizes:
+        flowchart_data = random_dag(size)
+        for backend in RENDER_BACKENDS:
+            start = time.perf_counter()
+            html = generate_flowchart_html(flowchart_data, args.theme, backend=backend)
+            render_ms = (time.perf_counter() - start) * 1000
+            elements = count_elements(html)
+            median = p95 = "-"
+            if page is not None:
+                elements, times = pan_frame_times(page, html, args.steps)
+                times.sort()
+                median = f"{statistics.median(times):.1f}ms"
+                p95 = f"{times[int(len(times) * 0.95) - 1]:.1f}ms"
+            print(f"{size:>6} {backend:>8} {render_ms:>7.1f}ms {len(html) / 1024:>7.0f}KB {elements:>9} "
+                  f"{median:>11} {p95:>9}")
+
+    if browser:
+        browser[1].close()
+        browser[0].stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised immediately, without calling the API, while the circuit is open"""
+
+    def __init__(self, message, retry_in=0.0):
+        super().__init__(message)
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Stop calling a failing upstream until it has had time to recover.
+
+    Closed: calls go through; `failure_threshold` consecutive failures open
+    the circuit. Open: calls fail fast with CircuitOpenError for
+    `recovery_timeout` seconds. Half-open: one probe call is let through;
+    success closes the circuit, failure opens it for another timeout. A
+    probe that reports neither within `recovery_timeout` is written off and
+    the next call probes instead.
+    """
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started_at = 0.0
+        self.times_opened = 0
+        self.fast_failures = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now):
+        if self._state == OPEN and now - self._opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        elif (self._state == HALF_OPEN and self._probe_in_flight
+              and now - self._probe_started_at >= self.recovery_timeout):
+            # The probe's caller never recorded an outcome
+            self._probe_in_flight = False
+        return self._state
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go ahead now"""
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self._probe_in_flight:
+                # This call is the probe
+                self._probe_in_flight = True
+                self._probe_started_at = now
+                return
+            self.fast_failures += 1
+            since = self._probe_started_at if state == HALF_OPEN else self._opened_at
+            retry_in = max(0.0, self.recovery_timeout - (now - since))
+            raise CircuitOpenError(
+                f"Mistral API is unavailable after repeated failures; retrying in {retry_in:.0f}s",
+                retry_in=retry_in
+            )
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.times_opened += 1
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def reset(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def get_stats(self):
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "times_opened": self.times_opened,
+                "fast_failures": self.fast_failures,
+                "retry_in": max(0.0, self.recovery_timeout - (now - self._opened_at)) if state == OPEN else 0.0,
+            }
+
+
+class DegradedFlowchart(dict):
+    """Placeholder flowchart returned instead of a real generation.
+
+    Behaves like the normal flowchart dict, but `degraded` is True,
+    `reason` says why and `kind` classifies it ("circuit_open", "api_error",
+    "invalid_response", ...), so callers and metrics can tell it apart.
+    """
+
+    degraded = True
+
+    def __init__(self, data, reason, kind="api_error"):
+        super().__init__(data)
+        self.reason = reason
+        self.kind = kind
+
+
+def is_degraded(flowchart_data):
+    return getattr(flowchart_data, "degraded", False)
+
+
+# Process-wide count of placeholder charts served, by kind
+_degraded_counts = {}
+_degraded_lock = threading.Lock()
+
+
+def record_degraded(kind):
+    with _degraded_lock:
+        _degraded_counts[kind] = _degraded_counts.get(kind, 0) + 1
+
+
+def get_degraded_stats():
+    with _degraded_lock:
+        return dict(_degraded_counts)
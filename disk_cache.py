@@ -0,0 +1,245 @@
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger("AskFlowChart")
+
+DEFAULT_CACHE_PATH = os.environ.get("FLOWCHART_CACHE_PATH", ".flowchart_cache.sqlite3")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Access times are written back in batches instead of one UPDATE per read
+TOUCH_BATCH = 64
+TOUCH_INTERVAL = 30.0
+# The running size total is recounted from the table this often (in writes), picking up other replicas' writes
+RECOUNT_INTERVAL = 100
+# Eviction frees down to this share of the limit, so the writes that follow don't each trigger another pass
+EVICT_TO = 0.9
+
+
+class DiskCache:
+    """Persistent cache tier stored in SQLite.
+
+    Holds generated flowchart JSON ("flowchart" entries) and rendered
+    HTML ("html" entries) so completed work survives restarts. The
+    database runs in WAL mode with a busy timeout, so several app
+    replicas on one host can read and write the same file. When the total
+    stored size passes `max_bytes`, the least recently used entries are
+    deleted.
+
+    Reads and writes stay cheap: the total is kept as a running count,
+    only summed over the table every RECOUNT_INTERVAL writes or when it
+    crosses the limit, and hits update `accessed_at` in batches.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        # sqlite3 connections can't be shared between threads, so keep one per thread
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._touches = {}
+        self._last_flush = time.monotonic()
+        self._total = None
+        self._writes_since_recount = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._init_schema()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (kind, key)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache_entries (accessed_at)")
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def get(self, kind, key):
+        """Return the stored text for (kind, key), or None"""
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value FROM cache_entries WHERE kind = ? AND key = ?", (kind, key)
+        ).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+        with self._lock:
+            self._touches[(kind, key)] = time.time()
+            flush = len(self._touches) >= TOUCH_BATCH or time.monotonic() - self._last_flush >= TOUCH_INTERVAL
+        if flush:
+            self._flush_touches(conn)
+        self._count("hits")
+        return row[0]
+
+    def _flush_touches(self, conn):
+        """Write the pending access times in one statement"""
+        with self._lock:
+            touches, self._touches = self._touches, {}
+            self._last_flush = time.monotonic()
+        if touches:
+            # MAX keeps a newer time another replica already wrote
+            conn.executemany(
+                "UPDATE cache_entries SET accessed_at = MAX(accessed_at, ?) WHERE kind = ? AND key = ?",
+                [(accessed_at, kind, key) for (kind, key), accessed_at in touches.items()]
+            )
+
+    def put(self, kind, key, value):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return False
+        now = time.time()
+        conn = self._connect()
+        old = conn.execute("SELECT size FROM cache_entries WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (kind, key, value, size, created_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (kind, key, value, size, now, now)
+        )
+        with self._lock:
+            self._writes_since_recount += 1
+            if self._total is not None:
+                self._total += size - (old[0] if old else 0)
+            evict = (self._total is None or self._total > self.max_bytes
+                     or self._writes_since_recount >= RECOUNT_INTERVAL)
+        if evict:
+            self._evict(conn)
+        return True
+
+    def get_json(self, kind, key):
+        value = self.get(kind, key)
+        if value is None:
+            return None
+        try:
+            return json.loads(value)
+        except ValueError:
+            logger.warning(f"Discarding corrupt disk cache entry {kind}/{key}")
+            self.delete(kind, key)
+            return None
+
+    def put_json(self, kind, key, data):
+        return self.put(kind, key, json.dumps(data))
+
+    def delete(self, kind, key):
+        self._connect().execute("DELETE FROM cache_entries WHERE kind = ? AND key = ?", (kind, key))
+        with self._lock:
+            self._total = None
+
+    def _evict(self, conn):
+        """Recount the stored size and delete least recently used entries until it is within the limit"""
+        # Pending reads count towards recency
+        self._flush_touches(conn)
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+        with self._lock:
+            self._total = total
+            self._writes_since_recount = 0
+        if total <= self.max_bytes:
+            return
+        # Walk entries from least recently used, deleting until under the low-water mark
+        target = int(self.max_bytes * EVICT_TO)
+        to_free = total - target
+        victims = []
+        for kind, key, size in conn.execute(
+                "SELECT kind, key, size FROM cache_entries ORDER BY accessed_at ASC"):
+            victims.append((kind, key))
+            to_free -= size
+            if to_free <= 0:
+                break
+        conn.executemany("DELETE FROM cache_entries WHERE kind = ? AND key = ?", victims)
+        self._count("evictions", len(victims))
+        with self._lock:
+            self._total = target + min(0, to_free)
+
+    def clear(self):
+        self._connect().execute("DELETE FROM cache_entries")
+        with self._lock:
+            self._touches = {}
+            self._total = 0
+
+    def compact(self):
+        """Enforce the size limit, reclaim free pages and truncate the WAL file"""
+        conn = self._connect()
+        self._evict(conn)
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return self.get_stats()
+
+    def get_stats(self):
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT kind, COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries GROUP BY kind"
+        ).fetchall()
+        file_bytes = sum(
+            os.path.getsize(p) for p in (self.path, self.path + "-wal") if os.path.exists(p)
+        )
+        with self._stats_lock:
+            return {
+                "items": {kind: count for kind, count, _ in rows},
+                "size_bytes": sum(size for _, _, size in rows),
+                "max_bytes": self.max_bytes,
+                "file_bytes": file_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# Process-wide shared disk cache
+_disk_cache = None
+_disk_cache_lock = threading.Lock()
+
+
+def get_disk_cache():
+    """Return the shared DiskCache, creating it on first use"""
+    global _disk_cache
+    with _disk_cache_lock:
+        if _disk_cache is None:
+            _disk_cache = DiskCache()
+        return _disk_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the persistent flowchart cache")
+    parser.add_argument("command", choices=["stats", "compact", "clear"])
+    parser.add_argument("--path", default=DEFAULT_CACHE_PATH, help="SQLite cache file")
+    parser.add_argument("--max-mb", type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024),
+                        help="Size limit enforced by compact")
+    args = parser.parse_args()
+
+    cache = DiskCache(args.path, max_bytes=int(args.max_mb * 1024 * 1024))
+    if args.command == "compact":
+        stats = cache.compact()
+    elif args.command == "clear":
+        cache.clear()
+        stats = cache.compact()
+    else:
+        stats = cache.get_stats()
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
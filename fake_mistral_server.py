@@ -0,0 +1,373 @@
+"""Local stand-in for the Mistral chat-completions API.
+
+Speaks the same POST /v1/chat/completions protocol as the real service,
+including `stream: true` server-sent events, so the app, benchmarks and
+load tests can run without spending API credits. Point the app at it
+with the MISTRAL_API_URL environment variable:
+
+    python fake_mistral_server.py --port 8900 --latency lognormal:0.8,0.4 --error-429 0.05
+    MISTRAL_API_URL=http://127.0.0.1:8900/v1/chat/completions streamlit run app.py
+
+Responses are synthetic flowcharts built from the user prompt, or replayed
+from a cassette file recorded against the real API with --record.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("AskFlowChart")
+
+
+class LatencyModel:
+    """Samples response latencies in seconds from a simple distribution.
+
+    Specs: "fixed:S", "uniform:LOW,HIGH", "normal:MEAN,STDDEV" or
+    "lognormal:MEDIAN,SIGMA" (heavy right tail, like real LLM calls).
+    """
+
+    def __init__(self, spec="fixed:0", seed=None):
+        self.spec = spec
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        kind, _, params = spec.partition(":")
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p]
+        if kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self):
+        with self._lock:
+            if self.kind == "fixed":
+                value = self.params[0] if self.params else 0.0
+            elif self.kind == "uniform":
+                value = self._rng.uniform(self.params[0], self.params[1])
+            elif self.kind == "normal":
+                value = self._rng.gauss(self.params[0], self.params[1])
+            else:
+                median, sigma = self.params
+                value = self._rng.lognormvariate(0.0, sigma) * median
+        return max(0.0, value)
+
+
+def prompt_clauses(prompt):
+    return [c.strip() for c in re.split(r"[.;,\n]|\bthen\b", prompt or "", flags=re.I) if c.strip()]
+
+
+def synthetic_outline(prompt, phase_size=8):
+    """Group the clauses of a prompt into consecutive phases"""
+    clauses = prompt_clauses(prompt)
+    return {"phases": [
+        {"name": f"Phase {i // phase_size + 1}", "summary": "; ".join(clauses[i:i + phase_size])}
+        for i in range(0, len(clauses), phase_size)
+    ]}
+
+
+def synthetic_flowchart(prompt):
+    """Build a plausible flowchart from the sentences/clauses of a prompt"""
+    phase = re.search(r"Chart ONLY phase \d+ of \d+: [^-\n]* - ([^\n]*)", prompt or "")
+    if phase:
+        # Divide-and-conquer: chart just the phase's own steps
+        prompt = phase.group(1)
+    clauses = prompt_clauses(prompt)
+    clauses = clauses[:30] or ["Process request"]
+    nodes = [{"id": "node1", "text": "Start", "type": "start", "connections": ["node2"],
+              "icon": "fa-play-circle", "description": "Purpose: Entry point of the process."}]
+    for i, clause in enumerate(clauses, start=2):
+        is_decision = bool(re.search(r"\b(if|whether|check|evaluate)\b", clause, re.I))
+        next_id = f"node{i + 1}"
+        connections = [next_id, f"node{len(clauses) + 2}"] if is_decision else [next_id]
+        nodes.append({
+            "id": f"node{i}",
+            "text": clause[:40],
+            "type": "decision" if is_decision else "process",
+            "connections": connections,
+            "icon": "fa-question-circle" if is_decision else "fa-cog",
+            "description": f"Purpose: {clause}. Implementation: Handled by the responsible team.",
+        })
+    nodes.append({"id": f"node{len(clauses) + 2}", "text": "End", "type": "end", "connections": [],
+                  "icon": "fa-flag-checkered", "description": "Purpose: The process is complete."})
+    return {"nodes": nodes}
+
+
+def usage(payload, content):
+    """Token counts in the API's shape, at roughly 4 characters per token"""
+    prompt_tokens = sum(len(m.get("content", "")) for m in payload.get("messages", [])) // 4
+    completion_tokens = len(content) // 4
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+def request_fingerprint(payload):
+    """Stable hash of the parts of a request that determine the completion"""
+    key = {k: payload.get(k) for k in ("model", "messages", "temperature", "max_tokens")}
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """Recorded request-fingerprint -> completion content pairs in a JSONL file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["fingerprint"]] = entry["content"]
+        except FileNotFoundError:
+            pass
+
+    def get(self, fingerprint):
+        with self._lock:
+            return self._entries.get(fingerprint)
+
+    def record(self, fingerprint, content):
+        with self._lock:
+            self._entries[fingerprint] = content
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"fingerprint": fingerprint, "content": content}) + "\n")
+
+
+class FakeMistralConfig:
+    """Behaviour of the stand-in server; attributes may be changed while it runs"""
+
+    def __init__(self, latency="fixed:0", token_delay=0.0, error_429=0.0, error_500=0.0,
+                 truncate=0.0, replay=None, record=None, upstream=None, seed=None):
+        self.latency = LatencyModel(latency, seed)
+        self.token_delay = token_delay
+        self.error_429 = error_429
+        self.error_500 = error_500
+        self.truncate = truncate
+        self.replay = Cassette(replay) if replay else None
+        self.record = Cassette(record) if record else None
+        self.upstream = upstream
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "streamed": 0, "errors_429": 0, "errors_500": 0,
+                      "truncated": 0, "replayed": 0, "recorded": 0}
+
+    def roll(self, probability):
+        with self._lock:
+            return self._rng.random() < probability
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def uniform(self, low, high):
+        with self._lock:
+            return self._rng.uniform(low, high)
+
+
+class FakeMistralHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None  # set on the per-server subclass
+
+    def log_message(self, format, *args):
+        logger.debug("fake-mistral: " + format % args)
+
+    def do_POST(self):
+        config = self.config
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"message": "Not found"})
+            return
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        except ValueError:
+            self._send_json(400, {"message": "Invalid JSON body"})
+            return
+        config.count("requests")
+
+        time.sleep(config.latency.sample())
+
+        if config.roll(config.error_429):
+            config.count("errors_429")
+            self._send_json(429, {"message": "Requests rate limit exceeded"}, {"Retry-After": "1"})
+            return
+        if config.roll(config.error_500):
+            config.count("errors_500")
+            self._send_json(500, {"message": "Internal server error"})
+            return
+
+        content = self._completion_content(payload)
+        if config.roll(config.truncate):
+            config.count("truncated")
+            content = content[:max(1, int(len(content) * config.uniform(0.3, 0.9)))]
+
+        if payload.get("stream"):
+            config.count("streamed")
+            self._send_stream(payload, content)
+        else:
+            self._send_json(200, {
+                "id": f"cmpl-{uuid.uuid4().hex[:12]}",
+                "object": "chat.completion",
+                "model": payload.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": usage(payload, content),
+            })
+
+    def _completion_content(self, payload):
+        config = self.config
+        fingerprint = request_fingerprint(payload)
+        if config.replay is not None:
+            content = config.replay.get(fingerprint)
+            if content is not None:
+                config.count("replayed")
+                return content
+        if config.record is not None and config.upstream:
+            content = self._fetch_upstream(payload)
+            if content is not None:
+                config.record.record(fingerprint, content)
+                config.count("recorded")
+                return content
+        messages = payload.get("messages", [])
+        prompt = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+        system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+        if prompt.startswith("Describe these nodes:"):
+            # Phase two of two-phase generation
+            node_ids = [node_id.strip() for node_id in prompt.split(":", 1)[1].split(",") if node_id.strip()]
+            return json.dumps({"descriptions": {
+                node_id: f"Purpose: Details for {node_id}. Implementation: Handled by the responsible team."
+                for node_id in node_ids
+            }})
+        if "patch operations" in system:
+            # Edit requests: splice the requested change in after the first node
+            chart = json.loads(re.search(r"Flowchart: (.*)\n", prompt).group(1))
+            change = prompt.rsplit("Change:", 1)[-1].strip()
+            return json.dumps({"operations": [{"op": "add_node", "after": chart[0]["id"],
+                                               "node": {"text": change[:40], "type": "process", "icon": "fa-cog"}}]})
+        if "high-level phases" in system:
+            return json.dumps(synthetic_outline(prompt))
+        flowchart = synthetic_flowchart(prompt)
+        if "Do not include descriptions" in system:
+            for node in flowchart["nodes"]:
+                del node["description"]
+        return json.dumps(flowchart)
+
+    def _fetch_upstream(self, payload):
+        # Imported here so the server itself has no third-party dependency unless recording
+        import requests
+        try:
+            response = requests.post(
+                self.config.upstream,
+                headers={"Content-Type": "application/json",
+                         "Authorization": self.headers.get("Authorization", "")},
+                data=json.dumps(dict(payload, stream=False)),
+                timeout=(5, 120)
+            )
+            response.raise_for_status()
+            return response.json()["choices"][0]["message"]["content"]
+        except Exception as e:
+            logger.error(f"fake-mistral: upstream recording failed: {str(e)}")
+            return None
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, payload, content):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        completion_id = f"cmpl-{uuid.uuid4().hex[:12]}"
+
+        def write_event(data):
+            event = f"data: {data}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(event):x}\r\n".encode("ascii") + event + b"\r\n")
+            self.wfile.flush()
+
+        try:
+            # Roughly token-sized deltas
+            for token in re.findall(r"\s*\S{1,4}", content):
+                write_event(json.dumps({
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "model": payload.get("model"),
+                    "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                }))
+                if self.config.token_delay:
+                    time.sleep(self.config.token_delay)
+            write_event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away mid-stream (e.g. a cancelled hedge)
+            pass
+
+
+class FakeMistralServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up (cancelled hedges, closed streams) are expected here
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+def start_fake_server(host="127.0.0.1", port=0, **config_kwargs):
+    """Start the stand-in server on a background thread.
+
+    Returns (server, api_url). `server.config` can be adjusted while it
+    runs; call `server.shutdown()` to stop it.
+    """
+    config = FakeMistralConfig(**config_kwargs)
+    handler = type("ConfiguredFakeMistralHandler", (FakeMistralHandler,), {"config": config})
+    server = FakeMistralServer((host, port), handler)
+    server.config = config
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_url = f"http://{host}:{server.server_port}/v1/chat/completions"
+    return server, api_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Mistral chat-completions API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", default="fixed:0",
+                        help="fixed:S | uniform:LOW,HIGH | normal:MEAN,SD | lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between streamed tokens")
+    parser.add_argument("--error-429", type=float, default=0.0, help="Probability of a 429 response")
+    parser.add_argument("--error-500", type=float, default=0.0, help="Probability of a 500 response")
+    parser.add_argument("--truncate", type=float, default=0.0, help="Probability of truncated JSON content")
+    parser.add_argument("--replay", help="Cassette file to serve recorded completions from")
+    parser.add_argument("--record", help="Cassette file to append upstream completions to")
+    parser.add_argument("--upstream", default="https://api.mistral.ai/v1/chat/completions",
+                        help="Real API used when recording")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    server, api_url = start_fake_server(
+        args.host, args.port, latency=args.latency, token_delay=args.token_delay,
+        error_429=args.error_429, error_500=args.error_500, truncate=args.truncate,
+        replay=args.replay, record=args.record, upstream=args.upstream if args.record else None,
+        seed=args.seed
+    )
+    logger.info(f"Fake Mistral API listening on {api_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import math
+
+# Node box used by the layout and connector geometry
+NODE_WIDTH = 120
+NODE_HEIGHT = 80
+
+
+# Walk the nodes level by level from the roots, yielding each node with its position
+def _place_nodes(nodes, orientation="landscape"):
+    # Basic layout algorithm - arrange nodes in a tree-like structure
+    node_map = {node["id"]: node for node in nodes}
+    
+    # Find start node (typically has no incoming connections)
+    incoming_connections = set()
+    for node in nodes:
+        for conn in node.get("connections", []):
+            incoming_connections.add(conn)
+    
+    start_nodes = [node for node in nodes if node["id"] not in incoming_connections]
+    
+    if not start_nodes:
+        # If no clear start node, use the first node
+        start_nodes = [nodes[0]]
+    
+    # Calculate positions using a simple hierarchical layout
+    level_width = 300  # Increased from 200
+    level_height = 200  # Increased from 150
+    current_level = 0
+    levels = {current_level: start_nodes}
+    processed = set()
+    
+    while levels.get(current_level, []):
+        level_nodes = levels[current_level]
+        levels[current_level + 1] = []
+        
+        # Sort level nodes by their connections to minimize crossings
+        if current_level > 0:
+            level_nodes.sort(key=lambda n: sorted(n.get("connections", [])))
+        
+        for i, node in enumerate(level_nodes):
+            # Skip if already processed
+            if node["id"] in processed:
+                continue
+                
+            processed.add(node["id"])
+            
+            # Calculate position based on orientation
+            if orientation == "landscape":
+                x = 50 + (1000 / (len(level_nodes) + 1)) * (i + 1) - 60
+                y = 50 + current_level * level_height
+            else:  # portrait
+                x = 50 + current_level * level_width
+                y = 50 + (800 / (len(level_nodes) + 1)) * (i + 1) - 60
+            
+            yield node, x, y
+            
+            # Add connected nodes to the next level
+            for conn_id in node.get("connections", []):
+                if conn_id not in processed and conn_id in node_map:
+                    levels[current_level + 1].append(node_map[conn_id])
+        
+        current_level += 1
+
+class Layout(list):
+    """Placed nodes in drawing order, indexed for constant-time edge lookups.
+
+    Still the list of {"node", "x", "y", "width", "height"} entries it always
+    was, plus `positions` (node id -> entry) and adjacency lists of entries:
+    `outgoing[id]` in connection order and `incoming[id]`. Edges to nodes
+    that aren't in the layout are left out. Built once; don't mutate it.
+    """
+
+    def __init__(self, entries=()):
+        super().__init__(entries)
+        self.positions = {entry["node"]["id"]: entry for entry in self}
+        self.outgoing = {}
+        self.incoming = {node_id: [] for node_id in self.positions}
+        for entry in self:
+            targets = []
+            for target_id in entry["node"].get("connections", []):
+                target = self.positions.get(target_id)
+                if target is not None:
+                    targets.append(target)
+                    self.incoming[target_id].append(entry)
+            self.outgoing[entry["node"]["id"]] = targets
+
+    def get(self, node_id):
+        """Entry for a node id, or None if the node isn't laid out"""
+        return self.positions.get(node_id)
+
+    def edges(self):
+        """(source entry, target entry) for every drawable edge, sources in layout order"""
+        for entry in self:
+            for target in self.outgoing[entry["node"]["id"]]:
+                yield entry, target
+
+# Function to calculate layout for nodes
+def calculate_layout(nodes, orientation="landscape"):
+    if not nodes:
+        return Layout()
+    return Layout(
+        {
+            "node": node,
+            "x": x,
+            "y": y,
+            "width": NODE_WIDTH,  # Standard node width
+            "height": NODE_HEIGHT   # Standard node height
+        }
+        for node, x, y in _place_nodes(nodes, orientation)
+    )
+
+# Function to update a layout after an edit, keeping the entries of untouched nodes
+def update_layout(previous_layout, nodes, changed_ids, orientation="landscape"):
+    """Lay out `nodes` again, reusing the previous entry of every node that
+    neither changed nor moved.
+
+    Reused entries are copies pointing at the current node that carry over
+    what was memoised on the old entry (e.g. rendered HTML fragments), which
+    stays valid; only changed or shifted nodes start afresh. The previous
+    layout is left as it was. Returns (Layout, updated_ids).
+    """
+    if not nodes:
+        return Layout(), set()
+    previous = previous_layout.positions if isinstance(previous_layout, Layout) else \
+        {info["node"]["id"]: info for info in previous_layout}
+    layout = []
+    updated_ids = set()
+    for node, x, y in _place_nodes(nodes, orientation):
+        info = previous.get(node["id"])
+        if info is None or node["id"] in changed_ids or info["x"] != x or info["y"] != y:
+            info = {"node": node, "x": x, "y": y, "width": NODE_WIDTH, "height": NODE_HEIGHT}
+            updated_ids.add(node["id"])
+        else:
+            # Same position and content: keep what the old entry memoised, pointed at the current node
+            info = {**info, "node": node, "fragments": dict(info.get("fragments", {}))}
+        layout.append(info)
+    return Layout(layout), updated_ids
+
+# Function to calculate connector points at node borders
+def calculate_connector_points(source_node, target_node):
+    # Get node positions and dimensions
+    source_x = source_node["x"]
+    source_y = source_node["y"]
+    target_x = target_node["x"]
+    target_y = target_node["y"]
+    
+    # Node dimensions
+    source_width = source_node["width"]
+    source_height = source_node["height"]
+    target_width = target_node["width"]
+    target_height = target_node["height"]
+    
+    # Calculate center points
+    source_center_x = source_x + source_width / 2
+    source_center_y = source_y + source_height / 2
+    target_center_x = target_x + target_width / 2
+    target_center_y = target_y + target_height / 2
+    
+    # Calculate angle between centers
+    angle = math.atan2(target_center_y - source_center_y, target_center_x - source_center_x)
+    
+    # Calculate intersection points with node borders
+    # For source node
+    if abs(math.cos(angle)) > abs(math.sin(angle)):
+        # Horizontal intersection
+        if target_center_x > source_center_x:
+            source_point_x = source_x + source_width
+        else:
+            source_point_x = source_x
+        source_point_y = source_center_y
+    else:
+        # Vertical intersection
+        if target_center_y > source_center_y:
+            source_point_y = source_y + source_height
+        else:
+            source_point_y = source_y
+        source_point_x = source_center_x
+    
+    # For target node
+    if abs(math.cos(angle)) > abs(math.sin(angle)):
+        # Horizontal intersection
+        if target_center_x > source_center_x:
+            target_point_x = target_x
+        else:
+            target_point_x = target_x + target_width
+        target_point_y = target_center_y
+    else:
+        # Vertical intersection
+        if target_center_y > source_center_y:
+            target_point_y = target_y
+        else:
+            target_point_y = target_y + target_height
+        target_point_x = target_center_x
+    
+    # Adjust for decision nodes
+    if source_node["node"]["type"] == "decision":
+        # Adjust the source point for diamond shape
+        # Calculate based on angle to determine which point of the diamond to use
+        diagonal_angle = math.atan2(target_center_y - source_center_y, target_center_x - source_center_x)
+        diagonal_deg = math.degrees(diagonal_angle) % 360
+        
+        if diagonal_deg >= 315 or diagonal_deg < 45:  # Right point
+            source_point_x = source_center_x + source_width / 2
+            source_point_y = source_center_y
+        elif diagonal_deg >= 45 and diagonal_deg < 135:  # Bottom point
+            source_point_x = source_center_x
+            source_point_y = source_center_y + source_height / 2
+        elif diagonal_deg >= 135 and diagonal_deg < 225:  # Left point
+            source_point_x = source_center_x - source_width / 2
+            source_point_y = source_center_y
+        else:  # Top point (225-315)
+            source_point_x = source_center_x
+            source_point_y = source_center_y - source_height / 2
+    
+    if target_node["node"]["type"] == "decision":
+        # Adjust the target point for diamond shape
+        # Calculate based on angle to determine which point of the diamond to use
+        diagonal_angle = math.atan2(target_center_y - source_center_y, target_center_x - source_center_x)
+        diagonal_deg = math.degrees(diagonal_angle) % 360
+        
+        if diagonal_deg >= 315 or diagonal_deg < 45:  # Right point (coming from left)
+            target_point_x = target_center_x - target_width / 2
+            target_point_y = target_center_y
+        elif diagonal_deg >= 45 and diagonal_deg < 135:  # Bottom point (coming from top)
+            target_point_x = target_center_x
+            target_point_y = target_center_y - target_height / 2
+        elif diagonal_deg >= 135 and diagonal_deg < 225:  # Left point (coming from right)
+            target_point_x = target_center_x + target_width / 2
+            target_point_y = target_center_y
+        else:  # Top point (coming from bottom) (225-315)
+            target_point_x = target_center_x
+            target_point_y = target_center_y + target_height / 2
+    
+    return source_point_x, source_point_y, target_point_x, target_point_y
+
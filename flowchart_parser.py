@@ -0,0 +1,239 @@
+import json
+import logging
+import re
+
+logger = logging.getLogger("AskFlowChart")
+
+# Characters that end or escape inside a JSON string
+_STRING_SPECIAL = re.compile(r'["\\]')
+# Characters the scanner has to look at outside strings
+_STRUCTURAL = re.compile(r'[{}\[\]",]')
+# The key of the nodes array, where recovery anchors
+_NODES_KEY = re.compile(r'"nodes"\s*:')
+
+
+class IncrementalNodeParser:
+    """Incremental, tolerant parser for flowchart JSON.
+
+    Text is fed in arbitrary chunks (e.g. token deltas from a streaming
+    completion). Every object inside the "nodes" array is returned from
+    `feed` as soon as its closing brace arrives, so the caller can draw a
+    partial chart long before the completion finishes. A bare top-level
+    array is treated as the nodes array.
+
+    The scanner is a single pass that only tracks the bracket stack and
+    string state, jumping between structural characters with regex
+    searches; only the text of the node currently being read is kept.
+    Nodes with trailing commas are repaired, and `close` salvages the
+    complete fields of a node cut off by truncation. An array that closes
+    without a single node is not taken as the nodes array, so bracketed
+    prose before the JSON doesn't hide it.
+    """
+
+    def __init__(self):
+        self.nodes = []
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        # Key tracking at the top level of the root object
+        self._string_start = None
+        self._string_parts = None
+        self._last_key = None
+        # Depth of the "nodes" array once found
+        self._nodes_depth = None
+        self._nodes_closed = False
+        # Text of the node being read, and the offset just past its last complete field
+        self._node_parts = None
+        self._node_length = 0
+        self._node_safe_cut = None
+
+    @property
+    def in_nodes_array(self):
+        return self._nodes_depth is not None and not self._nodes_closed
+
+    def feed(self, text):
+        """Consume a chunk of text and return the list of nodes completed by it"""
+        completed = []
+        node_start = 0 if self._node_parts is not None else None
+        if self._string_parts is not None:
+            self._string_start = 0
+        i = 0
+        length = len(text)
+
+        while i < length:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    i += 1
+                    continue
+                match = _STRING_SPECIAL.search(text, i)
+                if match is None:
+                    break
+                i = match.start()
+                if text[i] == "\\":
+                    self._escape = True
+                    i += 1
+                    continue
+                self._in_string = False
+                if self._string_parts is not None:
+                    self._string_parts.append(text[self._string_start:i])
+                    self._last_key = "".join(self._string_parts)
+                    self._string_parts = None
+                i += 1
+                continue
+
+            match = _STRUCTURAL.search(text, i)
+            if match is None:
+                break
+            i = match.start()
+            char = text[i]
+            depth = len(self._stack)
+
+            if char == '"':
+                self._in_string = True
+                # Only remember strings directly inside the root object (candidate keys)
+                if depth == 1 and self._stack[0] == "{":
+                    self._string_parts = []
+                    self._string_start = i + 1
+            elif char == "{" or char == "[":
+                if char == "{" and self.in_nodes_array and depth == self._nodes_depth:
+                    self._node_parts = []
+                    self._node_length = 0
+                    self._node_safe_cut = None
+                    node_start = i
+                self._stack.append(char)
+                if self._nodes_depth is None and char == "[" and (
+                        depth == 0 or (depth == 1 and self._stack[0] == "{" and self._last_key == "nodes")):
+                    self._nodes_depth = depth + 1
+            elif char == "}" or char == "]":
+                if self._stack:
+                    self._stack.pop()
+                    if not self._stack:
+                        self._last_key = None
+                    if self.in_nodes_array:
+                        if char == "}" and self._node_parts is not None and len(self._stack) == self._nodes_depth:
+                            self._node_parts.append(text[node_start:i + 1])
+                            node = self._decode_node("".join(self._node_parts))
+                            self._node_parts = None
+                            node_start = None
+                            if node is not None:
+                                self.nodes.append(node)
+                                completed.append(node)
+                        elif char == "]" and len(self._stack) < self._nodes_depth:
+                            # End of the nodes array; one without nodes was bracketed prose
+                            # ("Sure [see below]: ..."), so keep looking for the real one
+                            if self.nodes:
+                                self._nodes_closed = True
+                            else:
+                                self._nodes_depth = None
+            elif char == ",":
+                if depth == 1:
+                    self._last_key = None
+                elif self._node_parts is not None and depth == self._nodes_depth + 1:
+                    # Everything before this comma is a complete field of the node
+                    self._node_safe_cut = self._node_length + (i - node_start)
+            i += 1
+
+        # Carry partial node/key text over to the next chunk
+        if self._node_parts is not None and node_start is not None:
+            self._node_parts.append(text[node_start:])
+            self._node_length += length - node_start
+        if self._string_parts is not None:
+            self._string_parts.append(text[self._string_start:])
+        return completed
+
+    def close(self):
+        """Finish parsing truncated input, salvaging the complete fields of an open node.
+
+        Returns the list of nodes recovered by closing (at most one).
+        """
+        recovered = []
+        if self._node_parts is not None and self._node_safe_cut is not None:
+            text = "".join(self._node_parts)[:self._node_safe_cut] + "}"
+            node = self._decode_node(text)
+            if node is not None and node.get("text"):
+                logger.info(f"Recovered truncated node {node['id']}")
+                self.nodes.append(node)
+                recovered.append(node)
+        self._node_parts = None
+        return recovered
+
+    @staticmethod
+    def _decode_node(text):
+        try:
+            node = json.loads(text)
+        except json.JSONDecodeError:
+            try:
+                node = json.loads(strip_trailing_commas(text))
+            except json.JSONDecodeError as e:
+                logger.warning(f"Skipping malformed node: {str(e)}")
+                return None
+        if not isinstance(node, dict) or "id" not in node:
+            return None
+        return node
+
+
+def strip_trailing_commas(text):
+    """Remove commas directly before a closing bracket, leaving string contents alone"""
+    out = []
+    pending_comma = None
+    in_string = False
+    escape = False
+    for char in text:
+        if in_string:
+            out.append(char)
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == ",":
+            if pending_comma is not None:
+                out.append(pending_comma)
+            pending_comma = ","
+            continue
+        if pending_comma is not None and not char.isspace():
+            if char not in "}]":
+                out.append(pending_comma)
+            pending_comma = None
+        if char == '"':
+            in_string = True
+        out.append(char)
+    return "".join(out)
+
+
+def _recovery_starts(content):
+    """Where the flowchart JSON may begin: the object holding each "nodes" key, then the first bracket"""
+    starts = []
+    for match in _NODES_KEY.finditer(content):
+        start = content.rfind("{", 0, match.start())
+        if start >= 0 and start not in starts:
+            starts.append(start)
+    first = min((pos for pos in (content.find("{"), content.find("[")) if pos >= 0), default=None)
+    if first is not None and first not in starts:
+        starts.append(first)
+    return starts
+
+
+def recover_flowchart_json(content):
+    """Salvage flowchart nodes from malformed or truncated model output.
+
+    Runs the incremental parser over the content (O(n) per candidate
+    start), keeping every complete node, repairing trailing commas,
+    closing a node cut off mid-way and dropping only the broken tail.
+    Parsing starts at the object holding a "nodes" key, so prose with
+    brackets of its own before the JSON is skipped; a bare array is
+    found from the first bracket. Returns {"nodes": [...]} or None if
+    no node could be recovered.
+    """
+    if not content:
+        return None
+    for start in _recovery_starts(content):
+        parser = IncrementalNodeParser()
+        parser.feed(content[start:])
+        parser.close()
+        if parser.nodes:
+            return {"nodes": parser.nodes}
+    return None
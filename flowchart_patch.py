@@ -0,0 +1,141 @@
+import copy
+import json
+
+from circuit_breaker import is_degraded
+from flowchart_parser import strip_trailing_commas
+
+NODE_FIELDS = ("text", "type", "icon", "description")
+NODE_TYPES = ("start", "process", "decision", "end")
+
+
+class PatchError(ValueError):
+    """Raised when a patch operation can't be applied to the flowchart"""
+
+
+def _node_index(nodes, node_id):
+    for index, node in enumerate(nodes):
+        if node.get("id") == node_id:
+            return index
+    raise PatchError(f"Unknown node id: {node_id}")
+
+
+def _new_node_id(nodes, wanted=None):
+    ids = {node.get("id") for node in nodes}
+    if wanted and wanted not in ids:
+        return wanted
+    number = len(nodes) + 1
+    while f"node{number}" in ids:
+        number += 1
+    return f"node{number}"
+
+
+def check_patchable(flowchart_data):
+    """Raise PatchError for a chart edits can't start from: a placeholder shown in place of a real one"""
+    if is_degraded(flowchart_data):
+        raise PatchError("This chart is a placeholder shown after a failed generation; generate a new chart instead "
+                         "of editing it")
+
+
+def apply_patch(flowchart_data, operations):
+    """Apply patch operations to a copy of a flowchart.
+
+    Supported operations:
+      {"op": "add_node", "node": {...}, "after": id}       insert a node, optionally
+                                                           spliced in after `after`
+      {"op": "remove_node", "id": id}                      delete a node, linking its
+                                                           predecessors to its targets
+      {"op": "update_node", "id": id, "fields": {...}}     change text/type/icon/description
+      {"op": "relink", "source": id, "from": id, "to": id} move, add (no "from") or
+                                                           remove (no "to") an edge
+
+    Returns (flowchart, changed_ids): the ids of nodes that were added or
+    whose own content changed; nodes that only gained or lost an edge are
+    not included. Raises PatchError on an invalid operation, or when the
+    chart is a degraded placeholder (see check_patchable).
+    """
+    check_patchable(flowchart_data)
+    nodes = copy.deepcopy(flowchart_data.get("nodes", []))
+    changed_ids = set()
+
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise PatchError(f"Invalid operation: {operation!r}")
+        op = operation.get("op")
+
+        if op == "add_node":
+            node = dict(operation.get("node") or {})
+            if not node.get("text"):
+                raise PatchError("add_node needs a node with text")
+            node["id"] = _new_node_id(nodes, node.get("id"))
+            node.setdefault("type", "process")
+            node["connections"] = [target for target in node.get("connections", [])
+                                   if any(other.get("id") == target for other in nodes)]
+            after = operation.get("after")
+            if after:
+                predecessor = nodes[_node_index(nodes, after)]
+                # Splice in: the new node takes over the predecessor's outgoing edges
+                if not node["connections"]:
+                    node["connections"] = list(predecessor.get("connections", []))
+                predecessor["connections"] = [node["id"]]
+                nodes.insert(_node_index(nodes, after) + 1, node)
+            else:
+                nodes.append(node)
+            changed_ids.add(node["id"])
+
+        elif op == "remove_node":
+            index = _node_index(nodes, operation.get("id"))
+            removed = nodes.pop(index)
+            for node in nodes:
+                connections = node.get("connections", [])
+                if removed["id"] in connections:
+                    # Bridge the gap so the flow stays connected
+                    position = connections.index(removed["id"])
+                    bridged = [target for target in removed.get("connections", [])
+                               if target != node["id"] and target not in connections]
+                    node["connections"] = connections[:position] + bridged + connections[position + 1:]
+            changed_ids.discard(removed["id"])
+
+        elif op == "update_node":
+            node = nodes[_node_index(nodes, operation.get("id"))]
+            fields = {key: value for key, value in (operation.get("fields") or {}).items() if key in NODE_FIELDS}
+            if "type" in fields and fields["type"] not in NODE_TYPES:
+                raise PatchError(f"Invalid node type: {fields['type']}")
+            if fields and any(node.get(key) != value for key, value in fields.items()):
+                node.update(fields)
+                changed_ids.add(node["id"])
+
+        elif op == "relink":
+            node = nodes[_node_index(nodes, operation.get("source"))]
+            connections = list(node.get("connections", []))
+            old_target, new_target = operation.get("from"), operation.get("to")
+            if new_target is not None:
+                _node_index(nodes, new_target)
+            if old_target is not None and old_target in connections:
+                position = connections.index(old_target)
+                if new_target is None or new_target in connections:
+                    del connections[position]
+                else:
+                    connections[position] = new_target
+            elif new_target is not None and new_target not in connections:
+                connections.append(new_target)
+            node["connections"] = connections
+
+        else:
+            raise PatchError(f"Unknown patch operation: {op!r}")
+
+    return {**flowchart_data, "nodes": nodes}, changed_ids
+
+
+def parse_patch_operations(content):
+    """Extract the list of operations from a model response"""
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        try:
+            data = json.loads(strip_trailing_commas(content))
+        except json.JSONDecodeError as e:
+            raise PatchError(f"Edit response is not valid JSON: {str(e)}") from e
+    operations = data.get("operations") if isinstance(data, dict) else data
+    if not isinstance(operations, list):
+        raise PatchError("Edit response has no list of operations")
+    return operations
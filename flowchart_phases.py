@@ -0,0 +1,49 @@
+# Function to merge per-phase subgraphs into one flowchart
+def merge_phase_flowcharts(phase_flowcharts):
+    """Join phase subgraphs (in order, None for a missing phase) into one flowchart.
+    
+    Node ids are namespaced per phase so subgraphs can't collide, start
+    and end nodes at phase boundaries are dropped, and the exits of each
+    phase are linked to the entry of the next available phase.
+    """
+    phases = [(index, flowchart) for index, flowchart in enumerate(phase_flowcharts) if flowchart]
+    merged = []
+    previous_exits = []
+    for position, (index, flowchart) in enumerate(phases):
+        is_first = position == 0
+        is_last = position == len(phases) - 1
+        prefix = f"p{index + 1}-"
+        nodes = [node for node in flowchart["nodes"] if isinstance(node, dict) and node.get("id")]
+        ids = {node["id"] for node in nodes}
+        nodes = [
+            dict(node, id=prefix + node["id"],
+                 connections=[prefix + target for target in node.get("connections", []) if target in ids])
+            for node in nodes
+        ]
+        if not nodes:
+            continue
+        
+        # Boundary start/end nodes become plain links between phases
+        entries = []
+        if not is_first:
+            starts = [node for node in nodes if node.get("type") == "start"]
+            for start in starts:
+                entries.extend(start["connections"])
+            nodes = [node for node in nodes if node.get("type") != "start"] or nodes
+        if not is_last:
+            end_ids = {node["id"] for node in nodes if node.get("type") == "end"}
+            if len(end_ids) < len(nodes):
+                nodes = [dict(node, connections=[target for target in node["connections"] if target not in end_ids])
+                         for node in nodes if node["id"] not in end_ids]
+        node_ids = {node["id"] for node in nodes}
+        entries = [target for target in entries if target in node_ids]
+        if not entries:
+            targeted = {target for node in nodes for target in node["connections"]}
+            entries = [next((node["id"] for node in nodes if node["id"] not in targeted), nodes[0]["id"])]
+        
+        for node in previous_exits:
+            node["connections"] = node["connections"] + [target for target in entries
+                                                          if target not in node["connections"]]
+        previous_exits = [node for node in nodes if not node["connections"] and node.get("type") != "end"]
+        merged.extend(nodes)
+    return {"nodes": merged}
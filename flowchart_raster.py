@@ -0,0 +1,373 @@
+import argparse
+import concurrent.futures
+import io
+import json
+import logging
+import math
+import os
+import re
+import struct
+import sys
+import zlib
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+from flowchart_layout import Layout, calculate_layout, calculate_connector_points
+from flowchart_renderer import (DESIGN_THEMES, LABEL_ICON_GAP, LABEL_LINE_HEIGHT, LABEL_METRICS, decision_label,
+                                get_icon_for_node, svg_corner_radius, theme_font_family)
+from offline_assets import DEFAULT_ASSETS_PATH, FONT_STYLE_NAMES, load_icon_codepoints
+
+logger = logging.getLogger("AskFlowChart")
+
+# Download entry for the image, alongside the HTML formats in EXPORT_FORMATS
+PNG_FORMAT = ("PNG image", "flowchart.png", "image/png")
+
+# Charts are drawn in TILE_SIZE-wide tiles, a band of rows at a time; a band holds at most BAND_PIXELS
+# pixels (3 bytes each), so memory stays bounded however wide or tall the chart is
+TILE_SIZE = 512
+BAND_PIXELS = 8 * TILE_SIZE * TILE_SIZE
+
+MARGIN = 20
+BACKGROUND = (255, 255, 255)
+LABEL_COLORS = {"Yes": "#4CAF50", "No": "#f44336"}
+
+
+# Function to load a theme font from the local assets, falling back to Pillow's bundled font
+@lru_cache(maxsize=None)
+def load_font(family, weight, size, assets_path=DEFAULT_ASSETS_PATH):
+    prefix = family.replace(" ", "")
+    for candidate in (weight, 500, 400):
+        path = os.path.join(assets_path, "fonts", f"{prefix}-{FONT_STYLE_NAMES[candidate]}.ttf")
+        if os.path.exists(path):
+            return ImageFont.truetype(path, size)
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 only has the fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+# Function to load the solid icon font and its codepoints; None when there is no local Font Awesome
+@lru_cache(maxsize=None)
+def load_icon_font(size, assets_path=DEFAULT_ASSETS_PATH):
+    fontawesome = os.path.join(assets_path, "fontawesome")
+    css_path = os.path.join(fontawesome, "css", "all.css")
+    if not os.path.exists(css_path):
+        css_path = os.path.join(fontawesome, "css", "all.min.css")
+    font_path = os.path.join(fontawesome, "webfonts", "fa-solid-900.ttf")
+    if not (os.path.exists(css_path) and os.path.exists(font_path)):
+        return None
+    return ImageFont.truetype(font_path, size), load_icon_codepoints(css_path)
+
+
+# Function to mix a colour with the background, for the SVG shapes' translucent outline
+def blend(color, alpha, background=BACKGROUND):
+    if isinstance(color, str):
+        color = color.lstrip("#")
+        color = [int(color[i:i + 2], 16) for i in (0, 2, 4)]
+    return tuple(round(c * alpha + b * (1 - alpha)) for c, b in zip(color, background))
+
+
+# Function to read a theme's box-shadow ("0 4px 6px rgba(67, 97, 238, 0.3)") as (vertical offset, colour)
+@lru_cache(maxsize=None)
+def node_shadow(shadow):
+    match = re.match(r"\S+\s+(\d+)px.*rgba\(([^)]*)\)", shadow or "")
+    if not match:
+        return None
+    red, green, blue, alpha = (float(value) for value in match.group(2).split(","))
+    return int(match.group(1)), blend((red, green, blue), alpha)
+
+
+# Function to sample the edge path the SVG backend draws, as a polyline
+def edge_points(source_x, source_y, target_x, target_y, curved=False, steps=16):
+    if not curved:
+        return [(source_x, source_y), (target_x, target_y)]
+    # Same control points as svg_edge_path
+    if abs(target_x - source_x) >= abs(target_y - source_y):
+        mid_x = (source_x + target_x) / 2
+        controls = [(source_x, source_y), (mid_x, source_y), (mid_x, target_y), (target_x, target_y)]
+    else:
+        mid_y = (source_y + target_y) / 2
+        controls = [(source_x, source_y), (source_x, mid_y), (target_x, mid_y), (target_x, target_y)]
+    (x0, y0), (x1, y1), (x2, y2), (x3, y3) = controls
+    points = []
+    for step in range(steps + 1):
+        t = step / steps
+        u = 1 - t
+        points.append((u ** 3 * x0 + 3 * u * u * t * x1 + 3 * u * t * t * x2 + t ** 3 * x3,
+                       u ** 3 * y0 + 3 * u * u * t * y1 + 3 * u * t * t * y2 + t ** 3 * y3))
+    return points
+
+
+def _dashes(points, dash, gap):
+    """Split a polyline into dash segments"""
+    segments = []
+    current = [points[0]]
+    drawing, left = True, dash
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        length = math.hypot(x1 - x0, y1 - y0)
+        position = 0
+        while length - position > left:
+            position += left
+            point = (round(x0 + (x1 - x0) * position / length), round(y0 + (y1 - y0) * position / length))
+            if drawing:
+                current.append(point)
+                segments.append(current)
+            current = [point]
+            drawing = not drawing
+            left = dash if drawing else gap
+        left -= length - position
+        if drawing:
+            current.append((x1, y1))
+    if drawing and len(current) > 1:
+        segments.append(current)
+    return segments
+
+
+def _wrap(draw, text, font, width):
+    """Greedy word wrap to a pixel width"""
+    lines = []
+    for word in text.split():
+        if lines and draw.textlength(f"{lines[-1]} {word}", font=font) <= width:
+            lines[-1] = f"{lines[-1]} {word}"
+        else:
+            lines.append(word)
+    return lines
+
+
+class RasterScene:
+    """A laid-out chart ready to draw in tiles.
+
+    Everything is measured once in output pixels and bucketed on a grid of
+    TILE_SIZE cells, so drawing a tile only touches the nodes, edges and
+    labels that overlap it.
+    """
+
+    def __init__(self, layout, theme, scale=1.0):
+        self.theme = theme
+        self.scale = scale
+        self.items = []
+        if layout:
+            left = min(info["x"] for info in layout) - MARGIN
+            top = min(info["y"] for info in layout) - MARGIN
+            right = max(info["x"] + info["width"] for info in layout) + MARGIN
+            bottom = max(info["y"] + info["height"] for info in layout) + MARGIN
+        else:
+            left = top = 0
+            right = bottom = 2 * MARGIN
+        self.origin = (left, top)
+        self.width = max(1, math.ceil((right - left) * scale))
+        self.height = max(1, math.ceil((bottom - top) * scale))
+        self.grid = {}
+
+        # Drawing order follows the SVG backend: edges and their labels, then nodes on top
+        for source_info, target_info in layout.edges():
+            self._add_edge(source_info, target_info)
+        for node_info in layout:
+            self._add_node(node_info)
+
+    def _point(self, x, y):
+        # Whole pixels, so shifting a shape into any tile rasterizes it the same way
+        return (round((x - self.origin[0]) * self.scale), round((y - self.origin[1]) * self.scale))
+
+    def _add(self, item, box):
+        index = len(self.items)
+        self.items.append(item)
+        left, top, right, bottom = box
+        for row in range(max(0, int(top // TILE_SIZE)), int(bottom // TILE_SIZE) + 1):
+            for column in range(max(0, int(left // TILE_SIZE)), int(right // TILE_SIZE) + 1):
+                self.grid.setdefault((column, row), []).append(index)
+
+    def _add_edge(self, source_info, target_info):
+        connector = self.theme["connector"]
+        source_x, source_y, target_x, target_y = calculate_connector_points(source_info, target_info)
+        points = [self._point(x, y) for x, y in edge_points(source_x, source_y, target_x, target_y,
+                                                            connector["style"] == "curved")]
+        # Arrowhead like the SVG marker: 8px long, pointing along the last segment
+        (x0, y0), (x1, y1) = points[-2], points[-1]
+        angle = math.atan2(y1 - y0, x1 - x0)
+        size = 8 * self.scale
+        head = [(x1, y1)] + [(round(x1 - size * math.cos(angle + side)), round(y1 - size * math.sin(angle + side)))
+                             for side in (0.45, -0.45)]
+        xs = [x for x, _ in points + head]
+        ys = [y for _, y in points + head]
+        self._add(("edge", points, head), (min(xs), min(ys), max(xs), max(ys)))
+
+        label_text = decision_label(source_info["node"], target_info["node"]["id"])
+        if label_text is not None:
+            x, y = self._point((source_x + target_x) / 2, (source_y + target_y) / 2)
+            reach = round(20 * self.scale)
+            self._add(("label", x, y, label_text), (x - reach, y - reach, x + reach, y + reach))
+
+    def _add_node(self, node_info):
+        left, top = self._point(node_info["x"], node_info["y"])
+        box = (left, top, left + round(node_info["width"] * self.scale), top + round(node_info["height"] * self.scale))
+        reach = round(8 * self.scale)  # the shadow's offset
+        self._add(("node", node_info, box), (box[0], box[1], box[2], box[3] + reach))
+
+    def draw_tile(self, left, top, width, height):
+        """An RGB image of the output region at (left, top)"""
+        image = Image.new("RGB", (width, height), BACKGROUND)
+        draw = ImageDraw.Draw(image)
+        indexes = set()
+        for row in range(top // TILE_SIZE, (top + height - 1) // TILE_SIZE + 1):
+            for column in range(left // TILE_SIZE, (left + width - 1) // TILE_SIZE + 1):
+                indexes.update(self.grid.get((column, row), ()))
+        for index in sorted(indexes):
+            item = self.items[index]
+            getattr(self, f"_draw_{item[0]}")(draw, -left, -top, *item[1:])
+        return image
+
+    def _draw_edge(self, draw, dx, dy, points, head):
+        connector = self.theme["connector"]
+        width = max(1, round(float(connector["thickness"].rstrip("px")) * self.scale))
+        points = [(x + dx, y + dy) for x, y in points]
+        if connector["style"] == "dashed":
+            for segment in _dashes(points, 6 * self.scale, 4 * self.scale):
+                draw.line(segment, fill=connector["color"], width=width)
+        else:
+            draw.line(points, fill=connector["color"], width=width, joint="curve")
+        draw.polygon([(x + dx, y + dy) for x, y in head], fill=connector["color"])
+
+    def _draw_label(self, draw, dx, dy, x, y, label_text):
+        font = load_font(theme_font_family(self.theme), 600, round(12 * self.scale))
+        draw.text((x + dx, y + dy), label_text, font=font, fill=LABEL_COLORS[label_text], anchor="mm",
+                  stroke_width=max(1, round(2 * self.scale)), stroke_fill=BACKGROUND)
+
+    def _draw_node(self, draw, dx, dy, node_info, box):
+        node = node_info["node"]
+        style = self.theme["node_styles"].get(node["type"], self.theme["node_styles"]["process"])
+        left, top, right, bottom = box
+        outline = blend(style["bg"], 0.8)
+        line_width = max(1, round(2 * self.scale))
+        center_x, center_y = (left + right) // 2, (top + bottom) // 2
+        radius = round(svg_corner_radius(style["shape"], node_info["height"]) * self.scale)
+
+        def shape(offset, fill, outline=None):
+            if node["type"] == "decision":
+                draw.polygon([(center_x + dx, top + offset), (right + dx, center_y + offset),
+                              (center_x + dx, bottom + offset), (left + dx, center_y + offset)],
+                             fill=fill, outline=outline, width=line_width)
+            else:
+                draw.rounded_rectangle((left + dx, top + offset, right + dx, bottom + offset), radius=radius,
+                                       fill=fill, outline=outline, width=line_width)
+
+        # The box-shadow as a flat offset copy; without it white nodes vanish on the white background
+        shadow = node_shadow(style.get("shadow"))
+        if shadow:
+            shape(dy + round(shadow[0] * self.scale), shadow[1])
+        shape(dy, style["bg"], outline)
+
+        text_size, icon_size, pad_x, pad_y = LABEL_METRICS.get(node["type"], LABEL_METRICS["default"])
+        font = load_font(theme_font_family(self.theme), 500, round(text_size * self.scale))
+        line_height = LABEL_LINE_HEIGHT * text_size * self.scale
+        lines = _wrap(draw, node["text"], font, right - left - 2 * pad_x * self.scale)
+
+        icon = None
+        if self.theme["icons"]:
+            icons = load_icon_font(round(icon_size * self.scale))
+            codepoint = icons and icons[1].get(get_icon_for_node(node))
+            if codepoint:
+                icon = (icons[0], chr(codepoint))
+        icon_height = (icon_size + LABEL_ICON_GAP) * self.scale if icon else 0
+
+        # Like the label's overflow: hidden, keep the lines that fit and centre the block
+        room = bottom - top - 2 * pad_y * self.scale - icon_height
+        lines = lines[:max(1, int(room // line_height))]
+        y = center_y - (icon_height + len(lines) * line_height) / 2
+        if icon:
+            draw.text((center_x + dx, round(y) + dy), icon[1], font=icon[0], fill=style["text"], anchor="mt")
+            y += icon_height
+        for line in lines:
+            draw.text((center_x + dx, round(y + line_height / 2) + dy), line, font=font, fill=style["text"],
+                      anchor="mm")
+            y += line_height
+
+
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+# Function to rasterize a chart to PNG, one band of tiles at a time
+def render_png(flowchart_data, theme_key, orientation="landscape", scale=1.0, layout=None, out=None):
+    """Draw the chart with Pillow and write it as a PNG.
+
+    Only one band of rows exists at a time: it is drawn as a row of tiles
+    TILE_SIZE wide, its rows are stitched from the tiles and deflated
+    straight into the file's IDAT chunks, and it is dropped. Bands are
+    TILE_SIZE rows high, or fewer on charts so wide that a band would
+    exceed BAND_PIXELS, so memory stays bounded whatever the chart's
+    shape. Writes to `out` (a binary file object) or returns the bytes.
+    """
+    if layout is None:
+        layout = calculate_layout(flowchart_data["nodes"], orientation)
+    elif not isinstance(layout, Layout):
+        layout = Layout(layout)
+    scene = RasterScene(layout, DESIGN_THEMES[theme_key], scale)
+
+    buffer = io.BytesIO() if out is None else None
+    target = buffer or out
+    target.write(b"\x89PNG\r\n\x1a\n")
+    target.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", scene.width, scene.height, 8, 2, 0, 0, 0)))
+    compressor = zlib.compressobj(6)
+    band_height = max(1, min(TILE_SIZE, BAND_PIXELS // scene.width))
+    for top in range(0, scene.height, band_height):
+        height = min(band_height, scene.height - top)
+        tiles = [(scene.draw_tile(left, top, min(TILE_SIZE, scene.width - left), height).tobytes(),
+                  min(TILE_SIZE, scene.width - left) * 3)
+                 for left in range(0, scene.width, TILE_SIZE)]
+        for row in range(height):
+            # Filter type 0 (none) before every row
+            data = compressor.compress(b"\x00" + b"".join(tile[row * size:(row + 1) * size] for tile, size in tiles))
+            if data:
+                target.write(_png_chunk(b"IDAT", data))
+        del tiles
+    target.write(_png_chunk(b"IDAT", compressor.flush()))
+    target.write(_png_chunk(b"IEND", b""))
+    return buffer.getvalue() if buffer is not None else None
+
+
+def _render_png_job(job):
+    """Process pool entry point: (flowchart_data, theme_key, orientation, scale) -> PNG bytes"""
+    return render_png(*job)
+
+
+# Several charts rasterized in parallel worker processes, in the order given
+def render_pngs(charts, orientation="landscape", scale=1.0, max_workers=None):
+    """PNG bytes for a list of (flowchart_data, theme_key) pairs.
+
+    Drawing is CPU-bound Python, so charts are spread over processes rather
+    than threads; a single chart is drawn in this process.
+    """
+    jobs = [(flowchart_data, theme_key, orientation, scale) for flowchart_data, theme_key in charts]
+    if len(jobs) <= 1 or max_workers == 1:
+        return [_render_png_job(job) for job in jobs]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_render_png_job, jobs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rasterize flowchart JSON files to PNG")
+    parser.add_argument("flowcharts", nargs="+", help='JSON files with a "nodes" list')
+    parser.add_argument("-o", "--output-dir", default=".", help="directory for the PNG files")
+    parser.add_argument("--theme", default="modern", choices=sorted(DESIGN_THEMES))
+    parser.add_argument("--orientation", default="landscape", choices=["landscape", "portrait"])
+    parser.add_argument("--scale", type=float, default=1.0, help="pixels per layout unit")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    charts = []
+    for path in args.flowcharts:
+        with open(path, encoding="utf-8") as f:
+            charts.append((json.load(f), args.theme))
+    images = render_pngs(charts, args.orientation, args.scale, args.workers)
+    for path, image in zip(args.flowcharts, images):
+        output = os.path.join(args.output_dir, os.path.splitext(os.path.basename(path))[0] + ".png")
+        with open(output, "wb") as f:
+            f.write(image)
+        print(f"{output}: {len(image)} bytes", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
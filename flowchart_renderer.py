@@ -0,0 +1,2243 @@
+import argparse
+import gzip
+import json
+import math
+import re
+import sys
+import uuid
+from functools import lru_cache
+from html import escape
+
+from flowchart_layout import Layout, calculate_layout, calculate_connector_points
+from offline_assets import missing_assets, offline_font_css
+
+# Bump when the rendered markup changes, so persisted renders aren't reused
+RENDERER_VERSION = 7
+
+# How the graph itself is drawn; all backends share the themes, controls, tooltips and client runtime
+RENDER_BACKENDS = {
+    "html": "HTML elements",
+    "svg": "SVG",
+    "virtual": "SVG, virtualized (large charts)",
+}
+
+# Define design themes
+DESIGN_THEMES = {
+    "modern": {
+        "name": "Modern Minimal",
+        "node_styles": {
+            "start": {"bg": "#4361EE", "text": "#FFFFFF", "shadow": "0 4px 6px rgba(67, 97, 238, 0.3)", "shape": "rounded"},
+            "process": {"bg": "#F8F9FA", "text": "#212529", "shadow": "0 2px 5px rgba(0,0,0,0.08)", "shape": "rounded"},
+            "decision": {"bg": "#FFF8E1", "text": "#1C1C1C", "shadow": "0 2px 5px rgba(0,0,0,0.08)", "shape": "diamond"},
+            "end": {"bg": "#4CC9F0", "text": "#FFFFFF", "shadow": "0 4px 6px rgba(76, 201, 240, 0.3)", "shape": "rounded"},
+        },
+        "connector": {"color": "#CED4DA", "style": "curved", "thickness": "1.5px"},
+        "font": "'Roboto', sans-serif",
+        "icons": True
+    },
+    "corporate": {
+        "name": "Corporate Professional",
+        "node_styles": {
+            "start": {"bg": "#2C3E50", "text": "#FFFFFF", "shadow": "0 4px 6px rgba(44, 62, 80, 0.3)", "shape": "rounded"},
+            "process": {"bg": "#FFFFFF", "text": "#34495E", "shadow": "0 2px 4px rgba(0,0,0,0.1)", "shape": "rectangle"},
+            "decision": {"bg": "#ECF0F1", "text": "#2C3E50", "shadow": "0 2px 4px rgba(0,0,0,0.1)", "shape": "diamond"},
+            "end": {"bg": "#3498DB", "text": "#FFFFFF", "shadow": "0 4px 6px rgba(52, 152, 219, 0.3)", "shape": "rounded"},
+        },
+        "connector": {"color": "#95A5A6", "style": "straight", "thickness": "1.5px"},
+        "font": "'Open Sans', sans-serif",
+        "icons": True
+    },
+    "creative": {
+        "name": "Creative Colorful",
+        "node_styles": {
+            "start": {"bg": "#FF6B6B", "text": "#FFFFFF", "shadow": "0 5px 15px rgba(255, 107, 107, 0.4)", "shape": "capsule"},
+            "process": {"bg": "#FFFFFF", "text": "#2F2E41", "shadow": "0 5px 15px rgba(0,0,0,0.08)", "shape": "capsule"},
+            "decision": {"bg": "#FFEAA7", "text": "#2F2E41", "shadow": "0 5px 15px rgba(0,0,0,0.08)", "shape": "diamond"},
+            "end": {"bg": "#4ECDC4", "text": "#FFFFFF", "shadow": "0 5px 15px rgba(78, 205, 196, 0.4)", "shape": "capsule"},
+        },
+        "connector": {"color": "#A5A6F6", "style": "dashed", "thickness": "1.5px"},
+        "font": "'Comfortaa', cursive",
+        "icons": True
+    },
+    "tech": {
+        "name": "Tech Blueprint",
+        "node_styles": {
+            "start": {"bg": "#3A0CA3", "text": "#FFFFFF", "shadow": "0 4px 8px rgba(58, 12, 163, 0.3)", "shape": "pill"},
+            "process": {"bg": "#0F1724", "text": "#F8F9FA", "shadow": "0 3px 6px rgba(0,0,0,0.2)", "shape": "rectangle"},
+            "decision": {"bg": "#4895EF", "text": "#FFFFFF", "shadow": "0 3px 6px rgba(72, 149, 239, 0.3)", "shape": "diamond"},
+            "end": {"bg": "#4CC9F0", "text": "#FFFFFF", "shadow": "0 4px 8px rgba(76, 201, 240, 0.3)", "shape": "pill"},
+        },
+        "connector": {"color": "#4361EE", "style": "gradient", "thickness": "1.5px"},
+        "font": "'IBM Plex Sans', sans-serif",
+        "icons": True
+    },
+    "healthcare": {
+        "name": "Healthcare",
+        "node_styles": {
+            "start": {"bg": "#00B4D8", "text": "#FFFFFF", "shadow": "0 3px 6px rgba(0, 180, 216, 0.3)", "shape": "rounded"},
+            "process": {"bg": "#FFFFFF", "text": "#023E8A", "shadow": "0 2px 5px rgba(0,0,0,0.08)", "shape": "rounded"},
+            "decision": {"bg": "#CAF0F8", "text": "#023E8A", "shadow": "0 2px 5px rgba(0,0,0,0.08)", "shape": "diamond"},
+            "end": {"bg": "#0077B6", "text": "#FFFFFF", "shadow": "0 3px 6px rgba(0, 119, 182, 0.3)", "shape": "rounded"},
+        },
+        "connector": {"color": "#90E0EF", "style": "straight", "thickness": "1.5px"},
+        "font": "'Quicksand', sans-serif",
+        "icons": True
+    },
+    "finance": {
+        "name": "Finance & Banking",
+        "node_styles": {
+            "start": {"bg": "#1B4332", "text": "#FFFFFF", "shadow": "0 3px 6px rgba(27, 67, 50, 0.3)", "shape": "rectangle"},
+            "process": {"bg": "#FFFFFF", "text": "#081C15", "shadow": "0 2px 4px rgba(0,0,0,0.1)", "shape": "rectangle"},
+            "decision": {"bg": "#D8F3DC", "text": "#081C15", "shadow": "0 2px 4px rgba(0,0,0,0.1)", "shape": "diamond"},
+            "end": {"bg": "#2D6A4F", "text": "#FFFFFF", "shadow": "0 3px 6px rgba(45, 106, 79, 0.3)", "shape": "rectangle"},
+        },
+        "connector": {"color": "#95D5B2", "style": "straight", "thickness": "1.5px"},
+        "font": "'Montserrat', sans-serif",
+        "icons": True
+    },
+}
+
+
+# Helper function to generate CSS for connectors based on theme and style
+def generate_connector_css(theme, source_x, source_y, target_x, target_y, angle, length):
+    style = theme["connector"]["style"]
+    color = theme["connector"]["color"]
+    thickness = theme["connector"]["thickness"]
+    
+    css = f"left: {source_x}px; top: {source_y}px; width: {length}px; transform: rotate({angle}deg); transform-origin: 0 0;"
+    
+    if style == "straight":
+        return f"background-color: {color}; height: {thickness}; {css}"
+    elif style == "dashed":
+        return f"background-color: {color}; height: {thickness}; border-top-style: dashed; {css}"
+    elif style == "curved":
+        # For curved, we'll still use straight but add a different class
+        return f"background-color: {color}; height: {thickness}; {css}"
+    elif style == "gradient":
+        return f"background: linear-gradient(90deg, {color}, {color}FF); height: {thickness}; {css}"
+    else:
+        return f"background-color: {color}; height: {thickness}; {css}"
+
+# Helper function to get shape CSS based on node type and theme
+def get_node_shape_css(node_type, theme):
+    shape = theme["node_styles"][node_type]["shape"]
+    
+    if shape == "rounded":
+        return "border-radius: 8px;"
+    elif shape == "rectangle":
+        return "border-radius: 2px;"
+    elif shape == "diamond":
+        return "transform: rotate(45deg); width: 120px; height: 120px;"
+    elif shape == "pill" or shape == "capsule":
+        return "border-radius: 50px;"
+    else:
+        return "border-radius: 8px;"  # Default
+
+# Function to get Font Awesome icon for node type
+def get_icon_for_node(node):
+    # Check if node has a custom icon
+    if "icon" in node and node["icon"]:
+        # Make sure it has the fa- prefix
+        if not node["icon"].startswith("fa-"):
+            return f"fa-{node['icon']}"
+        return node["icon"]
+    
+    # Default icons based on node type
+    default_icons = {
+        "start": "fa-play-circle",
+        "process": "fa-cog",
+        "decision": "fa-question-circle",
+        "end": "fa-flag-checkered"
+    }
+    
+    return default_icons.get(node["type"], "fa-circle")
+
+# Function to label a decision's branches: its first connection is "Yes", the others "No"
+def decision_label(source_node, target_id):
+    if source_node["type"] != "decision":
+        return None
+    return "Yes" if source_node["connections"].index(target_id) == 0 else "No"
+
+# Fragment templates, compiled once at import and filled with str.format (literal braces are doubled)
+ICON_TEMPLATE = '<i class="icon fas {icon}"></i>'
+
+NODE_TEMPLATE = """
+            <div id="{id}" class="node node-{type}" style="left: {x}px; top: {y}px;" {description_attr}>
+                {icon_html}
+                {text}
+            </div>
+            """
+
+DECISION_NODE_TEMPLATE = """
+            <div id="{id}" class="node node-{type}" style="left: {x}px; top: {y}px;" {description_attr}>
+                <div class="content">
+                    {icon_html}
+                    {text}
+                </div>
+            </div>
+            """
+
+CONNECTOR_TEMPLATE = """
+                <div id="{conn_id}" class="{connector_class}" data-source="{source_id}" data-target="{target_id}" style="{connector_style}"></div>
+                <div id="line-{conn_id}" class="connector-line" style="{connector_style}"></div>
+                """
+
+LABEL_TEMPLATE = """
+                    <div class="label {label_class}" id="label-{source_id}-{target_id}" 
+                         data-connector-id="{conn_id}" 
+                         data-source-id="{source_id}" 
+                         data-target-id="{target_id}"
+                         style="left: {midx}px; top: {midy}px;">{label_text}</div>
+                    """
+
+# Function to render the HTML for one node
+def render_node_fragment(node_info, theme):
+    """Node HTML, memoised on its layout entry so unchanged nodes aren't rebuilt after an edit"""
+    fragments = node_info.setdefault("fragments", {})
+    key = ("node", theme["icons"])
+    if key in fragments:
+        return fragments[key]
+    
+    node = node_info["node"]
+    
+    # Get icon for this node
+    icon_html = ICON_TEMPLATE.format(icon=get_icon_for_node(node)) if theme["icons"] else ''
+    
+    # Get description for tooltip if available
+    description = node.get("description", "")
+    description_attr = f'data-description="{description}"' if description else ''
+    
+    # Different styling based on node type
+    template = DECISION_NODE_TEMPLATE if node["type"] == "decision" else NODE_TEMPLATE
+    html = template.format(id=node["id"], type=node["type"], x=node_info["x"], y=node_info["y"],
+                           description_attr=description_attr, icon_html=icon_html, text=node["text"])
+    fragments[key] = html
+    return html
+
+# Function to render the HTML for one connection (and its decision label)
+def render_connection_fragment(source_info, target_info, theme):
+    """Connector HTML, memoised on the source's layout entry by everything else it depends on"""
+    source_node = source_info["node"]
+    target_id = target_info["node"]["id"]
+    
+    # Determine label text based on connection order
+    label_text = decision_label(source_node, target_id)
+    
+    connector = theme["connector"]
+    key = ("connection", target_id, target_info["x"], target_info["y"], target_info["node"]["type"], label_text,
+           connector["style"], connector["color"], connector["thickness"])
+    fragments = source_info.setdefault("fragments", {})
+    if key in fragments:
+        return fragments[key]
+    
+    # Calculate connector points at node borders
+    source_x, source_y, target_x, target_y = calculate_connector_points(source_info, target_info)
+    
+    # Calculate distance and angle for the connector
+    dx = target_x - source_x
+    dy = target_y - source_y
+    length = (dx**2 + dy**2)**0.5
+    angle = math.atan2(dy, dx) * (180 / math.pi)
+    
+    # Generate connection HTML with arrow
+    conn_id = f"conn-{source_node['id']}-{target_id}"
+    connector_style = generate_connector_css(theme, source_x, source_y, target_x, target_y, angle, length)
+    html = CONNECTOR_TEMPLATE.format(conn_id=conn_id, connector_class=f"connector {connector['style']}",
+                                     source_id=source_node["id"], target_id=target_id,
+                                     connector_style=connector_style)
+    
+    # Add labels for decision paths if node is a decision
+    if label_text is not None:
+        html += LABEL_TEMPLATE.format(label_class="yes" if label_text == "Yes" else "no",
+                                      source_id=source_node["id"], target_id=target_id, conn_id=conn_id,
+                                      midx=source_x + (dx / 2), midy=source_y + (dy / 2), label_text=label_text)
+    fragments[key] = html
+    return html
+
+# Class that scopes a theme's stylesheet; every chart root carries it
+def theme_scope_class(theme_key):
+    return f"flowchart-theme-{theme_key}"
+
+# SVG node labels: (text size, icon size, horizontal padding, vertical padding) in px, by node type
+LABEL_METRICS = {"decision": (11, 14, 30, 14), "default": (13, 18, 10, 6)}
+LABEL_LINE_HEIGHT = 1.2
+LABEL_ICON_GAP = 4
+# Average glyph width as a share of the font size, for wrapping without measuring text
+LABEL_CHAR_WIDTH = 0.55
+
+# Function to wrap a label into at most `max_lines` lines of `max_chars`, ending in an ellipsis if cut
+def wrap_label(text, max_chars, max_lines):
+    lines = []
+    for word in text.split():
+        if lines and len(lines[-1]) + 1 + len(word) <= max_chars:
+            lines[-1] += " " + word
+        else:
+            lines.append(word)
+    if len(lines) > max_lines:
+        lines = lines[:max_lines]
+        lines[-1] = lines[-1][:max_chars - 1].rstrip() + "\u2026"
+    return lines
+
+# Function to place a node's label inside its box (the client runtime mirrors it for virtualized charts)
+def svg_label_layout(text, node_type, width, height, icon):
+    """(lines, icon center y, center y of each line), relative to the node's corner"""
+    text_size, icon_size, pad_x, pad_y = LABEL_METRICS.get(node_type, LABEL_METRICS["default"])
+    line_height = text_size * LABEL_LINE_HEIGHT
+    icon_block = icon_size + LABEL_ICON_GAP if icon else 0
+    max_chars = max(1, int((width - 2 * pad_x) / (text_size * LABEL_CHAR_WIDTH)))
+    max_lines = max(1, int((height - 2 * pad_y - icon_block) / line_height))
+    lines = wrap_label(text, max_chars, max_lines)
+    top = (height - icon_block - len(lines) * line_height) / 2
+    return lines, top + icon_size / 2, [top + icon_block + (i + 0.5) * line_height for i in range(len(lines))]
+
+# SVG backend rules: fills and strokes come from the theme instead of box styles
+def _svg_theme_rules(theme, scope):
+    connector = theme["connector"]
+    rules = [f"""
+        {scope} .flowchart-svg {{
+            overflow: visible;
+        }}
+        
+        {scope} .svg-node {{
+            cursor: move;
+            touch-action: none;
+            stroke-width: 2;
+        }}
+        
+        {scope} .svg-node.dragging,
+        {scope} .svg-node.dragging + .node-label {{
+            opacity: 0.8;
+        }}
+        
+        /* Labels let the pointer through to their shape, which carries the node's id and events */
+        {scope} .node-label {{
+            font-size: {LABEL_METRICS["default"][0]}px;
+            font-weight: 500;
+            text-anchor: middle;
+            pointer-events: none;
+            user-select: none;
+        }}
+        
+        {scope} .node-label,
+        {scope} .node-label tspan {{
+            dominant-baseline: central;
+        }}
+        
+        {scope} .node-icon {{
+            font-family: "Font Awesome 5 Free";
+            font-weight: 900;
+            font-size: {LABEL_METRICS["default"][1]}px;
+        }}
+        
+        {scope} .node-label-decision {{
+            font-size: {LABEL_METRICS["decision"][0]}px;
+        }}
+        
+        {scope} .node-label-decision .node-icon {{
+            font-size: {LABEL_METRICS["decision"][1]}px;
+        }}
+        
+        {scope} .svg-edge {{
+            fill: none;
+            stroke: {connector["color"]};
+            stroke-width: {connector["thickness"]};
+        }}
+        
+        {scope} .svg-edge.dashed {{
+            stroke-dasharray: 6 4;
+        }}
+        
+        {scope} .arrow-head {{
+            fill: {connector["color"]};
+        }}
+        
+        {scope} .svg-label {{
+            font-size: 12px;
+            font-weight: 600;
+            text-anchor: middle;
+            dominant-baseline: middle;
+            paint-order: stroke;
+            stroke: white;
+            stroke-width: 4px;
+            cursor: default;
+        }}
+        
+        {scope} .svg-label.yes {{
+            fill: #4CAF50;
+        }}
+        
+        {scope} .svg-label.no {{
+            fill: #f44336;
+        }}
+        
+        {scope}.dark-mode .svg-label {{
+            stroke: #1a1a1a;
+        }}
+        """]
+    for node_type, style in theme["node_styles"].items():
+        rules.append(f"""
+        {scope} .svg-node-{node_type} {{
+            fill: {style["bg"]};
+            stroke: {style["bg"]}CC;
+        }}
+        
+        {scope} .node-label-{node_type} {{
+            fill: {style["text"]};
+        }}
+        """)
+    return "".join(rules)
+
+# Weights loaded for each theme font, from Google Fonts or (offline exports) local files
+THEME_FONT_WEIGHTS = {
+    "Roboto": (400, 500),
+    "Open Sans": (400, 600),
+    "Comfortaa": (400, 700),
+    "IBM Plex Sans": (400, 500),
+    "Quicksand": (500, 600),
+    "Montserrat": (400, 500),
+}
+
+GOOGLE_FONTS_URL = "https://fonts.googleapis.com/css2?" + "&".join(
+    f"family={family.replace(' ', '+')}:wght@{';'.join(map(str, weights))}" for family, weights in THEME_FONT_WEIGHTS.items()
+) + "&display=swap"
+
+FONT_AWESOME_URL = "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/5.15.4/css/all.min.css"
+
+WEB_FONT_IMPORTS = f"""@import url('{GOOGLE_FONTS_URL}');
+        @import url('{FONT_AWESOME_URL}');
+        """
+
+# Function to get the family a theme's font stack starts with ("'Roboto', sans-serif" -> "Roboto")
+def theme_font_family(theme):
+    return theme["font"].split(",")[0].strip().strip("'\"")
+
+# Compile a theme's stylesheet once and share it between renders and charts
+@lru_cache(maxsize=None)
+def get_theme_stylesheet(theme_key, web_fonts=True):
+    """The <style> block for a theme; it depends only on DESIGN_THEMES, never on the chart.
+    With `web_fonts` False the Google Fonts and Font Awesome imports are left out, for pages
+    that bring their own (see generate_export_html)."""
+    theme = DESIGN_THEMES[theme_key]
+    scope = f".{theme_scope_class(theme_key)}"
+    return f"""<style>
+        {WEB_FONT_IMPORTS if web_fonts else ""}
+        {scope} {{
+            font-family: {theme["font"]};
+            display: flex;
+            flex-direction: column;
+            align-items: center;
+            padding: 20px;
+            overflow: hidden;
+            background-color: white;
+            border-radius: 12px;
+            min-height: 700px;
+            position: relative;
+            transition: background-color 0.3s ease;
+        }}
+        
+        {scope}.dark-mode {{
+            background-color: #1a1a1a;
+        }}
+        
+        {scope} .flowchart-container {{
+            position: relative;
+            background-color: transparent;
+            border-radius: 12px;
+            padding: 20px;
+            transform-origin: center center;
+            transition: transform 0.3s ease;
+            margin: auto;
+        }}
+        
+        {scope} .controls {{
+            position: fixed;
+            bottom: 15px;
+            right: 15px;
+            z-index: 1000;
+            background: white;
+            padding: 3px;
+            border-radius: 6px;
+            box-shadow: 0 2px 8px rgba(0,0,0,0.08);
+            display: flex;
+            gap: 3px;
+            align-items: center;
+            transition: background-color 0.3s ease;
+        }}
+        
+        {scope}.dark-mode .controls {{
+            background: #2d2d2d;
+            box-shadow: 0 2px 10px rgba(0,0,0,0.3);
+        }}
+        
+        {scope} .navigation-controls {{
+            position: fixed;
+            left: 15px;
+            bottom: 15px;
+            z-index: 1000;
+            background: white;
+            padding: 3px;
+            border-radius: 6px;
+            box-shadow: 0 2px 8px rgba(0,0,0,0.08);
+            display: grid;
+            grid-template-columns: repeat(3, 1fr);
+            gap: 1px;
+            transition: background-color 0.3s ease;
+        }}
+        
+        {scope}.dark-mode .navigation-controls {{
+            background: #2d2d2d;
+            box-shadow: 0 2px 10px rgba(0,0,0,0.3);
+        }}
+        
+        {scope} .controls button,
+        {scope} .navigation-controls button {{
+            background: {theme["node_styles"]["process"]["bg"]};
+            color: {theme["node_styles"]["process"]["text"]};
+            border: none;
+            padding: 3px 6px;
+            border-radius: 4px;
+            cursor: pointer;
+            font-size: 11px;
+            transition: all 0.2s ease;
+            display: flex;
+            align-items: center;
+            justify-content: center;
+            min-width: 24px;
+            min-height: 24px;
+            box-shadow: 0 1px 3px rgba(0,0,0,0.1);
+        }}
+        
+        {scope}.dark-mode .controls button,
+        {scope}.dark-mode .navigation-controls button {{
+            background: #3d3d3d;
+            color: #ffffff;
+            box-shadow: 0 2px 5px rgba(0,0,0,0.3);
+        }}
+        
+        {scope} .controls button:hover,
+        {scope} .navigation-controls button:hover {{
+            transform: translateY(-2px);
+            box-shadow: 0 4px 8px rgba(0,0,0,0.15);
+        }}
+        
+        {scope}.dark-mode .controls button:hover,
+        {scope}.dark-mode .navigation-controls button:hover {{
+            box-shadow: 0 4px 8px rgba(0,0,0,0.4);
+        }}
+        
+        {scope} .controls .reset-btn:hover,
+        {scope} .navigation-controls .reset-btn:hover {{
+            background: {theme["node_styles"]["start"]["bg"]}DD;
+        }}
+        
+        {scope}.dark-mode .controls .reset-btn:hover,
+        {scope}.dark-mode .navigation-controls .reset-btn:hover {{
+            background: #4a4a4a;
+            color: #ffffff;
+        }}
+        
+        {scope} .navigation-controls .up-btn {{
+            grid-column: 2;
+        }}
+        
+        {scope} .navigation-controls .left-btn {{
+            grid-column: 1;
+            grid-row: 2;
+        }}
+        
+        {scope} .navigation-controls .center-btn {{
+            grid-column: 2;
+            grid-row: 2;
+        }}
+        
+        {scope} .navigation-controls .right-btn {{
+            grid-column: 3;
+            grid-row: 2;
+        }}
+        
+        {scope} .navigation-controls .down-btn {{
+            grid-column: 2;
+            grid-row: 3;
+        }}
+        
+        {scope} .controls .zoom-level {{
+            background: {theme["node_styles"]["process"]["bg"]};
+            color: {theme["node_styles"]["process"]["text"]};
+            padding: 4px 8px;
+            border-radius: 4px;
+            font-size: 12px;
+            min-width: 50px;
+            text-align: center;
+            box-shadow: 0 2px 5px rgba(0,0,0,0.1);
+        }}
+        
+        {scope}.dark-mode .controls .zoom-level {{
+            background: #3d3d3d;
+            color: #ffffff;
+            box-shadow: 0 2px 5px rgba(0,0,0,0.3);
+        }}
+        
+        {scope} .controls .theme-toggle {{
+            background: #f0f0f0;
+            color: #333;
+        }}
+        
+        {scope}.dark-mode .controls .theme-toggle {{
+            background: #4a4a4a;
+            color: #fff;
+        }}
+        
+        {scope} .node {{
+            position: absolute;
+            padding: 15px;
+            min-width: 120px;
+            text-align: center;
+            font-weight: 500;
+            font-size: 14px;
+            z-index: 3;
+            transition: transform 0.1s, box-shadow 0.1s;
+            border: 2px solid rgba(0, 0, 0, 0.1);
+            box-shadow: 0 4px 6px rgba(0,0,0,0.1);
+            cursor: move;
+            user-select: none;
+            touch-action: none;
+        }}
+        
+        {scope} .node.dragging {{
+            opacity: 0.8;
+            z-index: 1000;
+            box-shadow: 0 8px 15px rgba(0,0,0,0.2);
+        }}
+        
+        {scope}.dark-mode .node {{
+            box-shadow: 0 4px 6px rgba(0,0,0,0.3);
+        }}
+        
+        {scope} .node:hover {{
+            transform: translateY(-3px);
+            box-shadow: 0 8px 15px rgba(0,0,0,0.1) !important;
+            border-color: rgba(0, 0, 0, 0.2);
+        }}
+        
+        {scope}.dark-mode .node:hover {{
+            box-shadow: 0 8px 15px rgba(0,0,0,0.3) !important;
+        }}
+        
+        {scope} .node-start {{
+            background-color: {theme["node_styles"]["start"]["bg"]};
+            color: {theme["node_styles"]["start"]["text"]};
+            box-shadow: {theme["node_styles"]["start"]["shadow"]};
+            {get_node_shape_css("start", theme)}
+            border-color: {theme["node_styles"]["start"]["bg"]}CC;
+        }}
+        
+        {scope} .node-end {{
+            background-color: {theme["node_styles"]["end"]["bg"]};
+            color: {theme["node_styles"]["end"]["text"]};
+            box-shadow: {theme["node_styles"]["end"]["shadow"]};
+            {get_node_shape_css("end", theme)}
+            border-color: {theme["node_styles"]["end"]["bg"]}CC;
+        }}
+        
+        {scope} .node-process {{
+            background-color: {theme["node_styles"]["process"]["bg"]};
+            color: {theme["node_styles"]["process"]["text"]};
+            box-shadow: {theme["node_styles"]["process"]["shadow"]};
+            {get_node_shape_css("process", theme)}
+            border-color: {theme["node_styles"]["process"]["bg"]}CC;
+        }}
+        
+        {scope} .node-decision {{
+            background-color: {theme["node_styles"]["decision"]["bg"]};
+            color: {theme["node_styles"]["decision"]["text"]};
+            box-shadow: {theme["node_styles"]["decision"]["shadow"]};
+            {get_node_shape_css("decision", theme)}
+            display: flex;
+            align-items: center;
+            justify-content: center;
+            transform: rotate(45deg);
+            border-color: {theme["node_styles"]["decision"]["bg"]}CC;
+            min-width: 120px;
+            min-height: 120px;
+            max-width: 120px;
+            max-height: 120px;
+        }}
+        
+        {scope} .node-decision:hover {{
+            transform: rotate(45deg) translateY(-3px);
+            box-shadow: 0 8px 15px rgba(0,0,0,0.15) !important;
+            border-color: {theme["node_styles"]["decision"]["bg"]}EE;
+        }}
+        
+        {scope}.dark-mode .node-decision:hover {{
+            box-shadow: 0 8px 15px rgba(0,0,0,0.4) !important;
+        }}
+        
+        {scope} .node-decision .content {{
+            transform: rotate(-45deg);
+            width: 130px;
+            height: 130px;
+            display: flex;
+            flex-direction: column;
+            align-items: center;
+            justify-content: center;
+            text-align: center;
+            padding: 5px;
+            font-size: 0.95em;
+        }}
+        
+        {scope} .node-decision .icon {{
+            margin-bottom: 5px;
+            font-size: 22px;
+        }}
+        
+        {scope} .connector {{
+            position: absolute;
+            height: {theme["connector"]["thickness"]};
+            z-index: 2;
+            pointer-events: none;
+        }}
+        
+        {scope} .connector-line {{
+            position: absolute;
+            height: {theme["connector"]["thickness"]};
+            z-index: 2;
+            pointer-events: all;
+            cursor: pointer;
+            background-color: transparent;
+        }}
+        
+       
+        
+        {scope} .connector.curved:after {{
+            right: 50%;
+            top: -5px;
+            border-width: 6px 0 6px 10px;
+            border-color: transparent transparent transparent green;
+            z-index: 5;
+        }}
+        
+        {scope} .connector.dashed:after {{
+            border-style: dashed;
+            border-width: 5px 0 5px 8px;
+            right: 50%;
+            border-color: transparent transparent transparent green;
+            z-index: 5;
+        }}
+         {scope} .connector:after {{
+            content: '';
+            position: absolute;
+            right: 5%;
+            top: -4px;
+            width: 0;
+            height: 0;
+            border-style: solid;
+            border-width: 5px 0 5px 8px;
+            border-color: transparent transparent transparent green;
+            z-index: 5;
+        }}
+        {scope} .connector.gradient:after {{
+            border-color: transparent transparent transparent green;
+            right: 50%;
+            z-index: 5;
+        }}
+        
+        {scope} .label {{
+            position: absolute;
+            background-color: white;
+            padding: 3px 8px;
+            border-radius: 4px;
+            font-size: 12px;
+            box-shadow: 0 1px 3px rgba(0,0,0,0.1);
+            z-index: 4;
+            border: 1px solid rgba(0,0,0,0.1);
+            transform: translate(-50%, -50%);
+            white-space: nowrap;
+            cursor: move;
+            user-select: none;
+            touch-action: none;
+        }}
+        
+        {scope}.dark-mode .label {{
+            background-color: #2d2d2d;
+            color: white;
+            border-color: rgba(255,255,255,0.1);
+        }}
+        
+        {scope} .label.dragging {{
+            opacity: 0.8;
+            z-index: 1000;
+        }}
+        
+        {scope} .label.yes {{
+            background-color: #4CAF50;
+            color: white;
+            border: none;
+        }}
+        
+        {scope} .label.no {{
+            background-color: #f44336;
+            color: white;
+            border: none;
+        }}
+        
+        {scope}.dark-mode .label.yes {{
+            background-color: #2E7D32;
+        }}
+        
+        {scope}.dark-mode .label.no {{
+            background-color: #C62828;
+        }}
+        
+        {scope} .icon {{
+            display: block;
+            margin-bottom: 8px;
+            font-size: 24px;
+        }}
+        
+        /* Tooltip styles */
+        {scope} .tooltip {{
+            position: absolute;
+            background-color: rgba(0, 0, 0, 0.85);
+            color: white;
+            padding: 12px 15px;
+            border-radius: 6px;
+            font-size: 12px;
+            z-index: 1000;
+            max-width: 320px;
+            min-width: 180px;
+            box-shadow: 0 4px 10px rgba(0, 0, 0, 0.3);
+            pointer-events: none;
+            opacity: 0;
+            transition: opacity 0.3s;
+            visibility: hidden;
+            word-wrap: break-word;
+            line-height: 1.4;
+        }}
+        
+        {scope} .tooltip.visible {{
+            opacity: 1;
+            visibility: visible;
+        }}
+        
+        {scope}.dark-mode .tooltip {{
+            background-color: rgba(40, 40, 40, 0.95);
+            color: #f0f0f0;
+            box-shadow: 0 4px 15px rgba(0, 0, 0, 0.5);
+        }}
+        
+        {scope} .tooltip-content {{
+            display: flex;
+            flex-direction: column;
+            gap: 8px;
+        }}
+        
+        {scope} .tooltip-title {{
+            font-weight: bold;
+            font-size: 14px;
+            border-bottom: 1px solid rgba(255, 255, 255, 0.3);
+            padding-bottom: 4px;
+            margin-bottom: 4px;
+        }}
+        
+        {scope} .tooltip-description {{
+            white-space: pre-line;
+            max-height: 250px;
+            overflow-y: auto;
+            padding-right: 5px;
+            font-size: 11px;
+        }}
+        
+        {scope} .tooltip-description::-webkit-scrollbar {{
+            width: 4px;
+        }}
+        
+        {scope} .tooltip-description::-webkit-scrollbar-track {{
+            background: rgba(255, 255, 255, 0.1);
+            border-radius: 2px;
+        }}
+        
+        {scope} .tooltip-description::-webkit-scrollbar-thumb {{
+            background: rgba(255, 255, 255, 0.3);
+            border-radius: 2px;
+        }}
+        
+        {scope} .tooltip-paragraph {{
+            margin: 0 0 6px 0;
+            padding: 0;
+            line-height: 1.3;
+        }}
+        
+        {scope} .tooltip-paragraph:last-child {{
+            margin-bottom: 0;
+        }}
+        
+        {scope} .tooltip-heading {{
+            font-weight: bold;
+            font-size: 12px;
+            color: #4361EE;
+            display: block;
+            margin-top: 6px;
+        }}
+        
+        {scope}.dark-mode .tooltip-heading {{
+            color: #4cc9f0;
+        }}
+        
+        {scope} .tooltip {{
+            max-width: 320px;
+            max-height: 350px;
+            overflow: hidden;
+        }}
+        {_svg_theme_rules(theme, scope)}
+    </style>
+    """
+
+# Chart shell around the node and connector fragments; the runtime finds charts by data-flowchart
+CHART_OPEN_TEMPLATE = """
+    {css}
+    <div id="{chart_id}" class="{scope_class}" data-flowchart="{backend}" data-zoom="{zoom_level}">
+        <div class="flowchart-container" style="width: {container_width}px; height: {container_height}px; transform: scale({zoom_level}) translate(0px, 0px);">
+            """
+
+# Zoom and navigation controls; the runtime dispatches their data-action names to the chart they sit in
+CONTROLS_TEMPLATE = """
+    <div class="controls">
+        <button class="theme-toggle" data-action="toggleTheme">
+            <i class="fas fa-moon"></i>
+        </button>
+        <button class="reset-btn" data-action="resetZoom">
+            <i class="fas fa-sync-alt"></i>
+        </button>
+        <button data-action="zoomOut">
+            <i class="fas fa-search-minus"></i>
+        </button>
+        <div class="zoom-level">{zoom_percent}%</div>
+        <button data-action="zoomIn">
+            <i class="fas fa-search-plus"></i>
+        </button>
+        <button class="reset-layout-btn" data-action="resetLayout">
+            <i class="fas fa-undo"></i>
+        </button>
+    </div>
+    
+    <div class="navigation-controls">
+        <button class="up-btn" data-action="moveUp">
+            <i class="fas fa-arrow-up"></i>
+        </button>
+        <button class="left-btn" data-action="moveLeft">
+            <i class="fas fa-arrow-left"></i>
+        </button>
+        <button class="center-btn reset-btn" data-action="resetPosition">
+            <i class="fas fa-crosshairs"></i>
+        </button>
+        <button class="right-btn" data-action="moveRight">
+            <i class="fas fa-arrow-right"></i>
+        </button>
+        <button class="down-btn" data-action="moveDown">
+            <i class="fas fa-arrow-down"></i>
+        </button>
+    </div>
+    
+    <div id="{chart_id}-tooltip" class="tooltip"></div>
+    """
+
+# Icons the controls can show; the runtime swaps the theme toggle's moon for a sun
+CONTROL_ICONS = frozenset(re.findall(r"fa-[\w-]+", CONTROLS_TEMPLATE)) | {"fa-sun"}
+
+# Each chart only registers with the page's runtime
+CHART_REGISTER_TEMPLATE = """
+    <script>flowchartRuntime.register('{chart_id}');</script>"""
+
+CHART_CLOSE = """
+    </div>
+    """
+
+# Bump when the runtime's behaviour changes: a page keeps the newest runtime it has been sent
+RUNTIME_VERSION = 2
+
+# The client runtime shared by every chart on a page: view controls, dragging for each backend,
+# virtualized mounting and tooltips, behind delegated listeners with per-chart state
+RUNTIME_SCRIPT_TEMPLATE = """
+    <script>
+        (function(version) {{
+            // One runtime per page, shared by every chart on it; a newer version replaces an older one
+            if (window.flowchartRuntime && window.flowchartRuntime.version >= version) return;
+
+            const charts = new Map();
+            const MOVE_STEP = 50;
+            const SVG_NS = 'http://www.w3.org/2000/svg';
+            // Node label metrics, the same as svg_label_layout's on the server
+            const LABEL_LAYOUT = {label_layout};
+            const TOOLTIP_TERMS = ["Purpose:", "Implementation:", "Technical details:", "Best practices:", "Common issues:"];
+            // Virtualized backend: grid cell size, how many cells an edge may span before it is kept
+            // in a plain list, and how far beyond the visible area elements are mounted
+            const GRID_CELL = 400;
+            const MAX_EDGE_CELLS = 64;
+            const OVERSCAN = 200;
+
+            // The drag or pan in progress; there is only ever one pointer session on the page
+            let session = null;
+
+            // Same geometry as calculate_connector_points on the server
+            function diamondPoint(cx, cy, box, degrees, direction) {{
+                if (degrees >= 315 || degrees < 45) return [cx + direction * box.width / 2, cy];
+                if (degrees < 135) return [cx, cy + direction * box.height / 2];
+                if (degrees < 225) return [cx - direction * box.width / 2, cy];
+                return [cx, cy - direction * box.height / 2];
+            }}
+
+            function connectorPoints(source, target) {{
+                const scx = source.x + source.width / 2, scy = source.y + source.height / 2;
+                const tcx = target.x + target.width / 2, tcy = target.y + target.height / 2;
+                const angle = Math.atan2(tcy - scy, tcx - scx);
+                let sx, sy, tx, ty;
+                if (Math.abs(Math.cos(angle)) > Math.abs(Math.sin(angle))) {{
+                    sx = tcx > scx ? source.x + source.width : source.x;
+                    sy = scy;
+                    tx = tcx > scx ? target.x : target.x + target.width;
+                    ty = tcy;
+                }} else {{
+                    sy = tcy > scy ? source.y + source.height : source.y;
+                    sx = scx;
+                    ty = tcy > scy ? target.y : target.y + target.height;
+                    tx = tcx;
+                }}
+                const degrees = ((angle * 180 / Math.PI) % 360 + 360) % 360;
+                if (source.decision) [sx, sy] = diamondPoint(scx, scy, source, degrees, 1);
+                if (target.decision) [tx, ty] = diamondPoint(tcx, tcy, target, degrees, -1);
+                return [sx, sy, tx, ty];
+            }}
+
+            // Same path shapes as svg_edge_path on the server
+            function edgePath(sx, sy, tx, ty, curved) {{
+                const f = value => value.toFixed(1);
+                if (!curved) return `M${{f(sx)}},${{f(sy)}} L${{f(tx)}},${{f(ty)}}`;
+                if (Math.abs(tx - sx) >= Math.abs(ty - sy)) {{
+                    const mx = (sx + tx) / 2;
+                    return `M${{f(sx)}},${{f(sy)}} C${{f(mx)}},${{f(sy)}} ${{f(mx)}},${{f(ty)}} ${{f(tx)}},${{f(ty)}}`;
+                }}
+                const my = (sy + ty) / 2;
+                return `M${{f(sx)}},${{f(sy)}} C${{f(sx)}},${{f(my)}} ${{f(tx)}},${{f(my)}} ${{f(tx)}},${{f(ty)}}`;
+            }}
+
+            // HTML backend connectors: a diamond's corner, or where the centre line crosses the border
+            function borderIntersection(fromX, fromY, toX, toY, node) {{
+                const angle = Math.atan2(toY - fromY, toX - fromX);
+                const cos = Math.cos(angle);
+                const sin = Math.sin(angle);
+                if (Math.abs(cos) > Math.abs(sin)) {{
+                    const x = cos > 0 ? node.x + node.width : node.x;
+                    return [x, fromY + (x - fromX) * sin / cos];
+                }}
+                const y = sin > 0 ? node.y + node.height : node.y;
+                return [fromX + (y - fromY) * cos / sin, y];
+            }}
+
+            function htmlConnectorPoints(source, target) {{
+                const scx = source.x + source.width / 2, scy = source.y + source.height / 2;
+                const tcx = target.x + target.width / 2, tcy = target.y + target.height / 2;
+                const degrees = ((Math.atan2(tcy - scy, tcx - scx) * 180 / Math.PI) % 360 + 360) % 360;
+                const [sx, sy] = source.decision ? diamondPoint(scx, scy, source, degrees, 1)
+                                                 : borderIntersection(scx, scy, tcx, tcy, source);
+                const [tx, ty] = target.decision ? diamondPoint(tcx, tcy, target, degrees, -1)
+                                                 : borderIntersection(tcx, tcy, scx, scy, target);
+                return [sx, sy, tx, ty];
+            }}
+
+            // Per-chart lookups are scoped to the chart's root: element ids repeat between charts
+            function findById(chart, id) {{
+                return chart.root.querySelector('#' + CSS.escape(id));
+            }}
+
+            function chartFor(target) {{
+                const root = target && target.closest ? target.closest('[data-flowchart]') : null;
+                return root ? charts.get(root.id) : undefined;
+            }}
+
+            // Every chart's DOM writes for a frame happen in one requestAnimationFrame callback
+            function requestFrame(chart) {{
+                if (chart.frameRequested) return;
+                chart.frameRequested = true;
+                requestAnimationFrame(() => runFrame(chart));
+            }}
+
+            function runFrame(chart) {{
+                chart.frameRequested = false;
+                if (session && session.chart === chart && session.pointer) {{
+                    const pointer = session.pointer;
+                    session.pointer = null;
+                    session.move(pointer);
+                }}
+                if (chart.transformDirty) {{
+                    chart.transformDirty = false;
+                    chart.container.style.transform = `scale(${{chart.scale}}) translate(${{chart.x}}px, ${{chart.y}}px)`;
+                }}
+                if (chart.viewportDirty) {{
+                    chart.viewportDirty = false;
+                    if (chart.backend.updateViewport) chart.backend.updateViewport(chart);
+                }}
+            }}
+
+            function updateTransform(chart) {{
+                chart.transformDirty = true;
+                chart.viewportDirty = true;
+                requestFrame(chart);
+            }}
+
+            function updateZoomLevel(chart) {{
+                chart.root.querySelector('.zoom-level').textContent = Math.round(chart.scale * 100) + '%';
+            }}
+
+            // What the control buttons' data-action attributes call
+            const ACTIONS = {{
+                toggleTheme(chart) {{
+                    chart.dark = !chart.dark;
+                    chart.root.classList.toggle('dark-mode', chart.dark);
+                    const icon = chart.root.querySelector('.theme-toggle i');
+                    icon.classList.toggle('fa-moon', !chart.dark);
+                    icon.classList.toggle('fa-sun', chart.dark);
+                }},
+                moveUp(chart) {{
+                    chart.y += MOVE_STEP;
+                    updateTransform(chart);
+                }},
+                moveDown(chart) {{
+                    chart.y -= MOVE_STEP;
+                    updateTransform(chart);
+                }},
+                moveLeft(chart) {{
+                    chart.x += MOVE_STEP;
+                    updateTransform(chart);
+                }},
+                moveRight(chart) {{
+                    chart.x -= MOVE_STEP;
+                    updateTransform(chart);
+                }},
+                resetPosition(chart) {{
+                    chart.x = 0;
+                    chart.y = 0;
+                    updateTransform(chart);
+                }},
+                zoomIn(chart) {{
+                    if (chart.scale < 2.0) {{
+                        chart.scale += 0.1;
+                        updateTransform(chart);
+                        updateZoomLevel(chart);
+                    }}
+                }},
+                zoomOut(chart) {{
+                    if (chart.scale > 0.5) {{
+                        chart.scale -= 0.1;
+                        updateTransform(chart);
+                        updateZoomLevel(chart);
+                    }}
+                }},
+                resetZoom(chart) {{
+                    chart.scale = 1.0;
+                    updateTransform(chart);
+                    updateZoomLevel(chart);
+                }},
+                resetLayout(chart) {{
+                    chart.backend.resetLayout(chart);
+                    chart.scale = 1.0;
+                    chart.x = 0;
+                    chart.y = 0;
+                    updateTransform(chart);
+                    updateZoomLevel(chart);
+                }}
+            }};
+
+            // Index a connector under both of its nodes, so a drag only touches the moved node's edges
+            function addEdge(chart, edge) {{
+                chart.edges.push(edge);
+                chart.edgesByNode.get(edge.source).push(edge);
+                if (edge.target !== edge.source) {{
+                    chart.edgesByNode.get(edge.target).push(edge);
+                }}
+            }}
+
+            // HTML backend: absolutely positioned nodes and rotated connector divs
+            const HTML_BACKEND = {{
+                init(chart) {{
+                    chart.nodes = new Map();
+                    chart.initialBoxes = new Map();
+                    chart.edgesByNode = new Map();
+                    chart.edges = [];
+                    chart.root.querySelectorAll('.node').forEach(node => {{
+                        const box = {{
+                            element: node,
+                            x: parseInt(node.style.left),
+                            y: parseInt(node.style.top),
+                            width: node.offsetWidth,
+                            height: node.offsetHeight,
+                            decision: node.classList.contains('node-decision')
+                        }};
+                        chart.nodes.set(node.id, box);
+                        chart.initialBoxes.set(node.id, {{ x: box.x, y: box.y }});
+                        chart.edgesByNode.set(node.id, []);
+                    }});
+                    const labels = new Map();
+                    chart.root.querySelectorAll('.label').forEach(label => labels.set(label.dataset.connectorId, label));
+                    chart.root.querySelectorAll('.connector').forEach(connector => {{
+                        const source = connector.dataset.source, target = connector.dataset.target;
+                        if (!chart.nodes.has(source) || !chart.nodes.has(target)) return;
+                        addEdge(chart, {{
+                            connector: connector,
+                            line: findById(chart, `line-${{connector.id}}`),
+                            label: labels.get(connector.id) || null,
+                            source: source,
+                            target: target
+                        }});
+                    }});
+                }},
+
+                updateEdge(chart, edge) {{
+                    const [sx, sy, tx, ty] = htmlConnectorPoints(chart.nodes.get(edge.source), chart.nodes.get(edge.target));
+                    const dx = tx - sx;
+                    const dy = ty - sy;
+                    const length = Math.sqrt(dx * dx + dy * dy);
+                    const angle = Math.atan2(dy, dx) * (180 / Math.PI);
+
+                    // The connector and the invisible line labels are dragged along
+                    [edge.connector, edge.line].forEach(element => {{
+                        if (!element) return;
+                        element.style.left = `${{sx}}px`;
+                        element.style.top = `${{sy}}px`;
+                        element.style.width = `${{length}}px`;
+                        element.style.transform = `rotate(${{angle}}deg)`;
+                    }});
+
+                    // Decision labels keep their place along the connector, unless being dragged
+                    const label = edge.label;
+                    if (label && !label.classList.contains('dragging')) {{
+                        const position = parseFloat(label.dataset.position || '0.5');
+                        label.style.left = `${{sx + dx * position}}px`;
+                        label.style.top = `${{sy + dy * position}}px`;
+                    }}
+                }},
+
+                moveNode(chart, id, x, y) {{
+                    const box = chart.nodes.get(id);
+                    box.x = x;
+                    box.y = y;
+                    box.element.style.left = `${{x}}px`;
+                    box.element.style.top = `${{y}}px`;
+                    chart.edgesByNode.get(id).forEach(edge => HTML_BACKEND.updateEdge(chart, edge));
+                }},
+
+                resetLayout(chart) {{
+                    chart.initialBoxes.forEach((position, id) => HTML_BACKEND.moveNode(chart, id, position.x, position.y));
+                }},
+
+                pointerDown(chart, e) {{
+                    const label = e.target.closest('.label');
+                    if (label) return HTML_BACKEND.labelSession(chart, label);
+                    const node = e.target.closest('.node');
+                    if (!node || !chart.nodes.has(node.id)) return null;
+
+                    // Pointer movement is in screen pixels; node positions are inside the scaled container
+                    const box = chart.nodes.get(node.id);
+                    const startX = box.x, startY = box.y;
+                    node.classList.add('dragging');
+                    return {{
+                        move: pointer => HTML_BACKEND.moveNode(chart, node.id,
+                                                               startX + (pointer.clientX - e.clientX) / chart.scale,
+                                                               startY + (pointer.clientY - e.clientY) / chart.scale),
+                        end: () => node.classList.remove('dragging')
+                    }};
+                }},
+
+                // Decision labels slide along their connector's invisible line
+                labelSession(chart, label) {{
+                    const line = findById(chart, `line-${{label.dataset.connectorId}}`);
+                    if (!line) return null;
+                    label.classList.add('dragging');
+                    return {{
+                        move(pointer) {{
+                            const lineRect = line.getBoundingClientRect();
+                            const containerRect = chart.root.getBoundingClientRect();
+                            const lineLength = Math.sqrt(Math.pow(lineRect.width, 2) + Math.pow(lineRect.height, 2));
+                            const mouseX = pointer.clientX - containerRect.left;
+                            const mouseY = pointer.clientY - containerRect.top;
+
+                            // Project the pointer onto the line
+                            const rotation = parseFloat(line.style.transform.match(/rotate\(([^)]+)\)/)[1]) * Math.PI / 180;
+                            const lineStartX = parseFloat(line.style.left);
+                            const lineStartY = parseFloat(line.style.top);
+                            const lineEndX = lineStartX + lineRect.width * Math.cos(rotation);
+                            const lineEndY = lineStartY + lineRect.width * Math.sin(rotation);
+                            const position = Math.max(0, Math.min(1,
+                                ((mouseX - lineStartX) * (lineEndX - lineStartX) +
+                                 (mouseY - lineStartY) * (lineEndY - lineStartY)) /
+                                (lineLength * lineLength)
+                            ));
+
+                            label.style.left = `${{lineStartX + (lineEndX - lineStartX) * position}}px`;
+                            label.style.top = `${{lineStartY + (lineEndY - lineStartY) * position}}px`;
+                            label.dataset.position = position;
+                        }},
+                        end: () => label.classList.remove('dragging')
+                    }};
+                }}
+            }};
+
+            function svgPoint(chart, pointer) {{
+                const point = chart.svg.createSVGPoint();
+                point.x = pointer.clientX;
+                point.y = pointer.clientY;
+                return point.matrixTransform(chart.svg.getScreenCTM().inverse());
+            }}
+
+            function placeSvgEdge(chart, edge, path, label) {{
+                const [sx, sy, tx, ty] = connectorPoints(chart.nodes.get(edge.source), chart.nodes.get(edge.target));
+                path.setAttribute('d', edgePath(sx, sy, tx, ty, edge.curved));
+                if (label) {{
+                    label.setAttribute('x', ((sx + tx) / 2).toFixed(1));
+                    label.setAttribute('y', ((sy + ty) / 2).toFixed(1));
+                }}
+            }}
+
+            // Drag a node, keeping the offset between the pointer and the node's corner
+            function svgNodeSession(chart, id, e, moveNode) {{
+                const box = chart.nodes.get(id);
+                const point = svgPoint(chart, e);
+                const dx = point.x - box.x, dy = point.y - box.y;
+                const element = e.target.closest('.svg-node');
+                element.classList.add('dragging');
+                return {{
+                    move(pointer) {{
+                        const current = svgPoint(chart, pointer);
+                        moveNode(chart, id, current.x - dx, current.y - dy);
+                    }},
+                    end() {{
+                        element.classList.remove('dragging');
+                    }}
+                }};
+            }}
+
+            // Icon name -> glyph, read from the ::before rule Font Awesome's stylesheet (or an offline export's
+            // subset of it) gives the name; nothing is cached until that stylesheet has loaded
+            const iconGlyphs = new Map();
+            let iconProbe = null;
+            function iconGlyph(name) {{
+                if (iconGlyphs.has(name)) return iconGlyphs.get(name);
+                if (!iconProbe) {{
+                    iconProbe = document.createElement('i');
+                    iconProbe.setAttribute('aria-hidden', 'true');
+                    iconProbe.style.cssText = 'position: absolute; visibility: hidden; pointer-events: none;';
+                    document.body.appendChild(iconProbe);
+                }}
+                iconProbe.className = 'fas ' + name;
+                const content = getComputedStyle(iconProbe, '::before').content;
+                if (!content || content === 'none' || content === 'normal') return '';
+                const glyph = content.replace(/^["']|["']$/g, '');
+                iconGlyphs.set(name, glyph);
+                return glyph;
+            }}
+
+            function fillIcons(root) {{
+                root.querySelectorAll('.node-icon').forEach(icon => {{
+                    if (!icon.textContent) icon.textContent = iconGlyph(icon.dataset.icon);
+                }});
+            }}
+
+            // Same wrapping as wrap_label on the server
+            function wrapLabel(text, maxChars, maxLines) {{
+                const lines = [];
+                text.split(/\s+/).filter(word => word).forEach(word => {{
+                    if (lines.length && lines[lines.length - 1].length + 1 + word.length <= maxChars) {{
+                        lines[lines.length - 1] += ' ' + word;
+                    }} else {{
+                        lines.push(word);
+                    }}
+                }});
+                if (lines.length > maxLines) {{
+                    lines.length = maxLines;
+                    lines[maxLines - 1] = lines[maxLines - 1].slice(0, maxChars - 1).trimEnd() + '\u2026';
+                }}
+                return lines;
+            }}
+
+            // Fill a node's <text> label the way render_svg_node_fragment does
+            function writeSvgLabel(label, box) {{
+                const [textSize, iconSize, padX, padY] = LABEL_LAYOUT.metrics[box.type] || LABEL_LAYOUT.metrics.default;
+                const lineHeight = textSize * LABEL_LAYOUT.lineHeight;
+                const iconBlock = box.icon ? iconSize + LABEL_LAYOUT.iconGap : 0;
+                const maxChars = Math.max(1, Math.floor((box.width - 2 * padX) / (textSize * LABEL_LAYOUT.charWidth)));
+                const maxLines = Math.max(1, Math.floor((box.height - 2 * padY - iconBlock) / lineHeight));
+                const lines = wrapLabel(box.text, maxChars, maxLines);
+                const top = (box.height - iconBlock - lines.length * lineHeight) / 2;
+                const cx = (box.width / 2).toFixed(1);
+                const lineY = i => (top + iconBlock + (i + 0.5) * lineHeight).toFixed(1);
+                label.textContent = '';
+                label.setAttribute('x', cx);
+                label.setAttribute('y', lines.length ? lineY(0) : (top + iconSize / 2).toFixed(1));
+                lines.forEach((line, i) => {{
+                    if (i === 0) {{
+                        label.append(line);
+                        return;
+                    }}
+                    const span = svgElement('tspan');
+                    span.setAttribute('x', cx);
+                    span.setAttribute('y', lineY(i));
+                    span.textContent = line;
+                    label.appendChild(span);
+                }});
+                if (box.icon) {{
+                    const icon = svgElement('tspan');
+                    icon.setAttribute('class', 'node-icon');
+                    icon.setAttribute('x', cx);
+                    icon.setAttribute('y', (top + iconSize / 2).toFixed(1));
+                    icon.dataset.icon = box.icon;
+                    icon.textContent = iconGlyph(box.icon);
+                    label.appendChild(icon);
+                }}
+            }}
+
+            // SVG backend: each node is a shape placed by transform with its <text> label right after it,
+            // edges are <path>s
+            const SVG_BACKEND = {{
+                init(chart) {{
+                    chart.svg = chart.root.querySelector('.flowchart-svg');
+                    chart.nodes = new Map();
+                    chart.initialBoxes = new Map();
+                    chart.edgesByNode = new Map();
+                    chart.edges = [];
+                    chart.svg.querySelectorAll('.svg-node').forEach(node => {{
+                        const box = {{
+                            element: node,
+                            label: node.nextElementSibling,
+                            x: parseFloat(node.dataset.x),
+                            y: parseFloat(node.dataset.y),
+                            width: parseFloat(node.dataset.width),
+                            height: parseFloat(node.dataset.height),
+                            decision: node.classList.contains('svg-node-decision')
+                        }};
+                        chart.nodes.set(node.id, box);
+                        chart.initialBoxes.set(node.id, {{ x: box.x, y: box.y }});
+                        chart.edgesByNode.set(node.id, []);
+                    }});
+                    const labels = new Map();
+                    chart.svg.querySelectorAll('.svg-label').forEach(label => labels.set(label.dataset.connectorId, label));
+                    chart.svg.querySelectorAll('.svg-edge').forEach(path => {{
+                        addEdge(chart, {{
+                            path: path,
+                            source: path.dataset.source,
+                            target: path.dataset.target,
+                            curved: path.classList.contains('curved'),
+                            label: labels.get(path.id) || null
+                        }});
+                    }});
+                    fillIcons(chart.svg);
+                }},
+
+                moveNode(chart, id, x, y) {{
+                    const box = chart.nodes.get(id);
+                    box.x = x;
+                    box.y = y;
+                    const transform = `translate(${{x.toFixed(1)}} ${{y.toFixed(1)}})`;
+                    box.element.setAttribute('transform', transform);
+                    box.label.setAttribute('transform', transform);
+                    chart.edgesByNode.get(id).forEach(edge => placeSvgEdge(chart, edge, edge.path, edge.label));
+                }},
+
+                resetLayout(chart) {{
+                    chart.initialBoxes.forEach((position, id) => SVG_BACKEND.moveNode(chart, id, position.x, position.y));
+                }},
+
+                pointerDown(chart, e) {{
+                    const node = e.target.closest('.svg-node');
+                    if (!node || !chart.nodes.has(node.id)) return null;
+                    return svgNodeSession(chart, node.id, e, SVG_BACKEND.moveNode);
+                }}
+            }};
+
+            // Virtualized backend: the graph arrives as JSON, and only what intersects the
+            // viewport is in the DOM; node, edge and label elements are recycled through pools
+            function cellRange(bounds) {{
+                return [
+                    Math.floor(bounds.left / GRID_CELL), Math.floor(bounds.top / GRID_CELL),
+                    Math.floor(bounds.right / GRID_CELL), Math.floor(bounds.bottom / GRID_CELL)
+                ];
+            }}
+
+            function addToCells(cells, bounds, item) {{
+                const [c0, r0, c1, r1] = cellRange(bounds);
+                const keys = [];
+                for (let c = c0; c <= c1; c++) {{
+                    for (let r = r0; r <= r1; r++) {{
+                        const key = c + ',' + r;
+                        if (!cells.has(key)) cells.set(key, new Set());
+                        cells.get(key).add(item);
+                        keys.push(key);
+                    }}
+                }}
+                return keys;
+            }}
+
+            function removeFromCells(cells, keys, item) {{
+                keys.forEach(key => cells.get(key).delete(item));
+            }}
+
+            function queryCells(cells, bounds, accept) {{
+                const found = new Set();
+                const [c0, r0, c1, r1] = cellRange(bounds);
+                for (let c = c0; c <= c1; c++) {{
+                    for (let r = r0; r <= r1; r++) {{
+                        const items = cells.get(c + ',' + r);
+                        if (items) items.forEach(item => {{
+                            if (!found.has(item) && accept(item)) found.add(item);
+                        }});
+                    }}
+                }}
+                return found;
+            }}
+
+            function boxBounds(box) {{
+                return {{ left: box.x, top: box.y, right: box.x + box.width, bottom: box.y + box.height }};
+            }}
+
+            // Curves stay inside the box spanned by their end points, so the two nodes bound the edge
+            function edgeBounds(chart, edge) {{
+                const source = chart.nodes.get(edge.source), target = chart.nodes.get(edge.target);
+                return {{
+                    left: Math.min(source.x, target.x),
+                    top: Math.min(source.y, target.y),
+                    right: Math.max(source.x + source.width, target.x + target.width),
+                    bottom: Math.max(source.y + source.height, target.y + target.height)
+                }};
+            }}
+
+            function intersects(a, b) {{
+                return a.left <= b.right && b.left <= a.right && a.top <= b.bottom && b.top <= a.bottom;
+            }}
+
+            function svgElement(tag) {{
+                return document.createElementNS(SVG_NS, tag);
+            }}
+
+            const VIRTUAL_BACKEND = {{
+                init(chart) {{
+                    chart.svg = chart.root.querySelector('.flowchart-svg');
+                    chart.edgesGroup = chart.svg.querySelector('.svg-edges');
+                    chart.nodesGroup = chart.svg.querySelector('.svg-nodes');
+                    chart.graph = JSON.parse(chart.root.querySelector('.flowchart-graph').textContent);
+                    chart.nodes = new Map();
+                    chart.initialBoxes = new Map();
+                    chart.edgesByNode = new Map();
+                    chart.edges = [];
+                    chart.nodeCells = new Map();
+                    chart.edgeCells = new Map();
+                    chart.wideEdges = new Set();
+                    chart.mountedNodes = new Map();
+                    chart.mountedEdges = new Map();
+                    chart.nodePool = {{ box: [], decision: [] }};
+                    chart.edgePool = [];
+                    chart.labelPool = [];
+                    chart.pinned = null;
+
+                    const ids = chart.graph.nodes.map(([id, type, x, y, width, height, text, icon, description]) => {{
+                        const box = {{ id, type, x, y, width, height, text, icon, description,
+                                      decision: type === 'decision', cells: null }};
+                        chart.nodes.set(id, box);
+                        chart.initialBoxes.set(id, {{ x, y }});
+                        chart.edgesByNode.set(id, []);
+                        VIRTUAL_BACKEND.indexNode(chart, box);
+                        return id;
+                    }});
+                    chart.graph.edges.forEach(([source, target, label]) => {{
+                        const edge = {{ index: chart.edges.length, source: ids[source], target: ids[target],
+                                       label: label, curved: chart.graph.style === 'curved', cells: null }};
+                        addEdge(chart, edge);
+                        VIRTUAL_BACKEND.indexEdge(chart, edge);
+                    }});
+
+                    // The viewport is recomputed from the live transform, so it must not animate
+                    chart.container.style.transition = 'none';
+                    chart.root.addEventListener('wheel', e => {{
+                        if (e.target.closest('.controls, .navigation-controls')) return;
+                        chart.x -= e.deltaX / chart.scale;
+                        chart.y -= e.deltaY / chart.scale;
+                        updateTransform(chart);
+                        e.preventDefault();
+                    }}, {{ passive: false }});
+                    VIRTUAL_BACKEND.updateViewport(chart);
+                }},
+
+                indexNode(chart, box) {{
+                    if (box.cells) removeFromCells(chart.nodeCells, box.cells, box.id);
+                    box.cells = addToCells(chart.nodeCells, boxBounds(box), box.id);
+                }},
+
+                indexEdge(chart, edge) {{
+                    if (edge.cells) removeFromCells(chart.edgeCells, edge.cells, edge.index);
+                    chart.wideEdges.delete(edge.index);
+                    edge.cells = null;
+                    const bounds = edgeBounds(chart, edge);
+                    const [c0, r0, c1, r1] = cellRange(bounds);
+                    if ((c1 - c0 + 1) * (r1 - r0 + 1) > MAX_EDGE_CELLS) {{
+                        chart.wideEdges.add(edge.index);
+                    }} else {{
+                        edge.cells = addToCells(chart.edgeCells, bounds, edge.index);
+                    }}
+                }},
+
+                // Visible part of the chart in SVG user units, widened by OVERSCAN
+                visibleBounds(chart) {{
+                    const rect = chart.root.getBoundingClientRect();
+                    const left = Math.max(rect.left, 0), top = Math.max(rect.top, 0);
+                    const right = Math.min(rect.right, window.innerWidth);
+                    const bottom = Math.min(rect.bottom, window.innerHeight);
+                    if (right <= left || bottom <= top) return null;
+                    const inverse = chart.svg.getScreenCTM().inverse();
+                    const point = chart.svg.createSVGPoint();
+                    const xs = [], ys = [];
+                    [[left, top], [right, top], [left, bottom], [right, bottom]].forEach(([x, y]) => {{
+                        point.x = x;
+                        point.y = y;
+                        const local = point.matrixTransform(inverse);
+                        xs.push(local.x);
+                        ys.push(local.y);
+                    }});
+                    return {{
+                        left: Math.min(...xs) - OVERSCAN, top: Math.min(...ys) - OVERSCAN,
+                        right: Math.max(...xs) + OVERSCAN, bottom: Math.max(...ys) + OVERSCAN
+                    }};
+                }},
+
+                mountNode(chart, box) {{
+                    const kind = box.decision ? 'decision' : 'box';
+                    let element = chart.nodePool[kind].pop();
+                    if (!element) {{
+                        element = svgElement(box.decision ? 'polygon' : 'rect');
+                        element.label = svgElement('text');
+                    }}
+                    const w = box.width, h = box.height;
+                    if (box.decision) {{
+                        element.setAttribute('points', `${{w / 2}},0 ${{w}},${{h / 2}} ${{w / 2}},${{h}} 0,${{h / 2}}`);
+                    }} else {{
+                        const radius = chart.graph.radius[box.type];
+                        element.setAttribute('width', w);
+                        element.setAttribute('height', h);
+                        element.setAttribute('rx', radius === undefined || radius === null ? h / 2 : radius);
+                    }}
+                    const transform = `translate(${{box.x.toFixed(1)}} ${{box.y.toFixed(1)}})`;
+                    element.id = box.id;
+                    element.setAttribute('class', 'svg-node svg-node-' + box.type);
+                    element.setAttribute('transform', transform);
+                    element.setAttribute('aria-label', box.text);
+                    if (box.description) {{
+                        element.setAttribute('data-description', box.description);
+                    }} else {{
+                        element.removeAttribute('data-description');
+                    }}
+                    element.label.setAttribute('class', 'node-label node-label-' + box.type);
+                    element.label.setAttribute('transform', transform);
+                    writeSvgLabel(element.label, box);
+                    chart.nodesGroup.append(element, element.label);
+                    chart.mountedNodes.set(box.id, element);
+                }},
+
+                unmountNode(chart, id) {{
+                    const element = chart.mountedNodes.get(id);
+                    chart.mountedNodes.delete(id);
+                    element.remove();
+                    element.label.remove();
+                    chart.nodePool[chart.nodes.get(id).decision ? 'decision' : 'box'].push(element);
+                }},
+
+                mountEdge(chart, edge) {{
+                    const path = chart.edgePool.pop() || svgElement('path');
+                    path.setAttribute('class', 'svg-edge ' + chart.graph.style);
+                    const mounted = {{ path: path, label: null }};
+                    chart.edgesGroup.appendChild(path);
+                    if (edge.label) {{
+                        const label = chart.labelPool.pop() || svgElement('text');
+                        label.setAttribute('class', 'svg-label ' + (edge.label === 'Yes' ? 'yes' : 'no'));
+                        label.textContent = edge.label;
+                        chart.edgesGroup.appendChild(label);
+                        mounted.label = label;
+                    }}
+                    placeSvgEdge(chart, edge, mounted.path, mounted.label);
+                    chart.mountedEdges.set(edge.index, mounted);
+                }},
+
+                unmountEdge(chart, index) {{
+                    const mounted = chart.mountedEdges.get(index);
+                    chart.mountedEdges.delete(index);
+                    mounted.path.remove();
+                    chart.edgePool.push(mounted.path);
+                    if (mounted.label) {{
+                        mounted.label.remove();
+                        chart.labelPool.push(mounted.label);
+                    }}
+                }},
+
+                // Diff what the grid says is visible against what is mounted
+                updateViewport(chart) {{
+                    const bounds = VIRTUAL_BACKEND.visibleBounds(chart);
+                    if (!bounds) return;
+                    const nodeIds = queryCells(chart.nodeCells, bounds,
+                                               id => intersects(boxBounds(chart.nodes.get(id)), bounds));
+                    const edgeIndexes = queryCells(chart.edgeCells, bounds,
+                                                   index => intersects(edgeBounds(chart, chart.edges[index]), bounds));
+                    chart.wideEdges.forEach(index => {{
+                        if (intersects(edgeBounds(chart, chart.edges[index]), bounds)) edgeIndexes.add(index);
+                    }});
+                    // The node being dragged keeps its element even off screen
+                    if (chart.pinned) nodeIds.add(chart.pinned);
+
+                    [...chart.mountedNodes.keys()].forEach(id => {{
+                        if (!nodeIds.has(id)) VIRTUAL_BACKEND.unmountNode(chart, id);
+                    }});
+                    [...chart.mountedEdges.keys()].forEach(index => {{
+                        if (!edgeIndexes.has(index)) VIRTUAL_BACKEND.unmountEdge(chart, index);
+                    }});
+                    nodeIds.forEach(id => {{
+                        if (!chart.mountedNodes.has(id)) VIRTUAL_BACKEND.mountNode(chart, chart.nodes.get(id));
+                    }});
+                    edgeIndexes.forEach(index => {{
+                        if (!chart.mountedEdges.has(index)) VIRTUAL_BACKEND.mountEdge(chart, chart.edges[index]);
+                    }});
+                }},
+
+                moveNode(chart, id, x, y) {{
+                    const box = chart.nodes.get(id);
+                    box.x = x;
+                    box.y = y;
+                    const element = chart.mountedNodes.get(id);
+                    if (element) {{
+                        const transform = `translate(${{x.toFixed(1)}} ${{y.toFixed(1)}})`;
+                        element.setAttribute('transform', transform);
+                        element.label.setAttribute('transform', transform);
+                    }}
+                    VIRTUAL_BACKEND.indexNode(chart, box);
+                    chart.edgesByNode.get(id).forEach(edge => {{
+                        VIRTUAL_BACKEND.indexEdge(chart, edge);
+                        const mounted = chart.mountedEdges.get(edge.index);
+                        if (mounted) placeSvgEdge(chart, edge, mounted.path, mounted.label);
+                    }});
+                    chart.viewportDirty = true;
+                }},
+
+                resetLayout(chart) {{
+                    chart.initialBoxes.forEach((position, id) => VIRTUAL_BACKEND.moveNode(chart, id, position.x, position.y));
+                }},
+
+                // Dragging a node moves it; dragging anywhere else on the chart pans the view
+                pointerDown(chart, e) {{
+                    const node = e.target.closest('.svg-node');
+                    if (node) {{
+                        chart.pinned = node.id;
+                        const drag = svgNodeSession(chart, node.id, e, VIRTUAL_BACKEND.moveNode);
+                        return {{
+                            move: drag.move,
+                            end() {{
+                                drag.end();
+                                chart.pinned = null;
+                                chart.viewportDirty = true;
+                                requestFrame(chart);
+                            }}
+                        }};
+                    }}
+                    const originX = chart.x, originY = chart.y;
+                    return {{
+                        move(pointer) {{
+                            // translate() sits inside scale(), so screen distances shrink by the zoom
+                            chart.x = originX + (pointer.clientX - e.clientX) / chart.scale;
+                            chart.y = originY + (pointer.clientY - e.clientY) / chart.scale;
+                            updateTransform(chart);
+                        }},
+                        end() {{}}
+                    }};
+                }}
+            }};
+
+            const BACKENDS = {{ html: HTML_BACKEND, svg: SVG_BACKEND, virtual: VIRTUAL_BACKEND }};
+
+            // Show a node's description next to it
+            function showTooltip(chart, node) {{
+                const description = node.getAttribute('data-description');
+                if (!description) return;
+
+                // Split description into paragraphs, styling the key terms that start them
+                const paragraphs = description.split(/(?=Purpose:|Implementation:|Technical details:|Best practices:|Common issues:)/g);
+                let htmlContent = `<div class="tooltip-content">`;
+                // SVG nodes are bare shapes that keep their text in aria-label
+                htmlContent += `<div class="tooltip-title">${{node.getAttribute('aria-label') || node.textContent.trim()}}</div>`;
+                htmlContent += `<div class="tooltip-description">`;
+                paragraphs.forEach(para => {{
+                    if (para.trim()) {{
+                        let formattedPara = para;
+                        TOOLTIP_TERMS.forEach(term => {{
+                            if (formattedPara.startsWith(term)) {{
+                                formattedPara = formattedPara.replace(term, `<span class="tooltip-heading">${{term}}</span>`);
+                            }}
+                        }});
+                        htmlContent += `<p class="tooltip-paragraph">${{formattedPara}}</p>`;
+                    }}
+                }});
+                htmlContent += `</div></div>`;
+
+                const tooltip = chart.tooltip;
+                tooltip.innerHTML = htmlContent;
+                tooltip.classList.add('visible');
+
+                // Above the node, or below it when there's no room, kept inside the chart
+                const rect = node.getBoundingClientRect();
+                const chartRect = chart.root.getBoundingClientRect();
+                let top = rect.top - chartRect.top - tooltip.offsetHeight - 10;
+                let left = rect.left - chartRect.left + (rect.width / 2) - (tooltip.offsetWidth / 2);
+                if (top < 0) {{
+                    top = rect.bottom - chartRect.top + 10;
+                }}
+                if (left < 10) {{
+                    left = 10;
+                }} else if (left + tooltip.offsetWidth > chartRect.width - 10) {{
+                    left = chartRect.width - tooltip.offsetWidth - 10;
+                }}
+                tooltip.style.top = `${{top}}px`;
+                tooltip.style.left = `${{left}}px`;
+            }}
+
+            function register(chartId) {{
+                const root = document.getElementById(chartId);
+                if (!root || charts.has(chartId)) return charts.get(chartId);
+                const chart = {{
+                    id: chartId,
+                    root: root,
+                    backend: BACKENDS[root.dataset.flowchart],
+                    container: root.querySelector('.flowchart-container'),
+                    tooltip: root.querySelector('.tooltip'),
+                    scale: parseFloat(root.dataset.zoom) || 1.0,
+                    x: 0,
+                    y: 0,
+                    dark: false,
+                    transformDirty: false,
+                    viewportDirty: false,
+                    frameRequested: false
+                }};
+                charts.set(chartId, chart);
+                chart.backend.init(chart);
+                return chart;
+            }}
+
+            function endSession() {{
+                if (!session) return;
+                const ending = session;
+                session = null;
+                if (ending.pointer) ending.move(ending.pointer);
+                ending.end();
+            }}
+
+            // One set of delegated listeners serves every chart on the page
+            document.addEventListener('click', e => {{
+                const button = e.target.closest && e.target.closest('[data-action]');
+                const chart = chartFor(button);
+                if (chart && ACTIONS[button.dataset.action]) ACTIONS[button.dataset.action](chart);
+            }});
+
+            document.addEventListener('pointerdown', e => {{
+                if (e.button !== 0 || session) return;
+                const chart = chartFor(e.target);
+                if (!chart || e.target.closest('.controls, .navigation-controls')) return;
+                const started = chart.backend.pointerDown(chart, e);
+                if (!started) return;
+                session = Object.assign(started, {{ chart: chart, pointer: null }});
+                e.preventDefault();
+            }});
+
+            // Pointer input only records where the pointer is; the chart is redrawn once per frame
+            document.addEventListener('pointermove', e => {{
+                if (!session) return;
+                session.pointer = {{ clientX: e.clientX, clientY: e.clientY }};
+                requestFrame(session.chart);
+            }});
+
+            document.addEventListener('pointerup', endSession);
+            document.addEventListener('pointercancel', endSession);
+
+            document.addEventListener('mouseover', e => {{
+                const node = e.target.closest && e.target.closest('.node, .svg-node');
+                const chart = chartFor(node);
+                if (chart && !(e.relatedTarget && node.contains(e.relatedTarget))) showTooltip(chart, node);
+            }});
+
+            document.addEventListener('mouseout', e => {{
+                const node = e.target.closest && e.target.closest('.node, .svg-node');
+                const chart = chartFor(node);
+                if (chart && !(e.relatedTarget && node.contains(e.relatedTarget))) chart.tooltip.classList.remove('visible');
+            }});
+
+            // Virtualized charts re-cull when the page scrolls or resizes
+            const recull = () => charts.forEach(chart => {{
+                if (chart.backend.updateViewport) {{
+                    chart.viewportDirty = true;
+                    requestFrame(chart);
+                }}
+            }});
+            window.addEventListener('scroll', recull, {{ passive: true }});
+            // Icon glyphs can only be read once Font Awesome's stylesheet has loaded
+            window.addEventListener('load', () => charts.forEach(chart => {{
+                if (chart.svg) fillIcons(chart.svg);
+            }}));
+            window.addEventListener('resize', recull);
+
+            window.flowchartRuntime = {{ version: version, register: register, charts: charts }};
+        }})({version});
+    </script>"""
+
+RUNTIME_SCRIPT = RUNTIME_SCRIPT_TEMPLATE.format(
+    version=RUNTIME_VERSION,
+    label_layout=json.dumps({"metrics": LABEL_METRICS, "lineHeight": LABEL_LINE_HEIGHT, "iconGap": LABEL_ICON_GAP,
+                             "charWidth": LABEL_CHAR_WIDTH}))
+
+# SVG backend: one <path> per edge, real polygons for decisions; edges come first so nodes sit on top
+SVG_OPEN_TEMPLATE = """<svg class="flowchart-svg" xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}">
+                <defs>
+                    <marker id="{chart_id}-arrow" viewBox="0 0 10 10" refX="9" refY="5" markerWidth="8" markerHeight="8" orient="auto">
+                        <path class="arrow-head" d="M0,0 L10,5 L0,10 z"/>
+                    </marker>
+                </defs>
+                <g class="svg-edges" marker-end="url(#{chart_id}-arrow)">"""
+
+# Edges inherit marker-end from their group, so these fragments don't depend on the chart id
+SVG_EDGE_TEMPLATE = """
+                    <path id="{conn_id}" class="svg-edge {style}" data-source="{source_id}" data-target="{target_id}" d="{d}"/>"""
+
+SVG_LABEL_TEMPLATE = """
+                    <text class="svg-label {label_class}" data-connector-id="{conn_id}" x="{x:.1f}" y="{y:.1f}">{label_text}</text>"""
+
+# A node is its shape, which carries the id, data and events, followed by its <text> label: no group or
+# foreignObject, so each node costs two or three elements
+SVG_NODE_ATTRIBUTES = 'id="{id}" class="svg-node svg-node-{type}" transform="translate({x:.1f} {y:.1f})" data-x="{x:.1f}" data-y="{y:.1f}" data-width="{width}" data-height="{height}" aria-label="{label}" {description_attr}'
+
+SVG_NODE_TEMPLATE = """
+                    {shape}<text class="node-label node-label-{type}" transform="translate({x:.1f} {y:.1f})" x="{center_x:.1f}" y="{first_y:.1f}">{lines}{icon}</text>"""
+
+SVG_LINE_TEMPLATE = '<tspan x="{center_x:.1f}" y="{y:.1f}">{text}</tspan>'
+
+# The glyph is filled in by the runtime from Font Awesome's own stylesheet (see iconGlyph)
+SVG_ICON_TEMPLATE = '<tspan class="node-icon" data-icon="{icon}" x="{center_x:.1f}" y="{y:.1f}"></tspan>'
+
+SVG_RECT_TEMPLATE = '<rect {attributes} width="{width}" height="{height}" rx="{radius}"/>'
+
+SVG_DIAMOND_TEMPLATE = '<polygon {attributes} points="{half_width},0 {width},{half_height} {half_width},{height} 0,{half_height}"/>'
+
+SVG_NODES_GROUP = """
+                </g>
+                <g class="svg-nodes">"""
+
+SVG_CLOSE = """
+                </g>
+            </svg>"""
+
+# Corner radius for each theme shape; pills round off to half the node height
+SVG_CORNER_RADIUS = {"rounded": 8, "rectangle": 2}
+
+def svg_corner_radius(shape_name, height):
+    return SVG_CORNER_RADIUS.get(shape_name, height / 2)
+
+# Virtualized backend: empty SVG groups plus the graph as JSON; the client mounts what is in view
+VIRTUAL_NODES_GROUP = """</g>
+                <g class="svg-nodes virtual">"""
+
+VIRTUAL_GRAPH_TEMPLATE = """
+            <script type="application/json" class="flowchart-graph">{graph}</script>"""
+
+# Function to draw an edge as an SVG path (straight, or an S-curve for the "curved" style)
+def svg_edge_path(source_x, source_y, target_x, target_y, curved=False):
+    if not curved:
+        return f"M{source_x:.1f},{source_y:.1f} L{target_x:.1f},{target_y:.1f}"
+    if abs(target_x - source_x) >= abs(target_y - source_y):
+        mid_x = (source_x + target_x) / 2
+        return (f"M{source_x:.1f},{source_y:.1f} C{mid_x:.1f},{source_y:.1f} "
+                f"{mid_x:.1f},{target_y:.1f} {target_x:.1f},{target_y:.1f}")
+    mid_y = (source_y + target_y) / 2
+    return (f"M{source_x:.1f},{source_y:.1f} C{source_x:.1f},{mid_y:.1f} "
+            f"{target_x:.1f},{mid_y:.1f} {target_x:.1f},{target_y:.1f}")
+
+# Function to render the SVG for one node
+def render_svg_node_fragment(node_info, theme):
+    """Node group, memoised on its layout entry like render_node_fragment"""
+    node = node_info["node"]
+    shape_name = theme["node_styles"].get(node["type"], theme["node_styles"]["process"])["shape"]
+    fragments = node_info.setdefault("fragments", {})
+    key = ("svg-node", theme["icons"], shape_name)
+    if key in fragments:
+        return fragments[key]
+    
+    width = node_info["width"]
+    height = node_info["height"]
+    x, y = node_info["x"], node_info["y"]
+    description = node.get("description", "")
+    description_attr = f'data-description="{description}"' if description else ''
+    attributes = SVG_NODE_ATTRIBUTES.format(id=node["id"], type=node["type"], x=x, y=y, width=width, height=height,
+                                            label=escape(node["text"]), description_attr=description_attr)
+    if node["type"] == "decision":
+        shape = SVG_DIAMOND_TEMPLATE.format(attributes=attributes, width=width, height=height, half_width=width / 2,
+                                            half_height=height / 2)
+    else:
+        shape = SVG_RECT_TEMPLATE.format(attributes=attributes, width=width, height=height,
+                                         radius=svg_corner_radius(shape_name, height))
+    
+    icon = get_icon_for_node(node) if theme["icons"] else ""
+    lines, icon_y, line_ys = svg_label_layout(node["text"], node["type"], width, height, icon)
+    center_x = width / 2
+    # The first line is the <text> element's own content; the rest are positioned <tspan>s
+    html = SVG_NODE_TEMPLATE.format(
+        shape=shape, type=node["type"], x=x, y=y, center_x=center_x, first_y=line_ys[0] if lines else icon_y,
+        lines="".join([escape(lines[0])] + [SVG_LINE_TEMPLATE.format(center_x=center_x, y=line_y, text=escape(line))
+                                    for line, line_y in zip(lines[1:], line_ys[1:])]) if lines else "",
+        icon=SVG_ICON_TEMPLATE.format(icon=icon, center_x=center_x, y=icon_y) if icon else "")
+    fragments[key] = html
+    return html
+
+# Function to render the SVG for one connection (and its decision label)
+def render_svg_connection_fragment(source_info, target_info, theme):
+    """Edge path, memoised on the source's layout entry like render_connection_fragment"""
+    source_node = source_info["node"]
+    target_id = target_info["node"]["id"]
+    
+    label_text = decision_label(source_node, target_id)
+    style = theme["connector"]["style"]
+    key = ("svg-connection", target_id, target_info["x"], target_info["y"], target_info["node"]["type"],
+           label_text, style)
+    fragments = source_info.setdefault("fragments", {})
+    if key in fragments:
+        return fragments[key]
+    
+    source_x, source_y, target_x, target_y = calculate_connector_points(source_info, target_info)
+    conn_id = f"conn-{source_node['id']}-{target_id}"
+    html = SVG_EDGE_TEMPLATE.format(conn_id=conn_id, style=style, source_id=source_node["id"],
+                                    target_id=target_id,
+                                    d=svg_edge_path(source_x, source_y, target_x, target_y, style == "curved"))
+    if label_text is not None:
+        html += SVG_LABEL_TEMPLATE.format(label_class="yes" if label_text == "Yes" else "no", conn_id=conn_id,
+                                          x=(source_x + target_x) / 2, y=(source_y + target_y) / 2,
+                                          label_text=label_text)
+    fragments[key] = html
+    return html
+
+# Function to serialise a layout for the virtualized backend
+def flowchart_graph_json(layout, theme):
+    """Compact JSON graph: nodes as [id, type, x, y, width, height, text, icon, description]
+    rows and edges as [source index, target index, decision label] rows.
+
+    `radius` maps node types to their corner radius (null for pills, which
+    round off to half the node height) and `style` is the connector style.
+    """
+    index = {}
+    nodes = []
+    for position, node_info in enumerate(layout):
+        node = node_info["node"]
+        index[node["id"]] = position
+        nodes.append([node["id"], node["type"], round(node_info["x"], 1), round(node_info["y"], 1),
+                      node_info["width"], node_info["height"], node["text"],
+                      get_icon_for_node(node) if theme["icons"] else "", node.get("description", "")])
+    edges = [[index[source_info["node"]["id"]], index[target_info["node"]["id"]],
+              decision_label(source_info["node"], target_info["node"]["id"])]
+             for source_info, target_info in layout.edges()]
+    radius = {node_type: SVG_CORNER_RADIUS.get(style["shape"])
+              for node_type, style in theme["node_styles"].items()}
+    graph = {"style": theme["connector"]["style"], "radius": radius, "nodes": nodes, "edges": edges}
+    # "<" is escaped so node text can never close the <script> element it sits in
+    return json.dumps(graph, separators=(",", ":")).replace("<", "\\u003c")
+
+# Function to stream the HTML/CSS for the flowchart
+def iter_flowchart_html(flowchart_data, theme_key, orientation="landscape", zoom_level=1.0, layout=None,
+                        include_stylesheet=True, backend="html", include_runtime=True):
+    """Yield the chart HTML in chunks, one per fragment, so large charts can be
+    written out (or joined) without building intermediate strings.
+
+    The theme stylesheet is left out when `include_stylesheet` is False, and
+    the client runtime when `include_runtime` is False, so a page showing
+    several charts can send each once (see generate_flowcharts_html); the
+    chart itself only carries its markup and a call registering it with the
+    runtime.
+    `backend` picks how the graph is drawn: "html" positions a div per node
+    and per connector, "svg" draws one inline SVG, and "virtual" sends the
+    graph as JSON for the client to mount only what is in view (see
+    RENDER_BACKENDS).
+    """
+    # Generate unique IDs for this flowchart
+    chart_id = f"flowchart-{uuid.uuid4().hex[:8]}"
+    
+    # Get the selected theme
+    theme = DESIGN_THEMES[theme_key]
+    
+    # Calculate layout based on orientation (edits pass in an incrementally updated one)
+    if layout is None:
+        layout = calculate_layout(flowchart_data["nodes"], orientation)
+    elif not isinstance(layout, Layout):
+        layout = Layout(layout)
+    
+    if backend not in RENDER_BACKENDS:
+        raise ValueError(f"Unknown render backend: {backend!r}")
+    
+    # Set container dimensions based on orientation
+    container_width = 900 if orientation == "landscape" else 650
+    container_height = 650 if orientation == "landscape" else 900
+    
+    yield CHART_OPEN_TEMPLATE.format(
+        # Shared per theme; scoped by class, so it doesn't depend on this chart's id
+        css=get_theme_stylesheet(theme_key) if include_stylesheet else "",
+        chart_id=chart_id,
+        scope_class=theme_scope_class(theme_key),
+        container_width=container_width,
+        container_height=container_height,
+        zoom_level=zoom_level,
+        backend=backend,
+    )
+    
+    if backend == "svg":
+        yield SVG_OPEN_TEMPLATE.format(chart_id=chart_id, width=container_width, height=container_height)
+        for source_info, target_info in layout.edges():
+            yield render_svg_connection_fragment(source_info, target_info, theme)
+        yield SVG_NODES_GROUP
+        for node_info in layout:
+            yield render_svg_node_fragment(node_info, theme)
+        yield SVG_CLOSE
+    elif backend == "virtual":
+        yield SVG_OPEN_TEMPLATE.format(chart_id=chart_id, width=container_width, height=container_height)
+        yield VIRTUAL_NODES_GROUP
+        yield SVG_CLOSE
+        yield VIRTUAL_GRAPH_TEMPLATE.format(graph=flowchart_graph_json(layout, theme))
+    else:
+        # First all nodes
+        for node_info in layout:
+            yield render_node_fragment(node_info, theme)
+        yield "\n            "
+        
+        # Then all connections, straight from the layout's adjacency lists
+        for source_info, target_info in layout.edges():
+            yield render_connection_fragment(source_info, target_info, theme)
+    
+    yield "\n        </div>\n        "
+    yield CONTROLS_TEMPLATE.format(chart_id=chart_id, zoom_percent=int(zoom_level * 100))
+    if include_runtime:
+        yield RUNTIME_SCRIPT
+    yield CHART_REGISTER_TEMPLATE.format(chart_id=chart_id)
+    yield CHART_CLOSE
+
+# Function to generate HTML/CSS for the flowchart
+def generate_flowchart_html(flowchart_data, theme_key, orientation="landscape", zoom_level=1.0, layout=None,
+                            include_stylesheet=True, backend="html", include_runtime=True):
+    """The whole chart as one string (see iter_flowchart_html)"""
+    return "".join(iter_flowchart_html(flowchart_data, theme_key, orientation, zoom_level, layout,
+                                       include_stylesheet, backend, include_runtime))
+
+# Several charts on one page: each theme's stylesheet and the runtime are sent once, ahead of the charts
+def generate_flowcharts_html(charts, orientation="landscape", backend="html"):
+    """HTML for a list of (flowchart_data, theme_key) pairs"""
+    theme_keys = list(dict.fromkeys(theme_key for _, theme_key in charts))
+    parts = [get_theme_stylesheet(theme_key) for theme_key in theme_keys]
+    parts.append(RUNTIME_SCRIPT)
+    parts += [generate_flowchart_html(flowchart_data, theme_key, orientation, include_stylesheet=False,
+                                      backend=backend, include_runtime=False)
+              for flowchart_data, theme_key in charts]
+    return "\n".join(parts)
+
+# Standalone page around exported charts
+EXPORT_DOCUMENT_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Flowchart</title>
+    {head}
+</head>
+<body style="margin: 0; padding: 20px; background-color: #f5f5f5;">
+{body}
+</body>
+</html>"""
+
+WEB_FONT_LINKS = f"""<link href="{GOOGLE_FONTS_URL}" rel="stylesheet">
+    <link rel="stylesheet" href="{FONT_AWESOME_URL}">"""
+
+# Function to wrap chart HTML in a complete document
+def export_document(chart_html, head=WEB_FONT_LINKS):
+    return EXPORT_DOCUMENT_TEMPLATE.format(head=head, body=chart_html)
+
+# Download formats: label, file name and MIME type
+EXPORT_FORMATS = {
+    "html": ("HTML", "flowchart.html", "text/html"),
+    "minified": ("Minified HTML", "flowchart.min.html", "text/html"),
+    "gzip": ("Minified HTML, gzip (.html.gz)", "flowchart.html.gz", "application/gzip"),
+}
+
+# Function to drop the indentation and blank lines the templates carry; line breaks stay, so scripts parse the same
+def minify_html(html):
+    return re.sub(r"\n\s+", "\n", html).strip()
+
+# Function to encode a document for download in one of EXPORT_FORMATS
+def export_bytes(document, export_format="html"):
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {export_format!r}")
+    if export_format == "html":
+        return document.encode()
+    data = minify_html(document).encode()
+    # mtime=0 keeps the archive identical for identical charts
+    return gzip.compress(data, mtime=0) if export_format == "gzip" else data
+
+# Function to render a chart as a downloadable page
+def generate_export_html(flowchart_data, theme_key, orientation="landscape", backend="html", layout=None,
+                         offline=False):
+    """The chart as a complete HTML document.
+
+    Offline documents make no network requests: instead of importing every
+    theme font and all of Font Awesome, they inline the theme's own font,
+    subset to the characters the chart uses, and only the icon glyphs it can
+    show (see offline_assets for where the local files come from).
+    """
+    if not offline:
+        return export_document(generate_flowchart_html(flowchart_data, theme_key, orientation, layout=layout,
+                                                       backend=backend))
+    
+    theme = DESIGN_THEMES[theme_key]
+    nodes = flowchart_data["nodes"]
+    family = theme_font_family(theme)
+    icons = set(CONTROL_ICONS)
+    if theme["icons"]:
+        icons.update(get_icon_for_node(node) for node in nodes)
+    text = "".join(node["text"] + node.get("description", "") for node in nodes)
+    
+    head = f"<style>{offline_font_css(family, THEME_FONT_WEIGHTS.get(family, (400,)), text, icons)}</style>"
+    body = get_theme_stylesheet(theme_key, web_fonts=False) + generate_flowchart_html(
+        flowchart_data, theme_key, orientation, layout=layout, include_stylesheet=False, backend=backend)
+    return export_document(body, head)
+
+# Function to list what an offline export in a theme would have to leave out
+def missing_offline_assets(theme_key):
+    """Local font and icon files an offline export in this theme needs but can't find"""
+    family = theme_font_family(DESIGN_THEMES[theme_key])
+    return missing_assets(family, THEME_FONT_WEIGHTS.get(family, (400,)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a flowchart JSON file to standalone HTML")
+    parser.add_argument("flowchart", help='JSON file with a "nodes" list')
+    parser.add_argument("-o", "--output", help="HTML file to write (default: stdout)")
+    parser.add_argument("--theme", default="modern", choices=sorted(DESIGN_THEMES))
+    parser.add_argument("--orientation", default="landscape", choices=["landscape", "portrait"])
+    parser.add_argument("--backend", default="html", choices=sorted(RENDER_BACKENDS))
+    parser.add_argument("--offline", action="store_true",
+                        help="write a complete page that embeds its fonts and icons and loads nothing from the network")
+    args = parser.parse_args()
+
+    with open(args.flowchart, encoding="utf-8") as f:
+        flowchart_data = json.load(f)
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        if args.offline:
+            out.write(generate_export_html(flowchart_data, args.theme, args.orientation, args.backend, offline=True))
+        else:
+            out.writelines(iter_flowchart_html(flowchart_data, args.theme, args.orientation, backend=args.backend))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import bisect
+import concurrent.futures
+import math
+import threading
+import time
+from collections import deque
+
+# Histogram bucket upper bounds in seconds: 50ms growing by 1.5x up to ~3 minutes
+LATENCY_BUCKETS = tuple(round(0.05 * 1.5 ** i, 3) for i in range(21))
+DEFAULT_HEDGE_PERCENTILE = 90
+# Hedges may add at most this many extra calls per 100 requests
+DEFAULT_HEDGE_BUDGET_PERCENT = 10
+# Don't trust a percentile computed from fewer samples than this
+MIN_SAMPLES = 20
+# Never hedge sooner than this, however fast recent calls were
+MIN_HEDGE_DELAY = 0.5
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram plus a window of recent samples for percentiles"""
+
+    def __init__(self, window=500):
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self._recent = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds):
+        with self._lock:
+            self._counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            self._recent.append(seconds)
+            self.count += 1
+            self.total += seconds
+
+    def percentile(self, p):
+        """p-th percentile (0-100) of recent samples, or None if there are none"""
+        with self._lock:
+            samples = sorted(self._recent)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, math.ceil(p / 100 * len(samples)) - 1))
+        return samples[index]
+
+    def buckets(self):
+        """List of (upper bound in seconds, count); the last bound is infinity"""
+        with self._lock:
+            counts = list(self._counts)
+        return list(zip(LATENCY_BUCKETS + (math.inf,), counts))
+
+    def sample_count(self):
+        with self._lock:
+            return len(self._recent)
+
+    def clear(self):
+        with self._lock:
+            self._counts = [0] * (len(LATENCY_BUCKETS) + 1)
+            self._recent.clear()
+            self.count = 0
+            self.total = 0.0
+
+
+class HedgedRequester:
+    """Send a duplicate request when the first one is slower than usual.
+
+    `run(attempt)` starts `attempt(cancel_event)` and, if it hasn't
+    finished within the tracked percentile of recent latencies, starts a
+    second copy. The first to succeed wins and the other is told to stop
+    through its cancel event. Hedges are budgeted: they can never exceed
+    `budget_percent` extra calls per 100 requests.
+    """
+
+    def __init__(self, percentile=DEFAULT_HEDGE_PERCENTILE, budget_percent=DEFAULT_HEDGE_BUDGET_PERCENT,
+                 max_workers=16):
+        self.percentile = percentile
+        self.budget_percent = budget_percent
+        self.histogram = LatencyHistogram()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                               thread_name_prefix="hedge")
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.budget_denied = 0
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging, or None while there is too little history"""
+        if self.histogram.sample_count() < MIN_SAMPLES:
+            return None
+        return max(MIN_HEDGE_DELAY, self.histogram.percentile(self.percentile))
+
+    def _take_budget(self, budget_percent):
+        with self._lock:
+            if self.hedges + 1 > self.requests * budget_percent / 100:
+                self.budget_denied += 1
+                return False
+            self.hedges += 1
+            return True
+
+    def _refund_budget(self):
+        with self._lock:
+            self.hedges -= 1
+
+    def _timed(self, attempt, cancel_event):
+        start = time.monotonic()
+        result = attempt(cancel_event)
+        return result, time.monotonic() - start
+
+    def run(self, attempt, can_hedge=None, budget_percent=None):
+        """Run `attempt(cancel_event)`, hedging it if it is slow.
+
+        `can_hedge()` is consulted right before a hedge is sent (e.g. to
+        check rate limits) and may veto it. Raises the first error if every
+        attempt fails.
+        """
+        budget_percent = self.budget_percent if budget_percent is None else budget_percent
+        with self._lock:
+            self.requests += 1
+
+        cancels = {}
+        primary_cancel = threading.Event()
+        primary = self._executor.submit(self._timed, attempt, primary_cancel)
+        cancels[primary] = primary_cancel
+
+        delay = self.hedge_delay()
+        if delay is not None and budget_percent > 0:
+            done, _ = concurrent.futures.wait([primary], timeout=delay)
+            if not done and self._take_budget(budget_percent):
+                if can_hedge is None or can_hedge():
+                    hedge_cancel = threading.Event()
+                    cancels[self._executor.submit(self._timed, attempt, hedge_cancel)] = hedge_cancel
+                else:
+                    self._refund_budget()
+
+        pending = set(cancels)
+        error = None
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result, elapsed = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                # Stop the slower copy; it gives up at its next chunk
+                for other in pending:
+                    cancels[other].set()
+                    other.cancel()
+                self.histogram.record(elapsed)
+                if future is not primary:
+                    with self._lock:
+                        self.hedge_wins += 1
+                return result
+        raise error
+
+    def get_stats(self):
+        with self._lock:
+            stats = {
+                "requests": self.requests,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "budget_denied": self.budget_denied,
+            }
+        stats["samples"] = self.histogram.count
+        for p in (50, 90, 99):
+            stats[f"p{p}"] = self.histogram.percentile(p)
+        stats["hedge_delay"] = self.hedge_delay()
+        return stats
+
+
+# Process-wide requester so the latency history is shared across sessions
+_requester = None
+_requester_lock = threading.Lock()
+
+
+def get_hedged_requester():
+    """Return the shared HedgedRequester, creating it on first use"""
+    global _requester
+    with _requester_lock:
+        if _requester is None:
+            _requester = HedgedRequester()
+        return _requester
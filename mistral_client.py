@@ -0,0 +1,244 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from circuit_breaker import CircuitBreaker
+
+logger = logging.getLogger("AskFlowChart")
+
+DEFAULT_API_URL = "https://api.mistral.ai/v1/chat/completions"
+# Override to point the app at another endpoint, e.g. fake_mistral_server.py
+API_URL_ENV_VAR = "MISTRAL_API_URL"
+
+# Status codes that are worth retrying: rate limiting and server-side failures
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class MistralAPIError(Exception):
+    """Raised when the Mistral API call fails after all retries"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class RequestCancelledError(MistralAPIError):
+    """Raised when a completion is abandoned through its cancel event"""
+
+
+class MistralClient:
+    """Pooled, keep-alive HTTP client for the Mistral chat-completions API.
+
+    One instance is shared by every Streamlit session. The underlying
+    urllib3 connection pool is thread-safe, and the session carries no
+    per-user state (the API key is sent per request), so concurrent calls
+    reuse warm TLS connections instead of opening a new one each time.
+    """
+
+    def __init__(self, api_url=DEFAULT_API_URL, connect_timeout=5.0, read_timeout=60.0,
+                 max_retries=3, backoff_base=0.5, backoff_max=8.0, pool_size=10, breaker=None):
+        self.api_url = api_url
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # Fails calls fast while the API is down instead of letting each one time out
+        self.breaker = breaker or CircuitBreaker()
+
+        self.session = requests.Session()
+        # Retries are handled below so they can be jittered and counted
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._stats_lock = threading.Lock()
+        self._stats = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats():
+        return {
+            "requests": 0,
+            "attempts": 0,
+            "retries": 0,
+            "retries_429": 0,
+            "retries_5xx": 0,
+            "retries_connection": 0,
+            "failures": 0,
+        }
+
+    def _count(self, *names):
+        with self._stats_lock:
+            for name in names:
+                self._stats[name] += 1
+
+    def get_stats(self):
+        """Return a snapshot of the request and retry counters"""
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats = self._empty_stats()
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """Full-jitter exponential backoff, honouring a Retry-After header if present"""
+        if retry_after is not None:
+            try:
+                return min(self.backoff_max, max(0.0, float(retry_after)))
+            except (TypeError, ValueError):
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def post(self, api_key, payload, stream=False):
+        """POST a chat-completions payload, retrying 429/5xx and connection failures.
+
+        Returns the successful `requests.Response`. Read timeouts are not
+        retried so a stuck upstream cannot hold a thread for longer than
+        `read_timeout`. Raises CircuitOpenError without calling the API while
+        the circuit breaker is open.
+        """
+        self.breaker.before_call()
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}"
+        }
+        body = json.dumps(payload)
+        self._count("requests")
+
+        attempt = 0
+        while True:
+            self._count("attempts")
+            try:
+                response = self.session.post(
+                    self.api_url,
+                    headers=headers,
+                    data=body,
+                    timeout=(self.connect_timeout, self.read_timeout),
+                    stream=stream
+                )
+            except requests.ConnectionError as e:
+                if attempt >= self.max_retries:
+                    self._count("failures")
+                    self.breaker.record_failure()
+                    raise MistralAPIError(f"Connection to Mistral API failed: {str(e)}") from e
+                delay = self.backoff_delay(attempt)
+                self._count("retries", "retries_connection")
+                logger.warning(f"Mistral API connection error, retrying in {delay:.2f}s: {str(e)}")
+            except requests.exceptions.Timeout as e:
+                self._count("failures")
+                self.breaker.record_failure()
+                raise MistralAPIError(f"Mistral API request timed out: {str(e)}") from e
+            except requests.RequestException as e:
+                # Anything else (too many redirects, a broken chunked body...) still settles a
+                # half-open probe, or the breaker would wait on it forever
+                self._count("failures")
+                self.breaker.record_failure()
+                raise MistralAPIError(f"Mistral API request failed: {str(e)}") from e
+            else:
+                if response.status_code < 400:
+                    self.breaker.record_success()
+                    return response
+
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+                    self._count("failures")
+                    if response.status_code >= 500:
+                        self.breaker.record_failure()
+                    else:
+                        # The API answered (bad key, rate limit...): it is up
+                        self.breaker.record_success()
+                    message = f"Mistral API returned HTTP {response.status_code}: {response.text[:200]}"
+                    response.close()
+                    raise MistralAPIError(message, status_code=response.status_code)
+
+                delay = self.backoff_delay(attempt, response.headers.get("Retry-After"))
+                if response.status_code == 429:
+                    self._count("retries", "retries_429")
+                else:
+                    self._count("retries", "retries_5xx")
+                logger.warning(f"Mistral API returned HTTP {response.status_code}, retrying in {delay:.2f}s")
+                response.close()
+
+            time.sleep(delay)
+            attempt += 1
+
+    def chat_completion(self, api_key, payload):
+        """Run a non-streaming chat completion and return the decoded JSON body"""
+        response = self.post(api_key, payload)
+        try:
+            return response.json()
+        except ValueError as e:
+            raise MistralAPIError(f"Mistral API returned invalid JSON: {str(e)}") from e
+
+    def stream_chat_completion(self, api_key, payload):
+        """Run a streaming chat completion and yield content deltas as they arrive.
+
+        Speaks the server-sent events protocol used by the chat-completions
+        API: one `data: {...}` line per chunk, terminated by `data: [DONE]`.
+        """
+        payload = dict(payload, stream=True)
+        response = self.post(api_key, payload, stream=True)
+        try:
+            for raw_line in response.iter_lines():
+                line = raw_line.decode("utf-8", errors="replace")
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(data)
+                except ValueError:
+                    logger.warning(f"Skipping malformed stream chunk: {data[:100]}")
+                    continue
+                choices = chunk.get("choices") or [{}]
+                delta = choices[0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+        except requests.exceptions.RequestException as e:
+            self.breaker.record_failure()
+            raise MistralAPIError(f"Mistral API stream interrupted: {str(e)}") from e
+        finally:
+            response.close()
+
+    def collect_chat_completion(self, api_key, payload, cancel_event=None):
+        """Run a chat completion over the streaming endpoint and return it in the
+        same shape as `chat_completion`.
+
+        Setting `cancel_event` abandons the call at the next chunk and closes
+        the connection, which stops generation (and billing) upstream; a
+        non-streaming request could only be abandoned after it had finished.
+        """
+        deltas = []
+        stream = self.stream_chat_completion(api_key, payload)
+        try:
+            for delta in stream:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise RequestCancelledError("Chat completion cancelled")
+                deltas.append(delta)
+        finally:
+            stream.close()
+        return {"choices": [{"message": {"role": "assistant", "content": "".join(deltas)}}]}
+
+    def close(self):
+        self.session.close()
+
+
+# Process-wide shared client
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the shared MistralClient, creating it on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = MistralClient(api_url=os.environ.get(API_URL_ENV_VAR) or DEFAULT_API_URL)
+        return _client
@@ -0,0 +1,228 @@
+import argparse
+import base64
+import glob
+import io
+import logging
+import os
+import re
+import string
+import zipfile
+from functools import lru_cache
+
+logger = logging.getLogger("AskFlowChart")
+
+# Local copies of the fonts and icons exports normally load from Google Fonts and the Font Awesome CDN:
+#   fontawesome/css/all.css (or all.min.css) and fontawesome/webfonts/fa-solid-900.* from the Font Awesome 5 Free
+#   web download, and fonts/<Family>-<Style>.ttf files (e.g. Roboto-Medium.ttf) from Google Fonts.
+# `python offline_assets.py` downloads all of them for the theme fonts.
+DEFAULT_ASSETS_PATH = os.environ.get("FLOWCHART_ASSETS_PATH", "assets")
+
+FONT_AWESOME_ZIP_URL = "https://use.fontawesome.com/releases/v5.15.4/fontawesome-free-5.15.4-web.zip"
+GOOGLE_FONTS_CSS_URL = "https://fonts.googleapis.com/css2?family={family}:wght@{weight}"
+
+ICON_FONT_FAMILY = "Font Awesome 5 Free"
+
+# Style names in Google Fonts file names, by CSS weight
+FONT_STYLE_NAMES = {100: "Thin", 200: "ExtraLight", 300: "Light", 400: "Regular", 500: "Medium", 600: "SemiBold",
+                    700: "Bold", 800: "ExtraBold", 900: "Black"}
+
+FONT_FORMATS = {".woff2": ("font/woff2", "woff2"), ".woff": ("font/woff", "woff"), ".ttf": ("font/ttf", "truetype"),
+                ".otf": ("font/otf", "opentype")}
+
+# Always kept in a subset: scripts write digits and "%" (the zoom level) after the page is built
+BASE_CHARACTERS = string.printable
+
+
+def _find_file(*patterns):
+    """First existing file among glob patterns, in order of preference"""
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        if matches:
+            return matches[0]
+    return None
+
+
+@lru_cache(maxsize=None)
+def load_icon_codepoints(css_path):
+    """Font Awesome icon class ("fa-cog") -> codepoint, read from its stylesheet"""
+    with open(css_path, encoding="utf-8") as f:
+        css = f.read()
+    codepoints = {}
+    for selectors, codepoint in re.findall(r'((?:\.fa-[\w-]+:before\s*,?\s*)+)\{\s*content:\s*"\\([0-9a-fA-F]+)"', css):
+        for name in re.findall(r"\.(fa-[\w-]+):before", selectors):
+            codepoints[name] = int(codepoint, 16)
+    return codepoints
+
+
+def _subset_flavor():
+    """WOFF2 needs brotli; plain WOFF only needs zlib"""
+    try:
+        import brotli  # noqa: F401
+        return "woff2"
+    except ImportError:
+        return "woff"
+
+
+@lru_cache(maxsize=64)
+def load_font(path, codepoints):
+    """(bytes, mime type, CSS format) for a font file, subset to `codepoints` (a sorted tuple)
+    when fontTools is installed and embedded whole otherwise"""
+    try:
+        from fontTools import subset
+    except ImportError:
+        logger.info(f"fontTools not installed; embedding {os.path.basename(path)} without subsetting")
+        with open(path, "rb") as f:
+            data = f.read()
+        mime, css_format = FONT_FORMATS[os.path.splitext(path)[1].lower()]
+        return data, mime, css_format
+
+    options = subset.Options()
+    options.flavor = _subset_flavor()
+    font = subset.load_font(path, options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    buffer = io.BytesIO()
+    subset.save_font(font, buffer, options)
+    return buffer.getvalue(), f"font/{options.flavor}", options.flavor
+
+
+def _font_face(family, weight, font):
+    data, mime, css_format = font
+    return (f"@font-face {{ font-family: '{family}'; font-style: normal; font-weight: {weight}; font-display: block; "
+            f"src: url(data:{mime};base64,{base64.b64encode(data).decode()}) format('{css_format}'); }}")
+
+
+def _font_name(family, weight):
+    """File name of a font without its extension, e.g. Roboto-Medium"""
+    return f"{family.replace(' ', '')}-{FONT_STYLE_NAMES[weight]}"
+
+
+def _font_path(family, weight, assets_path):
+    return _find_file(*(os.path.join(assets_path, "fonts", _font_name(family, weight) + ext) for ext in FONT_FORMATS))
+
+
+def _icon_paths(assets_path):
+    """(stylesheet, solid font) of the local Font Awesome, either None when missing"""
+    fontawesome = os.path.join(assets_path, "fontawesome")
+    css_path = _find_file(os.path.join(fontawesome, "css", "all.css"), os.path.join(fontawesome, "css", "all.min.css"))
+    font_path = _find_file(*(os.path.join(fontawesome, "webfonts", f"fa-solid-900{ext}")
+                             for ext in (".ttf", ".woff2", ".woff")))
+    return css_path, font_path
+
+
+def missing_assets(family, weights, assets_path=DEFAULT_ASSETS_PATH):
+    """The local files an offline export of `family` would need but can't find, relative to `assets_path`"""
+    missing = [f"fonts/{_font_name(family, weight)}.ttf" for weight in weights
+               if _font_path(family, weight, assets_path) is None]
+    css_path, font_path = _icon_paths(assets_path)
+    if css_path is None:
+        missing.append("fontawesome/css/all.css")
+    if font_path is None:
+        missing.append("fontawesome/webfonts/fa-solid-900.ttf")
+    return missing
+
+
+def theme_font_css(family, weights, text, assets_path=DEFAULT_ASSETS_PATH):
+    """@font-face rules for one family, each weight subset to the characters of `text`"""
+    codepoints = tuple(sorted({ord(c) for c in text + BASE_CHARACTERS}))
+    rules = []
+    for weight in weights:
+        path = _font_path(family, weight, assets_path)
+        if path is None:
+            logger.warning(f"No local {family} {FONT_STYLE_NAMES[weight]} font in {assets_path}; using the fallback family")
+            continue
+        rules.append(_font_face(family, weight, load_font(path, codepoints)))
+    return "\n".join(rules)
+
+
+def icon_css(icon_names, assets_path=DEFAULT_ASSETS_PATH):
+    """The icon font subset to `icon_names`, plus the .fas and per-icon rules Font Awesome's stylesheet provides"""
+    css_path, font_path = _icon_paths(assets_path)
+    if css_path is None or font_path is None:
+        logger.warning(f"No local Font Awesome in {os.path.join(assets_path, 'fontawesome')}; icons are left out")
+        return ""
+
+    known = load_icon_codepoints(css_path)
+    icons = {name: known[name] for name in sorted(icon_names) if name in known}
+    missing = set(icon_names) - set(icons)
+    if missing:
+        logger.warning(f"Icons not in the local Font Awesome: {', '.join(sorted(missing))}")
+    rules = [
+        _font_face(ICON_FONT_FAMILY, 900, load_font(font_path, tuple(sorted(icons.values())))),
+        f""".fas {{ font-family: '{ICON_FONT_FAMILY}'; font-weight: 900; font-style: normal; font-variant: normal; display: inline-block; line-height: 1; text-rendering: auto; -webkit-font-smoothing: antialiased; -moz-osx-font-smoothing: grayscale; }}""",
+    ]
+    rules += [f'.{name}:before {{ content: "\\{codepoint:x}"; }}' for name, codepoint in icons.items()]
+    return "\n".join(rules)
+
+
+def offline_font_css(family, weights, text, icon_names, assets_path=DEFAULT_ASSETS_PATH):
+    """Everything an offline export needs in place of the web font and icon stylesheets"""
+    return "\n".join(part for part in (theme_font_css(family, weights, text, assets_path),
+                                       icon_css(icon_names, assets_path)) if part)
+
+
+def _download(url, session):
+    response = session.get(url, timeout=(5, 120))
+    response.raise_for_status()
+    return response.content
+
+
+def fetch_assets(fonts, assets_path=DEFAULT_ASSETS_PATH):
+    """Download Font Awesome and the Google Fonts weights in `fonts` ({family: weights}) into `assets_path`,
+    skipping files that are already there"""
+    # Imported here: only fetching needs the network
+    import requests
+
+    session = requests.Session()
+    if None in _icon_paths(assets_path):
+        logger.info(f"Downloading Font Awesome from {FONT_AWESOME_ZIP_URL}")
+        with zipfile.ZipFile(io.BytesIO(_download(FONT_AWESOME_ZIP_URL, session))) as archive:
+            for name in archive.namelist():
+                # fontawesome-free-5.15.4-web/css/all.css -> fontawesome/css/all.css
+                relative = name.split("/", 1)[-1]
+                if relative in ("css/all.css", "css/all.min.css") or relative.startswith("webfonts/fa-solid-900."):
+                    path = os.path.join(assets_path, "fontawesome", relative)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with open(path, "wb") as f:
+                        f.write(archive.read(name))
+
+    os.makedirs(os.path.join(assets_path, "fonts"), exist_ok=True)
+    for family, weights in fonts.items():
+        for weight in weights:
+            if _font_path(family, weight, assets_path) is not None:
+                continue
+            # Without a browser User-Agent, Google Fonts links one whole TrueType file per weight
+            css = _download(GOOGLE_FONTS_CSS_URL.format(family=family.replace(" ", "+"), weight=weight),
+                            session).decode("utf-8")
+            match = re.search(r"url\((https://[^)]+)\)", css)
+            if match is None:
+                logger.warning(f"Google Fonts has no {family} {FONT_STYLE_NAMES[weight]}")
+                continue
+            path = os.path.join(assets_path, "fonts", f"{_font_name(family, weight)}.ttf")
+            logger.info(f"Downloading {family} {FONT_STYLE_NAMES[weight]} to {path}")
+            with open(path, "wb") as f:
+                f.write(_download(match.group(1), session))
+
+
+def main():
+    # The theme fonts are defined with the themes
+    from flowchart_renderer import THEME_FONT_WEIGHTS
+
+    parser = argparse.ArgumentParser(description="Download the fonts and icons offline exports embed")
+    parser.add_argument("--assets", default=DEFAULT_ASSETS_PATH,
+                        help="directory to fill (default: $FLOWCHART_ASSETS_PATH or ./assets)")
+    parser.add_argument("--check", action="store_true", help="only list the files that are missing")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if not args.check:
+        fetch_assets(THEME_FONT_WEIGHTS, args.assets)
+    missing = sorted({path for family, weights in THEME_FONT_WEIGHTS.items()
+                      for path in missing_assets(family, weights, args.assets)})
+    for path in missing:
+        print(f"missing: {os.path.join(args.assets, path)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+import hashlib
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Mistral's default workspace limits: 1 request/second, 500k tokens/minute
+DEFAULT_REQUESTS_PER_SECOND = 1.0
+DEFAULT_REQUEST_BURST = 2
+DEFAULT_TOKENS_PER_MINUTE = 500_000
+# Backpressure: beyond this many queued requests per key new ones are refused
+DEFAULT_MAX_QUEUE = 32
+# Longest a queued request waits before giving up
+DEFAULT_MAX_WAIT = 120.0
+
+
+class SchedulerBusyError(Exception):
+    """Raised when a request is refused or times out in the queue"""
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` units refill per second up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount, now):
+        """Seconds until `amount` units are available (0 if they are now)"""
+        self._refill(now)
+        # A request bigger than the bucket only needs a full bucket
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount, now):
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+
+    def refund(self, amount):
+        self.level = min(self.capacity, self.level + amount)
+
+
+class Ticket:
+    """A request waiting for (or holding) a slot from the scheduler"""
+
+    def __init__(self, key, session_id, tokens, seq):
+        self.key = key
+        self.session_id = session_id
+        self.tokens = tokens
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.granted_at = None
+        self.cancelled = False
+
+    @property
+    def granted(self):
+        return self.granted_at is not None
+
+    @property
+    def wait_time(self):
+        return (self.granted_at or time.monotonic()) - self.enqueued_at
+
+
+class _KeyState:
+    """Buckets and per-session queues for one API key"""
+
+    def __init__(self, requests_per_second, request_burst, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_second, request_burst)
+        self.tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute)
+        # Round-robin ring of session_id -> deque of waiting tickets; the
+        # first session is the next one served
+        self.sessions = OrderedDict()
+        self.queued = 0
+
+    def head(self):
+        for queue in self.sessions.values():
+            return queue[0]
+        return None
+
+    def position(self, ticket):
+        """1-based place of `ticket` in the round-robin service order"""
+        queue = self.sessions.get(ticket.session_id)
+        if queue is None or ticket not in queue:
+            return 0
+        index = queue.index(ticket)
+        ahead = index
+        before = True
+        for session_id, other in self.sessions.items():
+            if session_id == ticket.session_id:
+                before = False
+                continue
+            # Sessions ahead in the ring get one turn more in the ticket's round
+            ahead += min(len(other), index + (1 if before else 0))
+        return ahead + 1
+
+    def remove(self, ticket):
+        queue = self.sessions.get(ticket.session_id)
+        if queue is None or ticket not in queue:
+            return
+        queue.remove(ticket)
+        self.queued -= 1
+        if not queue:
+            del self.sessions[ticket.session_id]
+
+
+class RequestScheduler:
+    """Process-wide gate in front of the Mistral API.
+
+    Each API key gets a request bucket and a token bucket sized to the
+    account's limits, so bursts are smoothed client-side instead of
+    coming back as 429s. Waiting requests are queued per session and
+    served round-robin across sessions, so one user submitting several
+    charts can't starve the others. When a key's queue is full, new
+    requests are refused straight away (backpressure) rather than piling up.
+    """
+
+    def __init__(self, requests_per_second=DEFAULT_REQUESTS_PER_SECOND, request_burst=DEFAULT_REQUEST_BURST,
+                 tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE, max_queue=DEFAULT_MAX_QUEUE,
+                 max_wait=DEFAULT_MAX_WAIT):
+        self.requests_per_second = requests_per_second
+        self.request_burst = request_burst
+        self.tokens_per_minute = tokens_per_minute
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._keys = {}
+        self._seq = itertools.count()
+        self.granted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+
+    @staticmethod
+    def _key_id(api_key):
+        # Never keep raw API keys around in process memory longer than needed
+        return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+    def _state(self, key):
+        state = self._keys.get(key)
+        if state is None:
+            state = _KeyState(self.requests_per_second, self.request_burst, self.tokens_per_minute)
+            self._keys[key] = state
+        return state
+
+    def submit(self, api_key, session_id, tokens):
+        """Queue a request for `tokens` tokens; raises SchedulerBusyError if the queue is full"""
+        key = self._key_id(api_key)
+        with self._cond:
+            state = self._state(key)
+            if state.queued >= self.max_queue:
+                self.rejected += 1
+                raise SchedulerBusyError(
+                    f"Too many requests are waiting for this API key ({state.queued}); try again shortly")
+            ticket = Ticket(key, session_id or "default", tokens, next(self._seq))
+            state.sessions.setdefault(ticket.session_id, deque()).append(ticket)
+            state.queued += 1
+            return ticket
+
+    def _dispatch(self, state):
+        """Grant queued tickets in round-robin order while both buckets allow.
+
+        Any waiting thread can move the line forward, so a ticket whose
+        owner is slow to check back never holds up the others. Returns how
+        long until the next ticket can be granted, or None if none is queued.
+        """
+        while True:
+            ticket = state.head()
+            if ticket is None:
+                return None
+            now = time.monotonic()
+            delay = max(state.requests.delay(1, now), state.tokens.delay(ticket.tokens, now))
+            if delay > 0:
+                return delay
+            state.requests.consume(1, now)
+            state.tokens.consume(ticket.tokens, now)
+            state.remove(ticket)
+            # Rotate the ring: this session goes to the back of the line
+            if ticket.session_id in state.sessions:
+                state.sessions.move_to_end(ticket.session_id)
+            ticket.granted_at = now
+            self.granted += 1
+            self.total_wait += ticket.wait_time
+            self._cond.notify_all()
+
+    def wait(self, ticket, timeout=None):
+        """Block up to `timeout` seconds for the slot; True once granted.
+
+        Raises SchedulerBusyError when the ticket has waited longer than max_wait.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            state = self._state(ticket.key)
+            while True:
+                delay = self._dispatch(state)
+                if ticket.granted:
+                    return True
+                if ticket.wait_time > self.max_wait:
+                    state.remove(ticket)
+                    self.timeouts += 1
+                    self._cond.notify_all()
+                    raise SchedulerBusyError(f"Gave up after waiting {ticket.wait_time:.0f}s in the request queue")
+                remaining = self.max_wait - ticket.wait_time
+                if deadline is not None:
+                    remaining = min(remaining, deadline - time.monotonic())
+                    if remaining <= 0:
+                        return False
+                # Woken early whenever the line moves; bucket refills are timed
+                self._cond.wait(remaining if delay is None else min(delay, remaining))
+
+    def acquire(self, api_key, session_id, tokens):
+        """Queue a request and block until it may be sent"""
+        ticket = self.submit(api_key, session_id, tokens)
+        try:
+            self.wait(ticket)
+        except BaseException:
+            self.cancel(ticket)
+            raise
+        return ticket
+
+    def try_acquire(self, api_key, session_id, tokens):
+        """Take a slot only if one is free right now and nobody is queued; else None"""
+        key = self._key_id(api_key)
+        with self._cond:
+            state = self._state(key)
+            if state.queued:
+                return None
+            now = time.monotonic()
+            if state.requests.delay(1, now) > 0 or state.tokens.delay(tokens, now) > 0:
+                return None
+            ticket = Ticket(key, session_id or "default", tokens, next(self._seq))
+            state.requests.consume(1, now)
+            state.tokens.consume(tokens, now)
+            ticket.granted_at = now
+            self.granted += 1
+            return ticket
+
+    def cancel(self, ticket):
+        """Drop a ticket that is no longer wanted (no-op once granted)"""
+        with self._cond:
+            if not ticket.granted and not ticket.cancelled:
+                ticket.cancelled = True
+                self._state(ticket.key).remove(ticket)
+                self._cond.notify_all()
+
+    def settle(self, ticket, used_tokens):
+        """Return the unused part of a granted ticket's token reservation"""
+        if not ticket.granted or used_tokens is None or used_tokens >= ticket.tokens:
+            return
+        with self._cond:
+            self._state(ticket.key).tokens.refund(ticket.tokens - used_tokens)
+            self._cond.notify_all()
+
+    def position(self, ticket):
+        """Place of a waiting ticket in its key's queue (0 once granted)"""
+        with self._cond:
+            return self._state(ticket.key).position(ticket)
+
+    def session_position(self, session_id):
+        """Place of a session's earliest waiting request, or None if it has none"""
+        with self._cond:
+            for state in self._keys.values():
+                queue = state.sessions.get(session_id)
+                if queue:
+                    return state.position(queue[0])
+            return None
+
+    def get_stats(self):
+        with self._cond:
+            return {
+                "queued": sum(state.queued for state in self._keys.values()),
+                "keys": len(self._keys),
+                "granted": self.granted,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "avg_wait": self.total_wait / self.granted if self.granted else 0.0,
+            }
+
+
+def estimate_request_tokens(request_data):
+    """Upper bound on the tokens a chat-completions request can use (~4 chars per token)"""
+    prompt_chars = sum(len(message.get("content", "")) for message in request_data.get("messages", []))
+    return prompt_chars // 4 + request_data.get("max_tokens", 0)
+
+
+# Process-wide scheduler shared by every Streamlit session
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Return the shared RequestScheduler, creating it on first use"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace and case so trivially different prompts share a key"""
+    return re.sub(r"\s+", " ", (prompt or "").strip()).lower()
+
+
+def _messages_digest(messages, prompt):
+    """Hash of the chat messages with the prompt's own text factored out, so the
+    prompt only enters the key normalized (see make_cache_key)"""
+    placeholder = "\x00prompt\x00"
+    contents = [
+        [message.get("role"), message.get("content", "").replace(prompt, placeholder) if prompt
+         else message.get("content", "")]
+        for message in messages or ()
+    ]
+    return hashlib.sha256(json.dumps(contents).encode("utf-8")).hexdigest()
+
+
+def make_cache_key(prompt, industry, model, temperature, max_tokens, kind="flowchart", messages=None,
+                   node_ids=None, include_prompt=True):
+    """Hash the normalized request parameters into a stable cache key.
+
+    `kind` separates request types that share a prompt (a full flowchart, a
+    skeleton, a batch of descriptions...), `messages` are the chat messages
+    actually sent and `node_ids` the nodes a request is about. With
+    `include_prompt` False the key covers everything but the prompt, which
+    makes it a namespace for near-duplicate lookups.
+    """
+    key_data = {
+        "prompt": normalize_prompt(prompt) if include_prompt else "",
+        "industry": industry or "",
+        "model": model,
+        "temperature": round(float(temperature), 3),
+        "max_tokens": int(max_tokens),
+        "kind": kind,
+        "messages": _messages_digest(messages, prompt),
+        "node_ids": sorted(node_ids or ()),
+    }
+    encoded = json.dumps(key_data, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe LRU cache with a TTL and a limit on total size in bytes.
+
+    Values must be JSON-serializable; their encoded size is what counts
+    against `max_bytes`. The cache is shared by all Streamlit sessions in
+    the process, so every operation holds a lock.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl_seconds=3600):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def size_bytes(self):
+        with self._lock:
+            return self._size
+
+    def get(self, key):
+        """Return the cached value, or None on a miss or an expired entry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = len(json.dumps(value).encode("utf-8"))
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                # Never let a single oversized value flush the whole cache
+                return False
+            self._entries[key] = (value, size, time.monotonic() + self.ttl_seconds)
+            self._size += size
+            while self._size > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+            return True
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._size -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "items": len(self._entries),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# Process-wide shared cache. It lives in this module rather than in app.py
+# because Streamlit re-executes app.py on every rerun, which would otherwise
+# recreate the cache each time.
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Return the shared ResponseCache, creating it on first use"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
@@ -0,0 +1,162 @@
+import random
+import re
+import threading
+import zlib
+from array import array
+from collections import OrderedDict
+from operator import eq
+
+# Words that don't change what flowchart is being asked for
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "for", "to", "in", "on", "with", "by", "from", "at",
+    "is", "are", "be", "it", "this", "that", "then", "create", "make", "generate", "draw",
+    "flowchart", "flow", "chart", "diagram", "please", "show", "me", "our", "my", "your",
+}
+
+_MASK_32 = 0xFFFFFFFF
+_MIX = 0x9E3779B1
+
+
+def prompt_tokens(prompt):
+    """Lowercase word tokens with punctuation, stopwords and plural endings removed"""
+    tokens = set()
+    for word in re.findall(r"[a-z0-9]+", (prompt or "").lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.add(word)
+    return tokens
+
+
+class SimilarityIndex:
+    """MinHash/LSH index over cached prompts for near-duplicate lookup.
+
+    Each prompt is reduced to its set of normalized word tokens (so word
+    order, case, punctuation and plurals don't matter) and a MinHash
+    signature of `num_perm` 32-bit values. The signature is split into
+    `bands` bands that are bucketed in dictionaries, and a query only
+    scores prompts sharing at least one bucket, so lookup cost doesn't
+    grow with the number of stored prompts. Similarity is the fraction of
+    agreeing signature values, an estimate of the Jaccard similarity of
+    the token sets.
+
+    `namespace` separates prompts whose responses aren't interchangeable
+    (different industry, model or generation settings).
+    """
+
+    def __init__(self, threshold=0.85, num_perm=64, bands=8, max_items=100_000, max_candidates=256, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_items = max_items
+        # Upper bound on prompts scored per query, so crowded buckets can't blow the latency budget
+        self.max_candidates = max_candidates
+        rng = random.Random(seed)
+        self._masks = [rng.getrandbits(32) for _ in range(num_perm)]
+        self._buckets = [dict() for _ in range(bands)]
+        self._entries = OrderedDict()  # key -> (namespace, signature)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def signature(self, prompt):
+        hashes = [zlib.crc32(token.encode("utf-8")) for token in prompt_tokens(prompt)]
+        if not hashes:
+            return None
+        return array("L", [
+            min(((h ^ mask) * _MIX) & _MASK_32 for h in hashes)
+            for mask in self._masks
+        ])
+
+    def _band_keys(self, namespace, signature):
+        rows = self.rows
+        return [
+            (namespace, signature[i * rows:(i + 1) * rows].tobytes())
+            for i in range(self.bands)
+        ]
+
+    def add(self, prompt, key, namespace=""):
+        """Index `prompt` as a lookup path to the cache entry `key`"""
+        signature = self.signature(prompt)
+        if signature is None:
+            return
+        band_keys = self._band_keys(namespace, signature)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (namespace, signature)
+            for bucket, band_key in zip(self._buckets, band_keys):
+                bucket.setdefault(band_key, []).append(key)
+            while len(self._entries) > self.max_items:
+                self._remove(next(iter(self._entries)))
+
+    def query(self, prompt, namespace="", threshold=None):
+        """Return (key, similarity) for the closest indexed prompt above the threshold, or None"""
+        threshold = self.threshold if threshold is None else threshold
+        signature = self.signature(prompt)
+        if signature is None:
+            return None
+        band_keys = self._band_keys(namespace, signature)
+        best_key, best_score = None, 0.0
+        with self._lock:
+            seen = set()
+            for bucket, band_key in zip(self._buckets, band_keys):
+                for key in bucket.get(band_key, ()):
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    other = self._entries[key][1]
+                    score = sum(map(eq, signature, other)) / self.num_perm
+                    if score > best_score:
+                        best_key, best_score = key, score
+                    if len(seen) >= self.max_candidates:
+                        break
+                if len(seen) >= self.max_candidates or best_score == 1.0:
+                    break
+        if best_key is None or best_score < threshold:
+            return None
+        return best_key, best_score
+
+    def remove(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def _remove(self, key):
+        namespace, signature = self._entries.pop(key)
+        for bucket, band_key in zip(self._buckets, self._band_keys(namespace, signature)):
+            keys = bucket.get(band_key)
+            if keys is None:
+                continue
+            try:
+                keys.remove(key)
+            except ValueError:
+                pass
+            if not keys:
+                del bucket[band_key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for bucket in self._buckets:
+                bucket.clear()
+
+
+# Process-wide shared index, kept next to the shared response cache
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_similarity_index():
+    """Return the shared SimilarityIndex, creating it on first use"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SimilarityIndex()
+        return _index
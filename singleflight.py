@@ -0,0 +1,82 @@
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key becomes the leader and does the work; every
+    caller that arrives while it is in flight waits on the leader's future
+    and receives the same result (or exception). Once the leader finishes,
+    the key is released and the next call starts a fresh execution.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    def begin(self, key):
+        """Register a call for `key`; returns (future, is_leader)"""
+        with self._lock:
+            self.calls += 1
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._in_flight[key] = future
+            self.executions += 1
+            return future, True
+
+    def finish(self, key, future, result=None, exception=None):
+        """Publish the leader's outcome to all waiters and release the key"""
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) once per key among concurrent callers"""
+        future, is_leader = self.begin(key)
+        if not is_leader:
+            return future.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self.finish(key, future, exception=e)
+            raise
+        self.finish(key, future, result)
+        return result
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._in_flight)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._in_flight),
+            }
+
+
+# Process-wide group for flowchart generations
+_group = None
+_group_lock = threading.Lock()
+
+
+def get_single_flight():
+    """Return the shared SingleFlight group, creating it on first use"""
+    global _group
+    with _group_lock:
+        if _group is None:
+            _group = SingleFlight()
+        return _group
@@ -0,0 +1,92 @@
+"""CircuitBreaker state machine: closed -> open -> half-open -> closed or open again"""
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError  # noqa: E402
+
+RECOVERY = 0.2
+
+
+def opened_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=RECOVERY)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+
+def test_consecutive_failures_open_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=RECOVERY)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.get_stats()["times_opened"] == 1
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=RECOVERY)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_open_circuit_fails_fast():
+    breaker = opened_breaker()
+    with pytest.raises(CircuitOpenError) as excinfo:
+        breaker.before_call()
+    assert 0 < excinfo.value.retry_in <= RECOVERY
+    assert breaker.get_stats()["fast_failures"] == 1
+
+
+def test_after_the_timeout_one_probe_goes_through():
+    breaker = opened_breaker()
+    time.sleep(RECOVERY * 1.2)
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
+    # Everyone else keeps failing fast while the probe is out
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_successful_probe_closes_the_circuit():
+    breaker = opened_breaker()
+    time.sleep(RECOVERY * 1.2)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+
+def test_failed_probe_reopens_the_circuit():
+    breaker = opened_breaker()
+    time.sleep(RECOVERY * 1.2)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.get_stats()["times_opened"] == 2
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_abandoned_probe_is_written_off():
+    breaker = opened_breaker()
+    time.sleep(RECOVERY * 1.2)
+    breaker.before_call()
+    # The probe's caller never reports back; after another timeout the next call probes instead
+    time.sleep(RECOVERY * 1.2)
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+
+
+def test_reset_closes_the_circuit():
+    breaker = opened_breaker()
+    breaker.reset()
+    assert breaker.state == CLOSED
+    breaker.before_call()
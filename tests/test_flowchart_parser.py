@@ -0,0 +1,102 @@
+"""IncrementalNodeParser and recover_flowchart_json on streamed and broken model output"""
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flowchart_parser import IncrementalNodeParser, recover_flowchart_json, strip_trailing_commas  # noqa: E402
+
+NODES = [
+    {"id": "node1", "text": "Start", "type": "start", "connections": ["node2"]},
+    {"id": "node2", "text": "Check {stock} [a, b]", "type": "decision", "connections": ["node3"],
+     "description": "Quotes \" and brackets ] inside strings"},
+    {"id": "node3", "text": "End", "type": "end", "connections": []},
+]
+FLOWCHART = json.dumps({"nodes": NODES})
+
+
+def feed_in_chunks(text, size):
+    parser = IncrementalNodeParser()
+    completed = []
+    for start in range(0, len(text), size):
+        completed.extend(parser.feed(text[start:start + size]))
+    return parser, completed
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 64, len(FLOWCHART)])
+def test_nodes_are_returned_as_they_complete(size):
+    parser, completed = feed_in_chunks(FLOWCHART, size)
+    assert completed == NODES
+    assert parser.nodes == NODES
+
+
+def test_each_node_is_returned_by_the_chunk_that_closes_it():
+    parser = IncrementalNodeParser()
+    first_end = FLOWCHART.index("}") + 1
+    assert parser.feed(FLOWCHART[:first_end - 1]) == []
+    assert parser.feed(FLOWCHART[first_end - 1:first_end]) == NODES[:1]
+
+
+def test_other_keys_and_nested_objects_are_not_nodes():
+    text = json.dumps({"title": {"id": "x"}, "nodes": NODES[:1], "connections": [{"id": "y"}]})
+    parser, completed = feed_in_chunks(text, 5)
+    assert completed == NODES[:1]
+
+
+def test_bare_array_is_the_nodes_array():
+    _, completed = feed_in_chunks(json.dumps(NODES), 4)
+    assert completed == NODES
+
+
+def test_bracketed_prose_before_the_json_is_skipped():
+    _, completed = feed_in_chunks("Sure [see below]: " + FLOWCHART, 5)
+    assert completed == NODES
+
+
+def test_trailing_commas_are_repaired():
+    parser = IncrementalNodeParser()
+    assert parser.feed('{"nodes": [{"id": "a", "text": "A", "connections": ["b",],},]}') == [
+        {"id": "a", "text": "A", "connections": ["b"]}]
+
+
+def test_close_salvages_the_complete_fields_of_a_truncated_node():
+    parser = IncrementalNodeParser()
+    parser.feed('{"nodes": [{"id": "a", "text": "A"}, {"id": "b", "text": "Half", "description": "cut o')
+    assert parser.close() == [{"id": "b", "text": "Half"}]
+    assert [node["id"] for node in parser.nodes] == ["a", "b"]
+
+
+def test_close_drops_a_truncated_node_without_text():
+    parser = IncrementalNodeParser()
+    parser.feed('{"nodes": [{"id": "a", "text": "A"}, {"id": "b", "type": "process", "te')
+    assert parser.close() == []
+    assert [node["id"] for node in parser.nodes] == ["a"]
+
+
+def test_strip_trailing_commas_leaves_strings_alone():
+    assert json.loads(strip_trailing_commas('{"a": ["x,]", "y",], "b": 1,}')) == {"a": ["x,]", "y"], "b": 1}
+
+
+@pytest.mark.parametrize("content", [
+    FLOWCHART,
+    "Here is your flowchart:\n" + FLOWCHART,
+    "```json\n" + FLOWCHART + "\n```",
+    "Sure [see below]: " + FLOWCHART,
+    "Sure {as requested}: " + FLOWCHART,
+    FLOWCHART.replace('"connections": []}', '"connections": [],}'),
+])
+def test_recover_finds_every_node(content):
+    assert recover_flowchart_json(content) == {"nodes": NODES}
+
+
+def test_recover_keeps_the_nodes_before_a_truncation():
+    cut = FLOWCHART.index('{"id": "node3"') + 5
+    assert recover_flowchart_json(FLOWCHART[:cut]) == {"nodes": NODES[:2]}
+
+
+@pytest.mark.parametrize("content", [None, "", "no json here", "[see below] {}", '{"nodes": []}'])
+def test_recover_returns_none_without_nodes(content):
+    assert recover_flowchart_json(content) is None
@@ -0,0 +1,145 @@
+"""apply_patch and parse_patch_operations: local edits to an existing chart"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from circuit_breaker import DegradedFlowchart  # noqa: E402
+from flowchart_layout import calculate_layout, update_layout  # noqa: E402
+from flowchart_patch import PatchError, apply_patch, parse_patch_operations  # noqa: E402
+
+
+def chart():
+    return {"title": "Orders", "nodes": [
+        {"id": "a", "type": "start", "text": "Receive", "connections": ["b"]},
+        {"id": "b", "type": "decision", "text": "In stock?", "connections": ["c", "d"]},
+        {"id": "c", "type": "process", "text": "Ship", "connections": ["e"]},
+        {"id": "d", "type": "process", "text": "Reorder", "connections": ["e"]},
+        {"id": "e", "type": "end", "text": "Done", "connections": []},
+    ]}
+
+
+def connections(flowchart):
+    return {n["id"]: n["connections"] for n in flowchart["nodes"]}
+
+
+def test_original_chart_is_left_alone():
+    original = chart()
+    patched, _ = apply_patch(original, [{"op": "update_node", "id": "c", "fields": {"text": "Ship fast"}}])
+    assert original == chart()
+    assert patched["title"] == "Orders"
+
+
+def test_add_node_after_splices_it_in():
+    patched, changed = apply_patch(chart(), [{"op": "add_node", "after": "c", "node": {"id": "x", "text": "Pack"}}])
+    assert [n["id"] for n in patched["nodes"]] == ["a", "b", "c", "x", "d", "e"]
+    assert connections(patched)["c"] == ["x"]
+    assert connections(patched)["x"] == ["e"]
+    assert patched["nodes"][3]["type"] == "process"
+    assert changed == {"x"}
+
+
+def test_add_node_with_a_taken_id_gets_a_fresh_one():
+    patched, changed = apply_patch(chart(), [{"op": "add_node", "node": {"id": "a", "text": "Extra",
+                                                                         "connections": ["e", "ghost"]}}])
+    added = patched["nodes"][-1]
+    assert added["id"] not in {"a", "b", "c", "d", "e"}
+    assert added["connections"] == ["e"]
+    assert changed == {added["id"]}
+
+
+def test_remove_node_bridges_its_predecessors_to_its_targets():
+    patched, changed = apply_patch(chart(), [{"op": "remove_node", "id": "c"}])
+    assert "c" not in connections(patched)
+    # The decision keeps its branch order: the "Yes" branch now goes straight to the end
+    assert connections(patched)["b"] == ["e", "d"]
+    assert changed == set()
+
+
+def test_remove_node_does_not_duplicate_or_self_link():
+    flowchart = {"nodes": [
+        {"id": "a", "type": "start", "text": "A", "connections": ["b", "c"]},
+        {"id": "b", "type": "process", "text": "B", "connections": ["c", "a"]},
+        {"id": "c", "type": "end", "text": "C", "connections": []},
+    ]}
+    patched, _ = apply_patch(flowchart, [{"op": "remove_node", "id": "b"}])
+    assert connections(patched)["a"] == ["c"]
+
+
+def test_removing_an_added_node_leaves_nothing_changed():
+    _, changed = apply_patch(chart(), [{"op": "add_node", "node": {"id": "x", "text": "X"}},
+                                       {"op": "remove_node", "id": "x"}])
+    assert changed == set()
+
+
+def test_update_node_changes_only_known_fields():
+    patched, changed = apply_patch(chart(), [{"op": "update_node", "id": "c",
+                                              "fields": {"text": "Ship fast", "connections": [], "id": "z"}}])
+    node = patched["nodes"][2]
+    assert (node["id"], node["text"], node["connections"]) == ("c", "Ship fast", ["e"])
+    assert changed == {"c"}
+
+
+def test_update_node_with_the_same_values_changes_nothing():
+    _, changed = apply_patch(chart(), [{"op": "update_node", "id": "c", "fields": {"text": "Ship"}}])
+    assert changed == set()
+
+
+@pytest.mark.parametrize("operation, expected", [
+    ({"op": "relink", "source": "c", "from": "e", "to": "d"}, ["d"]),
+    ({"op": "relink", "source": "c", "to": "d"}, ["e", "d"]),
+    ({"op": "relink", "source": "c", "from": "e"}, []),
+    # Moving an edge onto a target it already has just drops the old one
+    ({"op": "relink", "source": "b", "from": "c", "to": "d"}, ["d"]),
+])
+def test_relink(operation, expected):
+    patched, changed = apply_patch(chart(), [operation])
+    assert connections(patched)[operation["source"]] == expected
+    assert changed == set()
+
+
+@pytest.mark.parametrize("operation, message", [
+    ({"op": "relink", "source": "c", "from": "e", "to": "ghost"}, "Unknown node id: ghost"),
+    ({"op": "relink", "source": "ghost", "to": "e"}, "Unknown node id: ghost"),
+    ({"op": "remove_node", "id": "ghost"}, "Unknown node id: ghost"),
+    ({"op": "add_node", "after": "ghost", "node": {"text": "X"}}, "Unknown node id: ghost"),
+    ({"op": "add_node", "node": {"id": "x"}}, "needs a node with text"),
+    ({"op": "update_node", "id": "c", "fields": {"type": "cloud"}}, "Invalid node type"),
+    ({"op": "rename"}, "Unknown patch operation"),
+    ("remove c", "Invalid operation"),
+])
+def test_invalid_operations_raise(operation, message):
+    with pytest.raises(PatchError, match=message):
+        apply_patch(chart(), [operation])
+
+
+def test_degraded_placeholder_is_not_patched():
+    with pytest.raises(PatchError, match="placeholder"):
+        apply_patch(DegradedFlowchart(chart(), "API down"), [{"op": "remove_node", "id": "c"}])
+
+
+@pytest.mark.parametrize("content", ['{"operations": [{"op": "remove_node", "id": "c"}]}',
+                                     '[{"op": "remove_node", "id": "c"},]'])
+def test_parse_patch_operations(content):
+    assert parse_patch_operations(content) == [{"op": "remove_node", "id": "c"}]
+
+
+@pytest.mark.parametrize("content", ["not json", '{"operations": "remove c"}'])
+def test_parse_patch_operations_rejects_bad_responses(content):
+    with pytest.raises(PatchError):
+        parse_patch_operations(content)
+
+
+def test_update_layout_keeps_untouched_entries_and_the_previous_layout():
+    original = chart()
+    layout = calculate_layout(original["nodes"])
+    layout.get("a")["fragments"] = {"node": "<div>"}
+    patched, changed = apply_patch(original, [{"op": "update_node", "id": "e", "fields": {"text": "Finished"}}])
+    updated, updated_ids = update_layout(layout, patched["nodes"], changed)
+    assert updated_ids == {"e"}
+    assert updated.get("a")["fragments"] == {"node": "<div>"}
+    assert updated.get("a")["node"] is patched["nodes"][0]
+    assert layout.get("a")["node"] is original["nodes"][0]
+    assert layout.get("e")["node"]["text"] == "Done"
@@ -0,0 +1,76 @@
+"""merge_phase_flowcharts: joining per-phase subgraphs into one chart"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flowchart_phases import merge_phase_flowcharts  # noqa: E402
+
+
+def node(node_id, node_type="process", connections=()):
+    return {"id": node_id, "type": node_type, "text": node_id, "connections": list(connections)}
+
+
+def phase(*middle, start=True, end=True):
+    """A phase as the model returns it: start -> middle steps in a line -> end"""
+    ids = list(middle)
+    nodes = [node("start", "start", ids[:1])] if start else []
+    for index, step_id in enumerate(ids):
+        nodes.append(node(step_id, connections=ids[index + 1:index + 2] or (["end"] if end else [])))
+    if end:
+        nodes.append(node("end", "end"))
+    return {"nodes": nodes}
+
+
+def edges(flowchart):
+    return {(n["id"], target) for n in flowchart["nodes"] for target in n["connections"]}
+
+
+def test_phases_are_chained_without_inner_start_and_end_nodes():
+    merged = merge_phase_flowcharts([phase("a", "b"), phase("c"), phase("d")])
+    assert [n["id"] for n in merged["nodes"]] == ["p1-start", "p1-a", "p1-b", "p2-c", "p3-d", "p3-end"]
+    assert edges(merged) == {("p1-start", "p1-a"), ("p1-a", "p1-b"), ("p1-b", "p2-c"), ("p2-c", "p3-d"),
+                             ("p3-d", "p3-end")}
+
+
+def test_ids_are_namespaced_per_phase():
+    merged = merge_phase_flowcharts([phase("step"), phase("step")])
+    ids = [n["id"] for n in merged["nodes"]]
+    assert len(ids) == len(set(ids))
+    assert ("p1-step", "p2-step") in edges(merged)
+
+
+def test_missing_phase_is_skipped():
+    merged = merge_phase_flowcharts([phase("a"), None, phase("c")])
+    assert ("p1-a", "p3-c") in edges(merged)
+    assert not any(n["id"].startswith("p2-") for n in merged["nodes"])
+
+
+def test_phase_without_start_node_is_entered_at_its_root():
+    merged = merge_phase_flowcharts([phase("a"), phase("b", "c", start=False)])
+    assert ("p1-a", "p2-b") in edges(merged)
+    assert ("p1-a", "p2-c") not in edges(merged)
+
+
+def test_every_exit_links_to_the_next_phase():
+    branching = {"nodes": [node("start", "start", ["check"]), node("check", "decision", ["yes", "no"]),
+                           node("yes"), node("no"), node("end", "end")]}
+    merged = merge_phase_flowcharts([branching, phase("next")])
+    assert {("p1-yes", "p2-next"), ("p1-no", "p2-next")} <= edges(merged)
+
+
+def test_links_to_unknown_nodes_and_invalid_nodes_are_dropped():
+    broken = {"nodes": [node("start", "start", ["a", "ghost"]), node("a", connections=["end"]), "junk", {"text": "x"},
+                        node("end", "end")]}
+    merged = merge_phase_flowcharts([broken])
+    assert [n["id"] for n in merged["nodes"]] == ["p1-start", "p1-a", "p1-end"]
+    assert edges(merged) == {("p1-start", "p1-a"), ("p1-a", "p1-end")}
+
+
+def test_single_phase_keeps_its_start_and_end():
+    merged = merge_phase_flowcharts([None, phase("a")])
+    assert [n["type"] for n in merged["nodes"]] == ["start", "process", "end"]
+
+
+def test_no_phases_gives_an_empty_chart():
+    assert merge_phase_flowcharts([None, {"nodes": []}]) == {"nodes": []}
@@ -0,0 +1,119 @@
+"""HedgedRequester: when hedges are sent, the budget on them, and stopping the losing copy"""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hedging  # noqa: E402
+from hedging import MIN_SAMPLES, HedgedRequester, LatencyHistogram  # noqa: E402
+
+# Recent calls took 10ms, so a call still running after that is slow
+FAST_LATENCY = 0.01
+
+
+@pytest.fixture
+def requester(monkeypatch):
+    monkeypatch.setattr(hedging, "MIN_HEDGE_DELAY", FAST_LATENCY)
+    requester = HedgedRequester(budget_percent=100)
+    for _ in range(MIN_SAMPLES):
+        requester.histogram.record(FAST_LATENCY)
+    yield requester
+    requester._executor.shutdown(wait=True)
+
+
+class Attempts:
+    """Attempt function whose first copy is slow; records each copy's cancel event"""
+
+    def __init__(self, slow=5.0, fast=None):
+        self.slow = slow
+        self.fast = fast
+        self.cancel_events = []
+        self._lock = threading.Lock()
+
+    def __call__(self, cancel_event):
+        with self._lock:
+            self.cancel_events.append(cancel_event)
+            copy = len(self.cancel_events)
+        duration = self.slow if copy == 1 or self.fast is None else self.fast
+        # A cancelled copy gives up straight away, like a stream checking its cancel event
+        if cancel_event.wait(duration):
+            return "cancelled"
+        return f"copy {copy}"
+
+
+def test_no_hedge_without_enough_history():
+    requester = HedgedRequester(budget_percent=100)
+    attempts = Attempts(slow=0.05)
+    assert requester.run(attempts) == "copy 1"
+    assert len(attempts.cancel_events) == 1
+    assert requester.get_stats()["hedge_delay"] is None
+
+
+def test_slow_call_is_hedged_and_the_loser_cancelled(requester):
+    attempts = Attempts(slow=5.0, fast=0.0)
+    assert requester.run(attempts) == "copy 2"
+    primary_cancel, hedge_cancel = attempts.cancel_events
+    assert primary_cancel.is_set() and not hedge_cancel.is_set()
+    stats = requester.get_stats()
+    assert (stats["hedges"], stats["hedge_wins"]) == (1, 1)
+
+
+def test_fast_call_is_not_hedged(requester):
+    attempts = Attempts(slow=0.0)
+    assert requester.run(attempts) == "copy 1"
+    assert len(attempts.cancel_events) == 1
+
+
+def test_hedges_stay_within_the_budget(requester):
+    # 50%: one hedge per two requests
+    hedged = []
+    for _ in range(4):
+        attempts = Attempts(slow=0.1, fast=0.0)
+        requester.run(attempts, budget_percent=50)
+        hedged.append(len(attempts.cancel_events) == 2)
+    assert hedged == [False, True, False, True]
+    stats = requester.get_stats()
+    assert (stats["hedges"], stats["budget_denied"]) == (2, 2)
+
+
+def test_vetoed_hedge_is_not_charged(requester):
+    attempts = Attempts(slow=0.1, fast=0.0)
+    assert requester.run(attempts, can_hedge=lambda: False) == "copy 1"
+    assert len(attempts.cancel_events) == 1
+    assert requester.get_stats()["hedges"] == 0
+
+
+def test_hedge_succeeds_when_the_primary_fails(requester):
+    release = threading.Event()
+    calls = []
+
+    def attempt(cancel_event):
+        calls.append(cancel_event)
+        if len(calls) == 1:
+            # Fail only once the hedge is on its way
+            release.wait(5)
+            raise ValueError("primary failed")
+        release.set()
+        return "hedge"
+
+    assert requester.run(attempt) == "hedge"
+
+
+def test_first_error_is_raised_when_every_copy_fails(requester):
+    def attempt(cancel_event):
+        raise ValueError("upstream failed")
+
+    with pytest.raises(ValueError, match="upstream failed"):
+        requester.run(attempt)
+
+
+def test_percentile_of_recent_samples():
+    histogram = LatencyHistogram()
+    for value in range(1, 101):
+        histogram.record(value / 100)
+    assert histogram.percentile(90) == 0.9
+    assert histogram.percentile(50) == 0.5
+    assert sum(count for _, count in histogram.buckets()) == 100
@@ -0,0 +1,114 @@
+"""MistralClient against the local stand-in server (fake_mistral_server.py)"""
+import json
+import os
+import socket
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError  # noqa: E402
+from fake_mistral_server import start_fake_server  # noqa: E402
+from mistral_client import MistralAPIError, MistralClient, RequestCancelledError  # noqa: E402
+
+PAYLOAD = {"model": "mistral-small", "messages": [{"role": "user", "content": "Receive order, check stock, ship"}]}
+
+
+@pytest.fixture
+def server():
+    server, api_url = start_fake_server(seed=1)
+    server.api_url = api_url
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(api_url, **kwargs):
+    # No backoff sleeps, and a breaker that stays closed unless a test asks otherwise
+    kwargs.setdefault("breaker", CircuitBreaker(failure_threshold=100))
+    return MistralClient(api_url=api_url, backoff_max=0.0, **kwargs)
+
+
+def test_chat_completion(server):
+    result = make_client(server.api_url).chat_completion("key", PAYLOAD)
+    flowchart = json.loads(result["choices"][0]["message"]["content"])
+    assert [node["type"] for node in flowchart["nodes"]] == ["start", "process", "decision", "process", "end"]
+    assert result["usage"]["total_tokens"] == result["usage"]["prompt_tokens"] + result["usage"]["completion_tokens"]
+
+
+@pytest.mark.parametrize("setting, status, counter", [("error_500", 500, "retries_5xx"),
+                                                       ("error_429", 429, "retries_429")])
+def test_retryable_status_is_retried_until_max_retries(server, setting, status, counter):
+    setattr(server.config, setting, 1.0)
+    client = make_client(server.api_url, max_retries=2)
+    with pytest.raises(MistralAPIError) as excinfo:
+        client.chat_completion("key", PAYLOAD)
+    assert excinfo.value.status_code == status
+    stats = client.get_stats()
+    assert (stats["attempts"], stats[counter], stats["failures"]) == (3, 2, 1)
+    assert server.config.stats["requests"] == 3
+
+
+def test_retry_succeeds_once_the_server_recovers(server):
+    server.config.error_500 = 1.0
+    client = make_client(server.api_url, max_retries=3)
+    original = client.backoff_delay
+
+    def recover(attempt, retry_after=None):
+        server.config.error_500 = 0.0
+        return original(attempt, retry_after)
+
+    client.backoff_delay = recover
+    assert client.chat_completion("key", PAYLOAD)["choices"][0]["message"]["content"]
+    assert (client.get_stats()["retries_5xx"], client.get_stats()["failures"]) == (1, 0)
+
+
+def test_client_errors_are_not_retried(server):
+    client = make_client(server.api_url.replace("/chat/completions", "/missing"), max_retries=3)
+    with pytest.raises(MistralAPIError) as excinfo:
+        client.chat_completion("key", PAYLOAD)
+    assert excinfo.value.status_code == 404
+    assert client.get_stats()["attempts"] == 1
+
+
+def test_connection_errors_are_retried():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    client = make_client(f"http://127.0.0.1:{port}/v1/chat/completions", max_retries=2, connect_timeout=1.0)
+    with pytest.raises(MistralAPIError, match="Connection to Mistral API failed"):
+        client.chat_completion("key", PAYLOAD)
+    assert client.get_stats()["retries_connection"] == 2
+
+
+def test_read_timeout_is_not_retried(server):
+    server.config.latency.params = [1.0]
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=60)
+    client = make_client(server.api_url, read_timeout=0.2, max_retries=3, breaker=breaker)
+    with pytest.raises(MistralAPIError, match="timed out"):
+        client.chat_completion("key", PAYLOAD)
+    assert client.get_stats()["attempts"] == 1
+    # The timeout counted against the API: the next call fails fast without reaching the server
+    with pytest.raises(CircuitOpenError):
+        client.chat_completion("key", PAYLOAD)
+    assert server.config.stats["requests"] == 1
+
+
+def test_streaming_matches_the_plain_completion(server):
+    client = make_client(server.api_url)
+    deltas = list(client.stream_chat_completion("key", PAYLOAD))
+    assert len(deltas) > 1
+    assert server.config.stats["streamed"] == 1
+    assert "".join(deltas) == client.chat_completion("key", PAYLOAD)["choices"][0]["message"]["content"]
+    collected = client.collect_chat_completion("key", PAYLOAD)
+    assert collected["choices"][0]["message"]["content"] == "".join(deltas)
+
+
+def test_streaming_can_be_cancelled(server):
+    server.config.token_delay = 0.01
+    cancel_event = threading.Event()
+    cancel_event.set()
+    with pytest.raises(RequestCancelledError):
+        make_client(server.api_url).collect_chat_completion("key", PAYLOAD, cancel_event)
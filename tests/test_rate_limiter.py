@@ -0,0 +1,101 @@
+"""RequestScheduler: round-robin service across sessions, token refunds and backpressure"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limiter import RequestScheduler, SchedulerBusyError, estimate_request_tokens  # noqa: E402
+
+API_KEY = "key"
+
+
+def stalled_scheduler(**kwargs):
+    """A scheduler whose request bucket is empty and practically never refills, so everything queues"""
+    scheduler = RequestScheduler(requests_per_second=1e-9, request_burst=1, **kwargs)
+    assert scheduler.try_acquire(API_KEY, "warmup", 1) is not None
+    return scheduler
+
+
+def grant_next(scheduler, tickets):
+    """Let exactly one more request through and return the ticket that got it"""
+    waiting = [ticket for ticket in tickets if not ticket.granted]
+    scheduler._state(waiting[0].key).requests.refund(1)
+    scheduler.wait(waiting[0], timeout=0)
+    granted = [ticket for ticket in waiting if ticket.granted]
+    assert len(granted) == 1
+    return granted[0]
+
+
+def test_sessions_are_served_round_robin():
+    scheduler = stalled_scheduler()
+    tickets = {name: scheduler.submit(API_KEY, name[0], 10) for name in ("a1", "a2", "a3", "b1", "b2")}
+    assert {name: scheduler.position(ticket) for name, ticket in tickets.items()} == {
+        "a1": 1, "b1": 2, "a2": 3, "b2": 4, "a3": 5}
+    order = [grant_next(scheduler, list(tickets.values())) for _ in tickets]
+    names = {id(ticket): name for name, ticket in tickets.items()}
+    assert [names[id(ticket)] for ticket in order] == ["a1", "b1", "a2", "b2", "a3"]
+    assert scheduler.session_position("a") is None
+
+
+def test_try_acquire_never_jumps_the_queue():
+    scheduler = stalled_scheduler()
+    ticket = scheduler.submit(API_KEY, "a", 10)
+    scheduler._state(ticket.key).requests.refund(1)
+    assert scheduler.try_acquire(API_KEY, "b", 10) is None
+
+
+def test_settle_refunds_the_unused_reservation():
+    scheduler = RequestScheduler(requests_per_second=1000, request_burst=10, tokens_per_minute=1000)
+    ticket = scheduler.acquire(API_KEY, "a", 800)
+    assert scheduler.try_acquire(API_KEY, "a", 700) is None
+    scheduler.settle(ticket, 300)
+    assert scheduler.try_acquire(API_KEY, "a", 700) is not None
+
+
+def test_settle_ignores_overruns_and_ungranted_tickets():
+    scheduler = stalled_scheduler(tokens_per_minute=1000)
+    state = scheduler._state(scheduler._key_id(API_KEY))
+    waiting = scheduler.submit(API_KEY, "a", 500)
+    level = state.tokens.level
+    scheduler.settle(waiting, 0)
+    assert state.tokens.level == level
+    granted = grant_next(scheduler, [waiting])
+    level = state.tokens.level
+    scheduler.settle(granted, 900)
+    assert state.tokens.level == pytest.approx(level, abs=1)
+
+
+def test_full_queue_refuses_new_requests():
+    scheduler = stalled_scheduler(max_queue=2)
+    scheduler.submit(API_KEY, "a", 10)
+    scheduler.submit(API_KEY, "b", 10)
+    with pytest.raises(SchedulerBusyError, match="Too many requests"):
+        scheduler.submit(API_KEY, "c", 10)
+    # Other keys have their own queue
+    scheduler.submit("other key", "c", 10)
+    assert scheduler.get_stats()["rejected"] == 1
+
+
+def test_waiting_past_max_wait_gives_up():
+    scheduler = stalled_scheduler(max_wait=0.05)
+    ticket = scheduler.submit(API_KEY, "a", 10)
+    with pytest.raises(SchedulerBusyError, match="Gave up"):
+        scheduler.wait(ticket)
+    assert scheduler.get_stats()["timeouts"] == 1
+    assert scheduler.position(ticket) == 0
+
+
+def test_cancel_leaves_the_queue():
+    scheduler = stalled_scheduler()
+    first = scheduler.submit(API_KEY, "a", 10)
+    second = scheduler.submit(API_KEY, "b", 10)
+    scheduler.cancel(first)
+    assert scheduler.position(second) == 1
+    assert scheduler.get_stats()["queued"] == 1
+
+
+def test_estimate_covers_prompt_and_completion():
+    data = {"messages": [{"content": "x" * 400}, {"content": "y" * 40}], "max_tokens": 1000}
+    assert estimate_request_tokens(data) == 1110
@@ -0,0 +1,87 @@
+"""ResponseCache: LRU order, TTL expiry and the byte limit"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from response_cache import ResponseCache, make_cache_key  # noqa: E402
+
+
+def size_of(value):
+    return len(json.dumps(value).encode("utf-8"))
+
+
+def test_get_returns_what_was_put():
+    cache = ResponseCache()
+    cache.put("a", {"nodes": [1, 2]})
+    assert cache.get("a") == {"nodes": [1, 2]}
+    assert cache.get("b") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    value = "x" * 10
+    cache = ResponseCache(max_bytes=3 * size_of(value))
+    for key in ("a", "b", "c"):
+        cache.put(key, value)
+    # Reading "a" makes "b" the least recently used
+    cache.get("a")
+    cache.put("d", value)
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in ("a", "c", "d")] == [value] * 3
+    assert cache.evictions == 1
+
+
+def test_size_tracks_the_encoded_values():
+    cache = ResponseCache()
+    cache.put("a", "x" * 10)
+    cache.put("b", [1, 2, 3])
+    assert cache.size_bytes == size_of("x" * 10) + size_of([1, 2, 3])
+    # Replacing a value counts only the new one
+    cache.put("a", "y")
+    assert cache.size_bytes == size_of("y") + size_of([1, 2, 3])
+    assert len(cache) == 2
+
+
+def test_evicts_until_the_new_value_fits():
+    cache = ResponseCache(max_bytes=100)
+    for key in ("a", "b", "c", "d"):
+        cache.put(key, "x" * 20)
+    cache.put("big", "y" * 60)
+    assert cache.size_bytes <= 100
+    assert cache.get("big") == "y" * 60
+    assert cache.get("a") is None and cache.get("b") is None
+
+
+def test_oversized_value_is_refused_without_flushing_the_cache():
+    cache = ResponseCache(max_bytes=50)
+    cache.put("a", "x" * 10)
+    assert cache.put("huge", "y" * 100) is False
+    assert cache.get("huge") is None
+    assert cache.get("a") == "x" * 10
+
+
+def test_entries_expire_after_the_ttl():
+    cache = ResponseCache(ttl_seconds=0.05)
+    cache.put("a", "value")
+    assert cache.get("a") == "value"
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert cache.expirations == 1
+    assert (len(cache), cache.size_bytes) == (0, 0)
+
+
+def test_clear_empties_the_cache():
+    cache = ResponseCache()
+    cache.put("a", "value")
+    cache.clear()
+    assert (len(cache), cache.size_bytes, cache.get("a")) == (0, 0, None)
+
+
+def test_cache_key_normalizes_the_prompt():
+    key = make_cache_key("Receive  order,\nship it", "retail", "mistral-small", 0.7, 2000)
+    assert key == make_cache_key("receive order, ship it ", "retail", "mistral-small", 0.7, 2000)
+    assert key != make_cache_key("receive order, ship it", "retail", "mistral-small", 0.7, 2000, kind="skeleton")
+    assert key != make_cache_key("receive order, ship it", "retail", "mistral-small", 0.7, 1000)
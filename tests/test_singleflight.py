@@ -0,0 +1,82 @@
+"""SingleFlight: concurrent callers of one key share a single execution"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from singleflight import SingleFlight  # noqa: E402
+
+FOLLOWERS = 4
+
+
+def run_with_followers(group, fn):
+    """Start a leader running `fn`, then FOLLOWERS more calls for the same key while it is in flight.
+
+    Returns the futures of every call, leader first.
+    """
+    started = threading.Event()
+    release = threading.Event()
+
+    def leader_fn():
+        started.set()
+        release.wait(5)
+        return fn()
+
+    with ThreadPoolExecutor(max_workers=FOLLOWERS + 1) as executor:
+        futures = [executor.submit(group.do, "key", leader_fn)]
+        assert started.wait(5)
+        futures += [executor.submit(group.do, "key", leader_fn) for _ in range(FOLLOWERS)]
+        # Every follower has joined once the call count says so
+        while group.get_stats()["calls"] < FOLLOWERS + 1:
+            time.sleep(0.001)
+        release.set()
+        for future in futures:
+            future.exception(5)
+    return futures
+
+
+def test_followers_get_the_leaders_result():
+    group = SingleFlight()
+    calls = []
+    futures = run_with_followers(group, lambda: calls.append(1) or {"nodes": []})
+    assert [future.result() for future in futures] == [{"nodes": []}] * (FOLLOWERS + 1)
+    assert len(calls) == 1
+    assert group.get_stats() == {"calls": FOLLOWERS + 1, "executions": 1, "coalesced": FOLLOWERS, "in_flight": 0}
+
+
+def test_followers_get_the_leaders_exception():
+    group = SingleFlight()
+
+    def fail():
+        raise ValueError("upstream failed")
+
+    futures = run_with_followers(group, fail)
+    for future in futures:
+        with pytest.raises(ValueError, match="upstream failed"):
+            future.result()
+    assert group.get_stats()["executions"] == 1
+
+
+def test_key_is_released_once_the_leader_finishes():
+    group = SingleFlight()
+
+    def fail():
+        raise ValueError("first")
+
+    with pytest.raises(ValueError):
+        group.do("key", fail)
+    assert group.in_flight() == 0
+    # A later call runs afresh instead of seeing the old failure
+    assert group.do("key", lambda: "second") == "second"
+    assert group.get_stats()["executions"] == 2
+
+
+def test_different_keys_run_separately():
+    group = SingleFlight()
+    assert [group.do(key, lambda key=key: key.upper()) for key in ("a", "b")] == ["A", "B"]
+    assert group.get_stats()["coalesced"] == 0
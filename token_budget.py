@@ -0,0 +1,45 @@
+import re
+
+# Rough output cost of one node: id/text/type/connections/icon plus the
+# Purpose/Implementation/... description the system prompt asks for
+TOKENS_PER_NODE = 150
+# Braces, the "nodes" key and whitespace around the array
+BUDGET_OVERHEAD = 60
+# Head-room so an estimate that is slightly low doesn't truncate the JSON
+SAFETY_MARGIN = 1.25
+MAX_TOKEN_BUDGET = 4000
+
+_STEP_SEPARATORS = re.compile(r"[.;\n]|,|\bthen\b|\bnext\b|\bafter(?:wards)?\b|\bfinally\b|\bfollowed by\b", re.I)
+_BRANCH_WORDS = re.compile(r"\b(?:if|else|otherwise|either|whether|or not|in case)\b", re.I)
+_CONDITION_WORDS = re.compile(r"\b(?:when|unless|until|while|yes|no|approved|rejected|valid|invalid|fails?|succeeds?)\b", re.I)
+
+
+def analyze_prompt_complexity(prompt):
+    """Count the steps, branches and conditions a flowchart prompt describes"""
+    prompt = prompt or ""
+    steps = len([part for part in _STEP_SEPARATORS.split(prompt) if part and part.strip()])
+    branches = len(_BRANCH_WORDS.findall(prompt))
+    conditions = len(_CONDITION_WORDS.findall(prompt))
+    # Every step is a node, each decision point adds a decision node (branch
+    # words like "if", or pairs of outcomes like "approved/rejected"), and
+    # the model always adds start and end nodes
+    decisions = max(branches, (conditions + 1) // 2)
+    estimated_nodes = max(3, steps + decisions + 2)
+    return {
+        "steps": steps,
+        "branches": branches,
+        "conditions": conditions,
+        "estimated_nodes": estimated_nodes,
+    }
+
+
+def estimate_token_budget(prompt, base_max_tokens, max_budget=MAX_TOKEN_BUDGET):
+    """Pick max_tokens for a prompt from its complexity.
+
+    Simple prompts keep the optimization level's `base_max_tokens`, which
+    caps how long they can run; prompts that need more room to produce
+    complete JSON get it, up to `max_budget`.
+    """
+    complexity = analyze_prompt_complexity(prompt)
+    needed = int((BUDGET_OVERHEAD + complexity["estimated_nodes"] * TOKENS_PER_NODE) * SAFETY_MARGIN)
+    return max(base_max_tokens, min(max_budget, needed))